@@ -131,6 +131,9 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+MEDIA_URL = "media/"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR.parent / "media")
+
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -216,3 +219,24 @@ TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER", "TWILIO_PHONE_NUMBER")
 AWS_REGION_NAME = os.environ.get("AWS_REGION_NAME")
 AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
+
+
+# Customers file ingestion
+CUSTOMER_UPLOAD_CHUNK_SIZE = int(os.getenv("CUSTOMER_UPLOAD_CHUNK_SIZE", 5000))
+CUSTOMER_BULK_BATCH_SIZE = int(os.getenv("CUSTOMER_BULK_BATCH_SIZE", 1000))
+CUSTOMER_UNIQUE_IN_QUERY_LIMIT = int(os.getenv("CUSTOMER_UNIQUE_IN_QUERY_LIMIT", 10000))
+CUSTOMER_JOBS_POLL_INTERVAL = int(os.getenv("CUSTOMER_JOBS_POLL_INTERVAL", 2))
+# Processing jobs without a heartbeat for this number of seconds are requeued or failed
+CUSTOMER_JOBS_STALE_TIMEOUT = int(os.getenv("CUSTOMER_JOBS_STALE_TIMEOUT", 600))
+CUSTOMER_JOBS_MAX_ATTEMPTS = int(os.getenv("CUSTOMER_JOBS_MAX_ATTEMPTS", 3))
+
+# Loans bulk creation
+LOAN_BULK_MAX_ITEMS = int(os.getenv("LOAN_BULK_MAX_ITEMS", 50000))
+
+# Idempotency-Key responses are kept for this number of seconds
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 86400))
+# An in-progress key older than this number of seconds is claimed again by the next retry
+IDEMPOTENCY_KEY_LEASE = int(os.getenv("IDEMPOTENCY_KEY_LEASE", 60))
+
+# Payments file ingestion
+PAYMENT_UPLOAD_CHUNK_SIZE = int(os.getenv("PAYMENT_UPLOAD_CHUNK_SIZE", 5000))
@@ -0,0 +1,126 @@
+"""
+Django command to compare the plans of the list queries with and without the list indexes.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from customers.models import Customer
+from loans.models import Loan
+from payments.models import Payment, PaymentDetail
+
+
+class RollbackSeed(Exception):
+    """Raised to roll back the seeded rows and the dropped indexes."""
+
+
+class Command(BaseCommand):
+    """Django command to show the EXPLAIN plans of the list queries before and after the indexes."""
+
+    help = (
+        "Seed a large dataset in a transaction, show the EXPLAIN plans of the list and debt queries without "
+        "and with the list indexes of the models and roll everything back."
+    )
+    models = [Customer, Loan, Payment, PaymentDetail]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=200000, help="Number of customers to seed.")
+        parser.add_argument("--loans-per-customer", type=int, default=3, help="Number of loans of every customer.")
+        parser.add_argument("--analyze", action="store_true", help="Run the queries with EXPLAIN ANALYZE.")
+
+    def handle(self, *args, **options):  # pylint: disable=unused-argument
+        """Entrypoint for command."""
+        try:
+            with transaction.atomic():
+                self.seed(options["customers"], options["loans_per_customer"])
+                try:
+                    with transaction.atomic():
+                        self.drop_indexes()
+                        self.explain("Before (without the list indexes)", options["analyze"])
+                        raise RollbackSeed
+                except RollbackSeed:
+                    pass
+                self.explain("After (with the list indexes)", options["analyze"])
+                raise RollbackSeed
+        except RollbackSeed:
+            pass
+
+    def seed(self, customers: int, loans_per_customer: int):
+        """Insert the customers, loans, payments and payment details with `generate_series`."""
+        self.stdout.write(f"Seeding {customers} customers with {loans_per_customer} loans each...")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO customers_customer "
+                "(external_id, status, score, preapproved_at, created_at, updated_at, deleted_at) "
+                "SELECT 'explain-' || g, 1 + g %% 2, 100000, now() - (g %% 1000) * interval '1 hour', "
+                "now() - g * interval '1 second', now(), CASE WHEN g %% 20 = 0 THEN now() END "
+                "FROM generate_series(1, %s) g",
+                [customers],
+            )
+            cursor.execute(
+                "INSERT INTO loans_loan "
+                "(external_id, amount, status, outstanding, customer_id, created_at, updated_at, deleted_at) "
+                "SELECT c.external_id || '-' || k, 100, 1 + (c.id + k) %% 4, 100, c.id, "
+                "c.created_at + k * interval '1 second', now(), c.deleted_at "
+                "FROM customers_customer c CROSS JOIN generate_series(1, %s) k "
+                "WHERE c.external_id LIKE 'explain-%%'",
+                [loans_per_customer],
+            )
+            cursor.execute(
+                "INSERT INTO payments_payment "
+                "(external_id, total_amount, status, paid_at, customer_id, created_at, updated_at, deleted_at) "
+                "SELECT l.external_id, 10, 1 + l.id % 2, now(), l.customer_id, l.created_at, now(), l.deleted_at "
+                "FROM loans_loan l WHERE l.external_id LIKE 'explain-%' AND l.status = 2"
+            )
+            cursor.execute(
+                "INSERT INTO payments_paymentdetail (amount, payment_id, loan_id, created_at, updated_at) "
+                "SELECT 10, p.id, l.id, now(), now() FROM payments_payment p "
+                "INNER JOIN loans_loan l ON l.external_id = p.external_id WHERE p.external_id LIKE 'explain-%'"
+            )
+            for model in self.models:
+                cursor.execute(f"ANALYZE {model._meta.db_table}")  # nosec
+
+    def drop_indexes(self):
+        """Drop the indexes declared in the Meta of the models."""
+        with connection.cursor() as cursor:
+            for model in self.models:
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")  # nosec
+
+    def explain(self, title: str, analyze: bool):
+        """Print the plans of the list and debt queries."""
+        customer = Customer.objects.filter(external_id__startswith="explain-").order_by("id").first()
+        loan = Loan.objects.filter(customer=customer).order_by("id").first()
+        now = timezone.now()
+        queries = {
+            "customers list": Customer.objects.filter(deleted_at=None).order_by("created_at", "id")[:10],
+            "customers by status": Customer.objects.filter(deleted_at=None, status__in=[2]).order_by("created_at")[:10],
+            "customers preapproved range": Customer.objects.filter(
+                deleted_at=None, preapproved_at__gte=now - timedelta(hours=2), preapproved_at__lt=now
+            ),
+            "customers search contains": Customer.objects.filter(external_id__icontains="explain-1234")[:10],
+            "customers search prefix": Customer.objects.filter(external_id__startswith="explain-1234")[:10],
+            "loans search contains": Loan.objects.filter(external_id__icontains="explain-1234")[:10],
+            "loans search prefix": Loan.objects.filter(external_id__startswith="explain-1234")[:10],
+            "loans list": Loan.objects.filter(deleted_at=None).order_by("created_at", "id")[:10],
+            "loans cursor page": Loan.objects.filter(deleted_at=None)
+            .filter(
+                Q(created_at__gt=loan.created_at) | Q(created_at=loan.created_at, id__gt=loan.pk),
+                created_at__gte=loan.created_at,
+            )
+            .order_by("created_at", "id")[:20],
+            "loans by status": Loan.objects.filter(deleted_at=None, status__in=[1]).order_by("created_at")[:10],
+            "customer debt": Loan.objects.filter(customer=customer, status__in=[1, 2])
+            .values("customer_id")
+            .annotate(total=Sum("amount")),
+            "customer payments": Payment.objects.filter(customer=customer, status=1),
+            "loan payments": PaymentDetail.objects.filter(loan=loan).values("loan_id").annotate(total=Sum("amount")),
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(queryset.explain(analyze=analyze))
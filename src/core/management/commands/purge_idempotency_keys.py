@@ -0,0 +1,21 @@
+"""
+Django command to delete the expired idempotency keys.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.services import IdempotencyService
+
+
+class Command(BaseCommand):
+    """Django command to delete the stored responses of the expired idempotency keys."""
+
+    help = "Delete the idempotency keys older than IDEMPOTENCY_KEY_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Number of keys deleted per statement.")
+
+    def handle(self, *args, **options):  # pylint: disable=unused-argument
+        """Entrypoint for command."""
+        deleted = IdempotencyService.purge(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} expired idempotency keys deleted"))
@@ -1,6 +1,9 @@
 """
 File for models of the app core.
 """
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -37,3 +40,36 @@ class BaseModel(models.Model):
         """
 
         abstract = True
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a request sent with an `Idempotency-Key` header.
+
+    The table is kept small: a row per user, path and key with the hash of the body and the
+    response, evicted when it expires. A row without status code is a request in progress.
+
+    Attributes:
+        user (User): The user that sent the request.
+        path (str): The path of the request.
+        key (str): The value of the `Idempotency-Key` header.
+        request_hash (str): The SHA-256 of the body of the request.
+        status_code (int): The status code of the response, None while the request is in progress.
+        response (dict): The data of the response.
+        created_at (datetime): The datetime when the request was received.
+        expires_at (datetime): The datetime when the response can be evicted.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="idempotency_keys", on_delete=models.CASCADE)
+    path = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "path", "key"], name="idempotency_key_unique"),
+        ]
@@ -0,0 +1,126 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class IdempotencyService:
+    @staticmethod
+    def request_hash(data) -> str:
+        """
+        Returns the SHA-256 of the data of a request, with the keys sorted so the same body
+        always has the same hash.
+
+        Args:
+            data (dict): The parsed body of the request.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def claim(user, path: str, key: str, request_hash: str):
+        """
+        Claim an idempotency key for a request, or return the row that already holds it.
+
+        The row is created in progress, without status code. An expired row, or a row in progress
+        older than `IDEMPOTENCY_KEY_LEASE`, is claimed again by the first request that updates it,
+        so concurrent requests with the same key get the row of the request that is running. The
+        request that holds the key keeps its row locked with `lock` while the view runs, so the
+        update of a retry after the lease waits for it: a request that finished leaves its
+        response and is not run again, and only the key of a request whose transaction is gone
+        is claimed again. The remaining window is a request that stalls for longer than the lease
+        between its claim and its `lock`, it then gets a 409 and the retry runs the view.
+
+        Args:
+            user (User): The user of the request.
+            path (str): The path of the request.
+            key (str): The value of the `Idempotency-Key` header.
+            request_hash (str): The hash of the body of the request.
+
+        Returns:
+            tuple: The row and whether it was claimed by this request.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=user, path=path, key=key, defaults={"request_hash": request_hash, "expires_at": expires_at}
+        )
+        lease_expired_at = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_LEASE)
+        if created or (
+            record.expires_at > now and (record.status_code is not None or record.created_at > lease_expired_at)
+        ):
+            return record, created
+        reclaimable = Q(expires_at__lte=now) | Q(status_code__isnull=True, created_at__lte=lease_expired_at)
+        claimed = IdempotencyKey.objects.filter(reclaimable, pk=record.pk).update(
+            request_hash=request_hash, status_code=None, response=None, created_at=now, expires_at=expires_at
+        )
+        if claimed:
+            record.request_hash, record.status_code, record.response = request_hash, None, None
+            record.created_at, record.expires_at = now, expires_at
+            return record, True
+        return IdempotencyKey.objects.get(pk=record.pk), False
+
+    @staticmethod
+    def lock(record: IdempotencyKey) -> bool:
+        """
+        Lock the row of the key claimed by a request until the end of the transaction.
+
+        Args:
+            record (IdempotencyKey): The row returned by `claim`.
+
+        Returns:
+            bool: Whether the row is still held by the request, False when a retry claimed it
+                again after the lease expired.
+        """
+        locked = IdempotencyKey.objects.select_for_update().filter(
+            pk=record.pk, created_at=record.created_at, status_code=None
+        )
+        return locked.values_list("pk", flat=True).first() is not None
+
+    @staticmethod
+    def store(record: IdempotencyKey, status_code: int, response):
+        """
+        Store the response of the request that claimed the key. Nothing is stored if the key
+        was claimed again by a retry after the lease of this request expired.
+        """
+        record.status_code = status_code
+        record.response = response
+        IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+            status_code=status_code, response=response
+        )
+
+    @staticmethod
+    def release(record: IdempotencyKey):
+        """
+        Release the key of a request that failed, so it can be retried with the same key.
+        """
+        IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at, status_code=None).delete()
+
+    @staticmethod
+    def purge(batch_size: int = 10000) -> int:
+        """
+        Delete the expired keys in batches.
+
+        Args:
+            batch_size (int): The number of rows deleted by every statement.
+
+        Returns:
+            int: The number of deleted keys.
+        """
+        deleted = 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
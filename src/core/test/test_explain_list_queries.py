@@ -0,0 +1,35 @@
+import io
+from test.test_setup import TestSetup
+
+import django
+from django.core.management import call_command
+
+from customers.models import Customer
+from loans.models import Loan
+
+
+class TestExplainListQueries(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestExplainListQueries, cls).setUpClass()
+        django.setup()
+
+    def test_explain_list_queries(self):
+        """
+        Test case to verify that the plans are shown without and with the list indexes and that the
+        seeded rows and the dropped indexes are rolled back.
+        """
+        out = io.StringIO()
+        call_command("explain_list_queries", "--customers", "50", "--loans-per-customer", "2", stdout=out)
+        output = out.getvalue()
+        before, after = output.split("After (with the list indexes)")
+        assert "Before (without the list indexes)" in before
+        assert "customer_created_active_idx" not in before
+        for name in ["customers list", "loans list", "customer debt", "loan payments"]:
+            assert name in before and name in after
+        assert Customer.objects.count() == 0
+        assert Loan.objects.count() == 0
+        index_names = [index.name for index in Customer._meta.indexes]
+        with django.db.connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'customers_customer'")
+            assert set(index_names) <= {row[0] for row in cursor.fetchall()}
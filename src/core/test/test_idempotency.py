@@ -0,0 +1,252 @@
+import io
+import threading
+import unittest
+from datetime import timedelta
+from test.test_setup import TestSetup
+from unittest import mock
+
+import django
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from core.models import IdempotencyKey
+from core.services import IdempotencyService
+from customers.models import Customer
+from loans.models import Loan
+from loans.serializers import LoanSerializer
+from payments.models import Payment
+from user.models import User
+
+
+class TestIdempotency(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestIdempotency, cls).setUpClass()
+        django.setup()
+
+    def setUp(self):
+        super().setUp()
+        self.url_loan = reverse("loans:loan")
+        self.url_payment = reverse("payments:payment")
+        self.customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+        self.loan = Loan.objects.create(
+            external_id="loan-1", amount=1000, outstanding=1000, status=2, customer=self.customer
+        )
+        self.body_loan = {"customer": self.customer.id, "amount": 100, "external_id": "loan-2"}
+        self.body_payment = {
+            "payment_detail": [{"amount": 55, "loan_external_id": "loan-1"}],
+            "payment": {"external_id": "payment-1", "customer_external_id": "12"},
+        }
+
+    def test_retry_loan_replays_response(self):
+        """
+        Test case to verify that a retry of a loan with the same Idempotency-Key and body gets
+        the stored response without creating the loan again nor running the loan checks.
+        """
+        response = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 201
+        with self.assertNumQueries(1):
+            retry = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert retry.status_code == 201
+        assert retry.json() == response.json()
+        assert retry["Idempotent-Replayed"] == "true"
+        assert Loan.objects.filter(external_id="loan-2").count() == 1
+
+    def test_retry_payment_replays_response(self):
+        """
+        Test case to verify that a retry of a payment gets the stored response and the
+        outstanding of the loan is decremented only once, while a request without the header
+        runs the view and is rejected by the duplicated external_id.
+        """
+        response = self.client_auth.post(
+            self.url_payment, self.body_payment, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        assert response.status_code == 201
+        retry = self.client_auth.post(self.url_payment, self.body_payment, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert retry.status_code == 201
+        assert retry.json() == {"message": "Pago realizado con éxito."}
+        self.loan.refresh_from_db()
+        assert self.loan.outstanding == 945
+        assert Payment.objects.count() == 1
+
+        response = self.client_auth.post(self.url_payment, self.body_payment, format="json")
+        assert response.status_code == 422
+
+    def test_key_reused_with_other_body(self):
+        """
+        Test case to verify that a key sent again with a different body is rejected, that the
+        keys are scoped by user and path, and that an invalid key is rejected.
+        """
+        response = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 201
+        body = {**self.body_loan, "amount": 200}
+        response = self.client_auth.post(self.url_loan, body, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 422
+        assert response.json() == {"error": "El Idempotency-Key ya se uso con un body diferente"}
+
+        response = self.client_auth.post(
+            self.url_payment, self.body_payment, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        assert response.status_code == 201
+        other_client = APIClient()
+        other_client.force_authenticate(user=User.objects.create_user(email="other@test.com", password="password"))
+        body = {**self.body_loan, "external_id": "loan-3"}
+        response = other_client.post(self.url_loan, body, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 201
+
+        response = self.client_auth.post(self.url_loan, body, format="json", HTTP_IDEMPOTENCY_KEY="k" * 256)
+        assert response.status_code == 422
+        assert response.json() == {"error": "El header Idempotency-Key debe tener entre 1 y 255 caracteres"}
+
+    def test_key_in_progress_and_expired(self):
+        """
+        Test case to verify that a key whose request is still running gets a 409 and that an
+        expired key runs the request again. The purge command deletes the expired keys.
+        """
+        running = {"customer": self.customer.id, "amount": 100, "external_id": "loan-2"}
+        IdempotencyKey.objects.create(
+            user=self.user,
+            path=self.url_loan,
+            key="key-1",
+            request_hash=IdempotencyService.request_hash(running),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.client_auth.post(self.url_loan, running, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 409
+
+        IdempotencyKey.objects.filter(key="key-1").update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.client_auth.post(self.url_loan, running, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 201
+        assert IdempotencyKey.objects.get(key="key-1").status_code == 201
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = io.StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        assert "1 expired idempotency keys deleted" in out.getvalue()
+        assert IdempotencyKey.objects.count() == 0
+
+    @override_settings(IDEMPOTENCY_KEY_LEASE=60)
+    def test_key_in_progress_lease_expired(self):
+        """
+        Test case to verify that a key left in progress by a request whose process died is
+        claimed again by the retry once its lease expires, and that the late response of the
+        dead request does not overwrite the response of the retry.
+        """
+        request_hash = IdempotencyService.request_hash(self.body_loan)
+        IdempotencyKey.objects.create(
+            user=self.user,
+            path=self.url_loan,
+            key="key-1",
+            request_hash=request_hash,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 409
+
+        IdempotencyKey.objects.filter(key="key-1").update(created_at=timezone.now() - timedelta(seconds=61))
+        dead = IdempotencyKey.objects.get(key="key-1")
+        response = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 201
+        assert Loan.objects.filter(external_id="loan-2").count() == 1
+
+        IdempotencyService.store(dead, 422, {"error": "late"})
+        IdempotencyService.release(dead)
+        record = IdempotencyKey.objects.get(key="key-1")
+        assert record.status_code == 201
+        assert record.response == response.json()
+
+    def test_server_error_is_not_stored(self):
+        """
+        Test case to verify that a request that ends with a server error releases the key, so
+        the retry with the same key runs the view again, and that validation errors are stored.
+        """
+        with mock.patch("loans.views.LoanSerializer.save", side_effect=RuntimeError("database is down")):
+            response = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 500
+        assert not IdempotencyKey.objects.filter(key="key-1").exists()
+        response = self.client_auth.post(self.url_loan, self.body_loan, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+        assert response.status_code == 201
+
+        body = {**self.body_loan, "external_id": "x" * 61}
+        response = self.client_auth.post(self.url_loan, body, format="json", HTTP_IDEMPOTENCY_KEY="key-2")
+        assert response.status_code == 422
+        assert IdempotencyKey.objects.get(key="key-2").status_code == 422
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Concurrent requests require PostgreSQL")
+class TestIdempotencyConcurrency(APITransactionTestCase):
+    def test_concurrent_retries_create_once(self):
+        """
+        Test case to verify that concurrent requests with the same Idempotency-Key create the
+        loan once, the other requests get the stored response or the key in progress.
+        """
+        user = User.objects.create_user(email="idempotency@test.com", password="password")
+        customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+        body = {"customer": customer.id, "amount": 100, "external_id": "loan-1"}
+        barrier = threading.Barrier(8)
+        status_codes = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                barrier.wait()
+                response = client.post(reverse("loans:loan"), body, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+                status_codes.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert set(status_codes) <= {201, 409}
+        assert status_codes.count(201) >= 1
+        assert Loan.objects.filter(external_id="loan-1").count() == 1
+
+    @override_settings(IDEMPOTENCY_KEY_LEASE=0)
+    def test_retry_after_lease_waits_running_request(self):
+        """
+        Test case to verify that a retry sent after the lease of a request that is still running
+        waits for it and gets its stored response, instead of creating the loan again.
+        """
+        user = User.objects.create_user(email="idempotency@test.com", password="password")
+        customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+        body = {"customer": customer.id, "amount": 100, "external_id": "loan-1"}
+        started, finish = threading.Event(), threading.Event()
+        save = LoanSerializer.save
+        responses = {}
+
+        def slow_save(serializer, **kwargs):
+            started.set()
+            finish.wait(timeout=10)
+            return save(serializer, **kwargs)
+
+        def post(name):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                responses[name] = client.post(reverse("loans:loan"), body, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+            finally:
+                connection.close()
+
+        with mock.patch("loans.views.LoanSerializer.save", autospec=True, side_effect=slow_save):
+            first = threading.Thread(target=post, args=("first",))
+            first.start()
+            assert started.wait(timeout=10)
+            retry = threading.Thread(target=post, args=("retry",))
+            retry.start()
+            retry.join(timeout=1)
+            assert retry.is_alive()
+            finish.set()
+            first.join()
+            retry.join()
+        assert responses["first"].status_code == 201
+        assert responses["retry"].status_code == 201
+        assert responses["retry"]["Idempotent-Replayed"] == "true"
+        assert Loan.objects.filter(external_id="loan-1").count() == 1
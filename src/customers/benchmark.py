@@ -0,0 +1,381 @@
+"""
+Helpers to benchmark the customers ingestion paths.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import queue
+import resource
+import sys
+import time
+from datetime import UTC, datetime
+from decimal import Decimal
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from faker import Faker
+from rest_framework import serializers
+
+from customers.models import STATUS_CUSTOMER
+
+faker = Faker()
+
+# The payload format read by every strategy of `ProcessingFactory`.
+STRATEGY_FORMATS = {
+    "json": "json",
+    "json_chunked": "json",
+    "txt": "txt",
+    "txt_chunked": "txt",
+    "copy": "txt",
+    "upsert": "txt",
+    "parquet": "parquet",
+    "arrow": "arrow",
+    "ndjson": "ndjson",
+}
+ARROW_SCHEMA = pa.schema(
+    [
+        ("external_id", pa.string()),
+        ("status", pa.int16()),
+        ("score", pa.decimal128(12, 2)),
+        ("preapproved_at", pa.timestamp("us", tz="UTC")),
+    ]
+)
+PAYLOAD_BATCH_SIZE = 50000
+# Seconds between the checks of a benchmark process that has not sent its result yet.
+ISOLATED_POLL_INTERVAL = 1
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the rows written by a benchmark run."""
+
+
+def iter_customers(rows: int, prefix: str = "bench"):
+    """
+    Yields synthetic customers with the shape accepted by `CustomerSerializer`.
+
+    Args:
+        rows (int): The number of customers to generate.
+        prefix (str): The prefix of the external_id of every customer.
+
+    Yields:
+        dict: The data of a customer.
+    """
+    statuses = [status for status, _ in STATUS_CUSTOMER]
+    for number in range(rows):
+        yield {
+            "external_id": f"{prefix}-{number}",
+            "status": faker.random_element(statuses),
+            "score": str(faker.pydecimal(left_digits=6, right_digits=2, positive=True)),
+            "preapproved_at": faker.date_time(tzinfo=UTC).isoformat(),
+        }
+
+
+def generate_customers(rows: int, prefix: str = "bench") -> list:
+    """
+    Generate synthetic customers with the shape accepted by `CustomerSerializer`.
+
+    Args:
+        rows (int): The number of customers to generate.
+        prefix (str): The prefix of the external_id of every customer.
+
+    Returns:
+        list: A list of dictionaries with the customers data.
+    """
+    return list(iter_customers(rows, prefix=prefix))
+
+
+def generate_payload(payload_format: str, rows: int, prefix: str = "bench") -> bytes:
+    """
+    Generate a synthetic customers payload in one of the formats of `STRATEGY_FORMATS`.
+
+    The customers are generated in batches of `PAYLOAD_BATCH_SIZE`, so large payloads do not
+    keep every customer in memory as dictionaries.
+
+    Args:
+        payload_format (str): One of txt, json, ndjson, parquet or arrow.
+        rows (int): The number of customers to generate.
+        prefix (str): The prefix of the external_id of every customer.
+
+    Returns:
+        bytes: The content of the payload, json payloads are a `{"customers": [...]}` body.
+    """
+    customers = iter_customers(rows, prefix=prefix)
+    if payload_format == "txt":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=ARROW_SCHEMA.names)
+        writer.writeheader()
+        writer.writerows(customers)
+        return buffer.getvalue().encode()
+    if payload_format in ("json", "ndjson"):
+        lines = (json.dumps(customer) for customer in customers)
+        if payload_format == "ndjson":
+            return "".join(f"{line}\n" for line in lines).encode()
+        return ('{"customers": [' + ",".join(lines) + "]}").encode()
+    buffer = io.BytesIO()
+    new_writer = pq.ParquetWriter if payload_format == "parquet" else pa.ipc.new_stream
+    with new_writer(buffer, ARROW_SCHEMA) as writer:
+        while batch := list(islice(customers, PAYLOAD_BATCH_SIZE)):
+            writer.write_table(customers_table(batch))
+    return buffer.getvalue()
+
+
+def customers_table(customers: list) -> pa.Table:
+    """
+    Build an Arrow table with typed columns from a list of generated customers.
+    """
+    return pa.table(
+        {
+            "external_id": [customer["external_id"] for customer in customers],
+            "status": [customer["status"] for customer in customers],
+            "score": [Decimal(customer["score"]) for customer in customers],
+            "preapproved_at": [datetime.fromisoformat(customer["preapproved_at"]) for customer in customers],
+        },
+        schema=ARROW_SCHEMA,
+    )
+
+
+class BenchmarkRequest:
+    """
+    A minimal request with a payload, for the strategies of `ProcessingFactory`.
+
+    `data` is built when a strategy reads it, so the parsing of json bodies is part of the
+    measured time like in a real request, and `stream` reads the raw payload.
+
+    Attributes:
+        content (bytes): The payload.
+        payload_format (str): The format of the payload.
+    """
+
+    def __init__(self, content: bytes, payload_format: str):
+        self.content = content
+        self.payload_format = payload_format
+
+    @property
+    def data(self) -> dict:
+        if self.payload_format == "json":
+            return json.loads(self.content)
+        name = f"customers.{self.payload_format}"
+        return {"file": SimpleUploadedFile(name, self.content, content_type="application/octet-stream")}
+
+    @property
+    def stream(self):
+        return io.BytesIO(self.content)
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the current process in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(function, rows: int, rollback: bool = True) -> dict:
+    """
+    Run a function and measure its duration, the queries it executes and the peak RSS.
+
+    Args:
+        function (callable): The function to measure.
+        rows (int): The number of rows processed by the function.
+        rollback (bool): Whether to roll back everything written by the function.
+
+    Returns:
+        dict: The seconds, queries, rows per second and peak RSS in megabytes of the run. The
+            peak RSS is the one of the whole process, use `measure_isolated` to get the peak of
+            a single run.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                function()
+                elapsed = time.perf_counter() - start
+                if rollback:
+                    raise RollbackBenchmark
+        except RollbackBenchmark:
+            pass
+    return {
+        "seconds": round(elapsed, 4),
+        "queries": len(queries),
+        "rows_per_second": round(rows / elapsed, 2) if elapsed else 0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure_isolated(function, rows: int) -> dict:
+    """
+    Run `measure` in a forked process, so the peak RSS is the one of that run only.
+
+    The database connections are closed before forking, the child process opens its own. The
+    result is polled every `ISOLATED_POLL_INTERVAL` seconds, so a child killed without sending
+    it (out of memory or a crash of a native library) is reported instead of waiting forever.
+
+    Args:
+        function (callable): The function to measure.
+        rows (int): The number of rows processed by the function.
+
+    Returns:
+        dict: The result of `measure` in the child process.
+
+    Raises:
+        RuntimeError: If the child process fails or exits without a result.
+    """
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+
+    def run():
+        try:
+            results.put(measure(function, rows))
+        except Exception as e:  # pylint: disable=broad-except
+            results.put({"error": repr(e)})
+        finally:
+            connections.close_all()
+
+    connections.close_all()
+    process = context.Process(target=run)
+    process.start()
+    while True:
+        alive = process.is_alive()
+        try:
+            result = results.get(timeout=ISOLATED_POLL_INTERVAL)
+            break
+        except queue.Empty:
+            if not alive:
+                process.join()
+                raise RuntimeError(f"The benchmark process exited with code {process.exitcode} without a result.")
+    process.join()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def run_strategy(strategy_name: str, content: bytes, rows: int, isolate: bool = True) -> dict:
+    """
+    Measure a strategy of `ProcessingFactory` with a payload, rolling back the customers created.
+
+    Args:
+        strategy_name (str): The name of the strategy.
+        content (bytes): The payload in the format of the strategy, see `STRATEGY_FORMATS`.
+        rows (int): The number of customers of the payload.
+        isolate (bool): Whether to run the strategy in its own process.
+
+    Returns:
+        dict: The seconds, queries, rows per second and peak RSS of the run.
+    """
+    from customers.factory import ProcessingFactory  # pylint: disable=import-outside-toplevel
+
+    def function():
+        return ProcessingFactory.processing(strategy_name, BenchmarkRequest(content, STRATEGY_FORMATS[strategy_name]))
+
+    return measure_isolated(function, rows) if isolate else measure(function, rows)
+
+
+def compare_serializer(rows: int, batch_size: int | None = None, isolate: bool = True) -> dict:
+    """
+    Measure the per-row `ListSerializer` save and the bulk `CustomerListSerializer` save of the
+    same validated customers, rolling back the customers created.
+
+    Args:
+        rows (int): The number of customers to save.
+        batch_size (int, optional): The batch size of the bulk insert.
+        isolate (bool): Whether to run every save in its own process.
+
+    Returns:
+        dict: The results of the per_row and bulk saves.
+    """
+    from customers.serializers import CustomerSerializer  # pylint: disable=import-outside-toplevel
+
+    context = {"batch_size": batch_size} if batch_size else {}
+    serializer = CustomerSerializer(data=generate_customers(rows), many=True, context=context)
+    serializer.is_valid(raise_exception=True)
+    validated_data = serializer.validated_data
+    run = measure_isolated if isolate else measure
+    return {
+        "per_row": run(lambda: serializers.ListSerializer.create(serializer, validated_data), rows),
+        "bulk": run(lambda: serializer.create(validated_data), rows),
+    }
+
+
+def run_suite(
+    sizes: list,
+    strategies: list,
+    isolate: bool = True,
+    on_result=None,
+    serializer: bool = False,
+    batch_size: int | None = None,
+) -> dict:
+    """
+    Measure every strategy with synthetic payloads of every size.
+
+    Args:
+        sizes (list): The numbers of customers of the payloads.
+        strategies (list): The names of the strategies.
+        isolate (bool): Whether to run every strategy in its own process.
+        on_result (callable, optional): Called with the strategy, the size and the result of
+            every run.
+        serializer (bool): Whether to also compare the per-row and the bulk serializer saves,
+            stored as the serializer_per_row and serializer_bulk strategies.
+        batch_size (int, optional): The batch size of the bulk serializer save.
+
+    Returns:
+        dict: The results by strategy and size, `{strategy: {size: result}}`.
+    """
+    results = {strategy: {} for strategy in strategies}
+    for rows in sizes:
+        if serializer:
+            for name, result in compare_serializer(rows, batch_size=batch_size, isolate=isolate).items():
+                results.setdefault(f"serializer_{name}", {})[str(rows)] = result
+                if on_result:
+                    on_result(f"serializer_{name}", rows, result)
+        payloads = {}
+        for strategy in strategies:
+            payload_format = STRATEGY_FORMATS[strategy]
+            if payload_format not in payloads:
+                payloads[payload_format] = generate_payload(payload_format, rows)
+            result = run_strategy(strategy, payloads[payload_format], rows, isolate=isolate)
+            results[strategy][str(rows)] = result
+            if on_result:
+                on_result(strategy, rows, result)
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare the results of `run_suite` with a baseline with the same shape.
+
+    The rows per second regress when they drop more than `tolerance` below the baseline, the
+    peak RSS when it grows more than `tolerance` over the baseline and the queries when they
+    grow at all. Strategies or sizes missing in the baseline are not compared.
+
+    Args:
+        results (dict): The results of `run_suite`.
+        baseline (dict): The stored results.
+        tolerance (float): The allowed relative change, 0.2 is 20%.
+
+    Returns:
+        list: A message for every regression.
+    """
+    regressions = []
+    for strategy, sizes in results.items():
+        for rows, result in sizes.items():
+            expected = baseline.get(strategy, {}).get(rows)
+            if not expected:
+                continue
+            checks = [
+                ("rows_per_second", result["rows_per_second"] < expected["rows_per_second"] * (1 - tolerance)),
+                ("peak_rss_mb", result["peak_rss_mb"] > expected["peak_rss_mb"] * (1 + tolerance)),
+                ("queries", result["queries"] > expected["queries"]),
+            ]
+            regressions.extend(
+                f"{strategy} rows={rows} {metric}: {result[metric]} (baseline {expected[metric]})"
+                for metric, regressed in checks
+                if regressed
+            )
+    return regressions
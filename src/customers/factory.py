@@ -1,15 +1,53 @@
 from rest_framework.exceptions import ValidationError
 
-from customers.strategy import JsonProcessing, ProcessingStrategy, TxtProcessing
+from customers.strategy import (
+    ArrowChunkedProcessing,
+    ChunkedProcessing,
+    JsonChunkedProcessing,
+    JsonProcessing,
+    NdjsonChunkedProcessing,
+    ParquetChunkedProcessing,
+    ProcessingStrategy,
+    TxtChunkedProcessing,
+    TxtCopyProcessing,
+    TxtProcessing,
+    TxtUpsertProcessing,
+)
 
 
 class ProcessingFactory:
-    strategy_map_processing = {"json": JsonProcessing(), "txt": TxtProcessing()}
+    strategy_map_processing = {
+        "json": JsonProcessing(),
+        "json_chunked": JsonChunkedProcessing(),
+        "txt": TxtProcessing(),
+        "txt_chunked": TxtChunkedProcessing(),
+        "copy": TxtCopyProcessing(),
+        "upsert": TxtUpsertProcessing(),
+        "parquet": ParquetChunkedProcessing(),
+        "arrow": ArrowChunkedProcessing(),
+        "ndjson": NdjsonChunkedProcessing(),
+    }
+    # Strategies used by the background jobs, they process a stored file chunk by chunk.
+    strategy_map_chunked = {
+        "json": JsonChunkedProcessing(),
+        "json_chunked": JsonChunkedProcessing(),
+        "txt": TxtChunkedProcessing(),
+        "txt_chunked": TxtChunkedProcessing(),
+        "copy": TxtCopyProcessing(),
+        "upsert": TxtUpsertProcessing(),
+        "parquet": ParquetChunkedProcessing(),
+        "arrow": ArrowChunkedProcessing(),
+        "ndjson": NdjsonChunkedProcessing(),
+    }
 
     @classmethod
     def get_strategy(cls, strategy_name: str):
         return cls.strategy_map_processing.get(strategy_name, None)
 
+    @classmethod
+    def get_chunked_strategy(cls, strategy_name: str) -> ChunkedProcessing:
+        return cls.strategy_map_chunked.get(strategy_name, None)
+
     @classmethod
     def processing(cls, strategy_name: str, request):
         strategy: ProcessingStrategy = cls.get_strategy(strategy_name=strategy_name)
@@ -4,7 +4,7 @@ import pytz  # type: ignore
 from django_filters import rest_framework as filters
 
 from customers.models import Customer
-from utils.filters import BaseFilterStatus
+from utils.filters import BaseFilterMatch, BaseFilterStatus, MatchCharFilter
 
 
 class BaseDateFilterSet(filters.FilterSet):
@@ -54,8 +54,8 @@ class BaseDateFilterSet(filters.FilterSet):
         return qs.filter(preapproved_at__lt=start)
 
 
-class CustomerFilters(BaseDateFilterSet, BaseFilterStatus):
-    external_id = filters.CharFilter(field_name="external_id", lookup_expr="icontains")
+class CustomerFilters(BaseDateFilterSet, BaseFilterStatus, BaseFilterMatch):
+    external_id = MatchCharFilter(field_name="external_id")
 
     class Meta:
         model = Customer
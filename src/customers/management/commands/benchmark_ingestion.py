@@ -0,0 +1,83 @@
+"""
+Django command to benchmark the customers ingestion strategies at scale.
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.benchmark import find_regressions, run_suite
+from customers.factory import ProcessingFactory
+
+
+class Command(BaseCommand):
+    """Django command to measure every ProcessingFactory strategy with synthetic payloads."""
+
+    help = (
+        "Measure rows/sec, peak RSS and query count of the customers processing strategies with synthetic "
+        "payloads of every size, with --serializer also the per-row and bulk serializer saves. With --baseline "
+        "the results are compared with a stored baseline and the command fails when any of them regress, with "
+        "--save-baseline the results are stored as the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1000, 100000], help="Numbers of customers, e.g. 1000 1000000."
+        )
+        parser.add_argument(
+            "--strategies",
+            nargs="+",
+            choices=list(ProcessingFactory.strategy_map_processing),
+            default=list(ProcessingFactory.strategy_map_processing),
+        )
+        parser.add_argument("--baseline", type=Path, default=None, help="Path of the baseline JSON file.")
+        parser.add_argument("--save-baseline", action="store_true", help="Store the results in --baseline.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2, help="Allowed relative change of rows/sec and peak RSS."
+        )
+        parser.add_argument(
+            "--no-isolation", action="store_true", help="Run the strategies in this process, peak RSS is shared."
+        )
+        parser.add_argument(
+            "--serializer",
+            action="store_true",
+            help="Also compare the per-row ListSerializer save with the bulk CustomerListSerializer save.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="Batch size of the bulk serializer save.")
+
+    def handle(self, *args, **options):  # pylint: disable=unused-argument
+        """Entrypoint for command."""
+        baseline_path = options["baseline"]
+        if options["save_baseline"] and not baseline_path:
+            raise CommandError("--save-baseline requires --baseline.")
+
+        def on_result(strategy: str, rows: int, result: dict):
+            self.stdout.write(
+                f"{strategy:<13} rows={rows:<8} seconds={result['seconds']} queries={result['queries']} "
+                f"rows/sec={result['rows_per_second']} peak_rss_mb={result['peak_rss_mb']}"
+            )
+
+        results = run_suite(
+            options["sizes"],
+            options["strategies"],
+            isolate=not options["no_isolation"],
+            on_result=on_result,
+            serializer=options["serializer"],
+            batch_size=options["batch_size"],
+        )
+        if options["serializer"]:
+            for rows in options["sizes"]:
+                bulk, per_row = results["serializer_bulk"][str(rows)], results["serializer_per_row"][str(rows)]
+                speedup = bulk["rows_per_second"] / (per_row["rows_per_second"] or 1)
+                self.stdout.write(f"rows={rows} bulk serializer save is {speedup:.1f}x faster than per_row")
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS(f"Baseline stored in {baseline_path}"))
+            return
+        if not baseline_path:
+            return
+        regressions = find_regressions(results, json.loads(baseline_path.read_text()), options["tolerance"])
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
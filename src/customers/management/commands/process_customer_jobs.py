@@ -0,0 +1,48 @@
+"""
+Django command to process the customers uploads queued with `async=true`.
+"""
+
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from customers.services import CustomerUploadJobService
+
+
+class Command(BaseCommand):
+    """Django command to run the customer jobs workers."""
+
+    help = "Process the pending customers uploads stored in the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+        parser.add_argument("--once", action="store_true", help="Exit when there are no pending jobs.")
+
+    def handle(self, *args, **options):  # pylint: disable=unused-argument
+        """Entrypoint for command."""
+        if options["workers"] <= 1:
+            self.work(options["once"])
+            return
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=self.work, args=(options["once"],)) for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    def work(self, once: bool):
+        """Claim and process jobs until there are no pending jobs, or forever."""
+        while True:
+            job = CustomerUploadJobService.claim_job()
+            if job:
+                self.stdout.write(f"Processing customer job {job.pk}...")
+                CustomerUploadJobService.run_job(job)
+                continue
+            if once:
+                return
+            time.sleep(settings.CUSTOMER_JOBS_POLL_INTERVAL)
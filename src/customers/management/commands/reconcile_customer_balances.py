@@ -0,0 +1,33 @@
+"""
+Django command to rebuild the customer balances ledger from the loans.
+"""
+
+from django.core.management.base import BaseCommand
+
+from customers.services import CustomerBalanceService
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the CustomerBalance ledger and report its drift."""
+
+    help = (
+        "Rebuild the balance of every customer from its loans and report the stored values that drifted. "
+        "With --dry-run the drift is only reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report the drift without rebuilding.")
+
+    def handle(self, *args, **options):  # pylint: disable=unused-argument
+        """Entrypoint for command."""
+        drift = CustomerBalanceService.rebuild(dry_run=options["dry_run"])
+        for item in drift:
+            self.stdout.write(
+                f"customer={item['external_id']} {item['field']}: stored={item['stored']} expected={item['expected']}"
+            )
+        customers = len({item["external_id"] for item in drift})
+        message = f"{len(drift)} drifted values in {customers} customers"
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"{message}, nothing was written") if drift else message)
+            return
+        self.stdout.write(self.style.SUCCESS(f"{message}, balances rebuilt"))
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_customer_balances(apps, schema_editor):
+    Customer = apps.get_model("customers", "Customer")
+    CustomerBalance = apps.get_model("customers", "CustomerBalance")
+    amount_field = DecimalField(max_digits=14, decimal_places=2)
+
+    def total(field, condition=None):
+        return Coalesce(Sum(field, filter=condition), Value(0), output_field=amount_field)
+
+    customers = (
+        Customer.objects.filter(loans__isnull=False)
+        .annotate(
+            total_debt=total("loans__outstanding"),
+            pending_total=total("loans__amount", Q(loans__status=1)),
+            active_total=total("loans__amount", Q(loans__status=2)),
+        )
+        .annotate(available_amount=F("score") - F("total_debt"))
+        .values("id", "total_debt", "pending_total", "active_total", "available_amount")
+    )
+    balances = [
+        CustomerBalance(
+            customer_id=customer.pop("id"),
+            **customer,
+        )
+        for customer in customers.iterator(chunk_size=2000)
+    ]
+    CustomerBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0002_customeruploadjob"),
+        ("loans", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerBalance",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("deleted_at", models.DateTimeField(blank=True, default=None, null=True)),
+                ("total_debt", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("pending_total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("active_total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("available_amount", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="balance", to="customers.customer"
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(backfill_customer_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built with CREATE INDEX CONCURRENTLY, which can not run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("customers", "0003_customerbalance"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="customer",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["created_at", "id"],
+                name="customer_created_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="customer",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["status", "created_at"],
+                name="customer_status_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="customer",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["preapproved_at"],
+                name="customer_preapproved_idx",
+            ),
+        ),
+    ]
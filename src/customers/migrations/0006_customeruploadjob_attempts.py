@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0005_external_id_trigram"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customeruploadjob",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
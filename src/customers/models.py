@@ -1,4 +1,8 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 
 from core.models import BaseModel
 
@@ -7,6 +11,13 @@ STATUS_CUSTOMER = [
     (2, "Inactivo"),
 ]
 
+STATUS_UPLOAD_JOB = (
+    (1, "pending"),
+    (2, "processing"),
+    (3, "completed"),
+    (4, "failed"),
+)
+
 
 class Customer(BaseModel):
     """
@@ -23,3 +34,71 @@ class Customer(BaseModel):
     status = models.PositiveSmallIntegerField(choices=STATUS_CUSTOMER, default=1)
     score = models.DecimalField(max_digits=12, decimal_places=2)
     preapproved_at = models.DateTimeField(null=False, blank=False)
+
+    class Meta:
+        # The list endpoints only read the customers that are not deleted.
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], condition=Q(deleted_at__isnull=True), name="customer_created_active_idx"
+            ),
+            models.Index(
+                fields=["status", "created_at"], condition=Q(deleted_at__isnull=True), name="customer_status_active_idx"
+            ),
+            models.Index(
+                fields=["preapproved_at"], condition=Q(deleted_at__isnull=True), name="customer_preapproved_idx"
+            ),
+            # The `icontains` filters compare UPPER(external_id) with LIKE '%value%'.
+            GinIndex(OpClass(Upper("external_id"), name="gin_trgm_ops"), name="customer_external_id_trgm_idx"),
+        ]
+
+
+class CustomerUploadJob(BaseModel):
+    """
+    Represents a customers upload processed in the background.
+
+    Attributes:
+        user (User): The user that sent the upload.
+        processing_type (str): The processing type of the upload.
+        file (File): The stored upload.
+        status (int): The status of the job.
+        rows_done (int): The number of customers created.
+        rows_failed (int): The number of rows rejected.
+        errors (list): The row errors of the upload, limited to the first ones.
+        error_message (str): The error that stopped the job, if any.
+        attempts (int): The number of times a worker claimed the job.
+        started_at (datetime): The datetime when a worker started the job.
+        finished_at (datetime): The datetime when the job finished.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="customer_upload_jobs", on_delete=models.SET_NULL, null=True
+    )
+    processing_type = models.CharField(max_length=30)
+    file = models.FileField(upload_to="customer_uploads/")
+    status = models.SmallIntegerField(choices=STATUS_UPLOAD_JOB, default=1)
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+class CustomerBalance(BaseModel):
+    """
+    Represents the balance of a customer, kept up to date when loans and payments are written.
+
+    Attributes:
+        customer (Customer): The customer of the balance.
+        total_debt (Decimal): The outstanding of all the loans of the customer.
+        pending_total (Decimal): The amount of the pending loans of the customer.
+        active_total (Decimal): The amount of the active loans of the customer.
+        available_amount (Decimal): The score of the customer minus the total debt.
+    """
+
+    customer = models.OneToOneField(Customer, related_name="balance", on_delete=models.CASCADE)
+    total_debt = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pending_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    active_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    available_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
@@ -1,7 +1,185 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.settings import api_settings
+from rest_framework.utils import html
+from rest_framework.validators import UniqueValidator
 
-from customers.models import Customer
-from loans.models import Loan
+from customers.models import Customer, CustomerUploadJob
+from customers.utils import find_existing_external_ids
+
+
+class CustomerUniqueValidator(UniqueValidator):
+    """
+    The `UniqueValidator` of the external_id, skipped when the serializer context has the
+    `skip_unique_external_id` key set, the external_ids are then checked in bulk by
+    `CustomerListSerializer` or `CustomerDataFrameValidator`.
+    """
+
+    def __call__(self, value, serializer_field):
+        if serializer_field.context.get("skip_unique_external_id"):
+            return
+        super().__call__(value, serializer_field)
+
+
+class CustomerListSerializer(serializers.ListSerializer):
+    """
+    List serializer that saves customers with batched inserts.
+
+    DRF's default `ListSerializer.create` calls `child.create` for every item, which means one
+    INSERT per customer. This serializer builds all the instances and writes them with
+    `bulk_create` in batches of `CUSTOMER_BULK_BATCH_SIZE` inside a single transaction. The
+    batch size can be overridden per serializer with the `batch_size` context key.
+
+    The `UniqueValidator` of `external_id` is replaced by a set-based check: the items are
+    validated with the `skip_unique_external_id` context key, then all the external_ids are
+    looked up at once and repeated external_ids inside the list are rejected, keeping the same
+    per-row error message. With the `check_existing` context key set to False only the repeated
+    external_ids are rejected, which is what an upsert needs.
+
+    Methods:
+        to_internal_value(data): Validates the items and the uniqueness of the external_ids.
+        validate_length(data): Runs the list checks of `ListSerializer`.
+        run_child_validation(data): Validates a single item.
+        create(validated_data): Creates the customers with `bulk_create`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._context = {**self._context, "skip_unique_external_id": True}
+
+    def to_internal_value(self, data):
+        """
+        Validate every item and check the uniqueness of the external_ids in bulk.
+
+        Args:
+            data (list): The customers to validate.
+
+        Returns:
+            list: The validated customers.
+
+        Raises:
+            ValidationError: If the list or any of the customers is not valid.
+        """
+        if html.is_html_input(data):
+            data = html.parse_html_list(data, default=[])
+        self.validate_length(data)
+        validated, errors = [], []
+        for item in data:
+            try:
+                validated.append(self.run_child_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                errors.append(exc.detail)
+        self.validate_unique_external_ids(data, validated, errors, self.unique_message())
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def validate_length(self, data):
+        """
+        Run the checks of `ListSerializer.to_internal_value` on the list: a list, not empty
+        unless `allow_empty`, and between `min_length` and `max_length` items.
+
+        Args:
+            data (list): The customers to validate.
+
+        Raises:
+            ValidationError: If the data is not a list or its length is not allowed.
+        """
+        if not isinstance(data, list):
+            message = self.error_messages["not_a_list"].format(input_type=type(data).__name__)
+            code = "not_a_list"
+        elif not self.allow_empty and len(data) == 0:
+            message, code = self.error_messages["empty"], "empty"
+        elif self.max_length is not None and len(data) > self.max_length:
+            message = self.error_messages["max_length"].format(max_length=self.max_length)
+            code = "max_length"
+        elif self.min_length is not None and len(data) < self.min_length:
+            message = self.error_messages["min_length"].format(min_length=self.min_length)
+            code = "min_length"
+        else:
+            return
+        raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code=code)
+
+    def run_child_validation(self, data):
+        """
+        Validate a single item with the child serializer.
+
+        Args:
+            data (dict): The customer to validate.
+
+        Returns:
+            dict: The validated customer.
+        """
+        return self.child.run_validation(data)
+
+    def unique_message(self) -> str:
+        """
+        Returns the message of the `UniqueValidator` of the external_id.
+        """
+        validators = self.child.fields["external_id"].validators
+        return next(validator.message for validator in validators if isinstance(validator, UniqueValidator))
+
+    def validate_unique_external_ids(self, data: list, validated: list, errors: list, message: str):
+        """
+        Add the unique error to the items whose external_id exists or is repeated in the list.
+
+        Args:
+            data (list): The customers as received.
+            validated (list): The validated customers, None for the invalid ones.
+            errors (list): The errors of every customer, updated in place.
+            message (str): The message of the unique error.
+        """
+        external_ids = []
+        for item, validated_item, error in zip(data, validated, errors):
+            if validated_item is not None:
+                external_ids.append(validated_item["external_id"])
+            elif isinstance(item, dict) and "external_id" in item and "external_id" not in error:
+                external_ids.append(str(item["external_id"]).strip())
+            else:
+                external_ids.append(None)
+        existing = set()
+        if self.context.get("check_existing", True):
+            existing = find_existing_external_ids([external_id for external_id in external_ids if external_id])
+        seen = set()
+        for position, external_id in enumerate(external_ids):
+            if external_id is None:
+                continue
+            if external_id in existing or external_id in seen:
+                errors[position] = self.add_field_error(errors[position], "external_id", message)
+            seen.add(external_id)
+
+    def add_field_error(self, error: dict, field_name: str, message: str) -> dict:
+        """
+        Returns the item error with the message added to the field, keeping the fields order.
+        """
+        detail = [ErrorDetail(message, code="unique")]
+        merged = {
+            name: detail if name == field_name else error[name]
+            for name in self.child.fields
+            if name in error or name == field_name
+        }
+        merged.update({name: value for name, value in error.items() if name not in merged})
+        return merged
+
+    def create(self, validated_data):
+        """
+        Create the customers with batched inserts.
+
+        Args:
+            validated_data (list): The validated customers.
+
+        Returns:
+            list: The created Customer instances.
+        """
+        batch_size = self.context.get("batch_size", settings.CUSTOMER_BULK_BATCH_SIZE)
+        customers = [Customer(**item) for item in validated_data]
+        with transaction.atomic():
+            return Customer.objects.bulk_create(customers, batch_size=batch_size)
 
 
 class CustomerSerializer(serializers.ModelSerializer):
@@ -19,14 +197,32 @@ class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = ["external_id", "status", "score", "preapproved_at"]
+        list_serializer_class = CustomerListSerializer
+
+    def get_fields(self):
+        """
+        Returns the fields of the serializer, with the `UniqueValidator` of the external_id
+        replaced by `CustomerUniqueValidator`.
+        """
+        fields = super().get_fields()
+        fields["external_id"].validators = [
+            (
+                CustomerUniqueValidator(validator.queryset, message=validator.message, lookup=validator.lookup)
+                if isinstance(validator, UniqueValidator)
+                else validator
+            )
+            for validator in fields["external_id"].validators
+        ]
+        return fields
 
 
 class CustomerSerializerBalance(serializers.ModelSerializer):
     """
     Serializer class for representing customer balance information.
 
-    This serializer calculates the available amount and total debt for a customer
-    based on their score and outstanding loans.
+    This serializer represents the available amount and total debt for a customer
+    based on their score and outstanding loans. The instances must have the `total_debt`
+    and `available_amount` annotations of `CustomerBalanceView.get_queryset`.
 
     Attributes:
         model (Customer): The Customer model class.
@@ -52,15 +248,11 @@ class CustomerSerializerBalance(serializers.ModelSerializer):
             A dictionary containing the serialized representation of the instance,
             including the external ID, score, available amount, and total debt.
         """
-        loans = Loan.objects.filter(customer=instance)
-        total_debt = sum(loan.outstanding for loan in loans)
-        available_amount = instance.score - total_debt
-
         return {
             "external_id": instance.external_id,
             "score": instance.score,
-            "available_amount": available_amount,
-            "total_debt": total_debt,
+            "available_amount": instance.available_amount,
+            "total_debt": instance.total_debt,
         }
 
 
@@ -77,3 +269,52 @@ class CustomerFileSerializer(serializers.Serializer):
     """
 
     file = serializers.FileField()
+
+
+class CustomerUploadJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the status of a customers upload processed in the background.
+
+    Fields:
+        id: The job id.
+        processing_type: The processing type of the upload.
+        status: The status of the job.
+        rows_done: The number of customers created.
+        rows_failed: The number of rows rejected.
+        throughput: The processed rows per second.
+        errors: The row errors of the upload.
+        error_message: The error that stopped the job, if any.
+    """
+
+    throughput = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CustomerUploadJob
+        fields = [
+            "id",
+            "processing_type",
+            "status",
+            "rows_done",
+            "rows_failed",
+            "throughput",
+            "errors",
+            "error_message",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_throughput(self, obj):
+        """
+        Method to get the processed rows per second of the job.
+
+        Args:
+            obj (CustomerUploadJob): The job object.
+
+        Returns:
+            float: The processed rows per second, 0 if the job has not started.
+        """
+        if not obj.started_at:
+            return 0
+        elapsed = ((obj.finished_at or timezone.now()) - obj.started_at).total_seconds()
+        return round((obj.rows_done + obj.rows_failed) / elapsed, 2) if elapsed else 0
@@ -0,0 +1,325 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from customers.factory import ProcessingFactory
+from customers.models import Customer, CustomerBalance, CustomerUploadJob
+from customers.serializers import CustomerFileSerializer
+from utils.messages import MESSAGE_UPLOAD_JOB_STALE
+
+
+class CustomerUploadJobService:
+    @staticmethod
+    def create_job(processing_type: str, request) -> CustomerUploadJob:
+        """
+        Store the upload of the request and create a pending job to process it.
+
+        Args:
+            processing_type (str): The processing type of the upload.
+            request (Request): The HTTP request object.
+
+        Returns:
+            CustomerUploadJob: The created job.
+
+        Raises:
+            ValidationError: If the processing type or the upload is not valid.
+        """
+        strategy = ProcessingFactory.get_chunked_strategy(processing_type)
+        if not strategy:
+            raise ValidationError(f"Invalid strategy: {processing_type}")
+        if processing_type.startswith("json"):
+            customers = request.data.get("customers")
+            if not isinstance(customers, list):
+                raise ValidationError({"customers": ["Expected a list of items."]})
+            file = ContentFile(json.dumps(customers, cls=DjangoJSONEncoder), name="customers.json")
+        else:
+            serializer = CustomerFileSerializer(data=request.data)
+            if not serializer.is_valid():
+                raise ValidationError(serializer.errors)
+            file = serializer.validated_data["file"]
+        return CustomerUploadJob.objects.create(user=request.user, processing_type=processing_type, file=file)
+
+    @staticmethod
+    def claim_job():
+        """
+        Take the oldest pending job and mark it as processing.
+
+        The row is locked with `SKIP LOCKED` so several workers can poll the table at the same
+        time and each job is taken by a single worker. The stale jobs are recovered first, so
+        the jobs of a killed worker are taken again.
+
+        Returns:
+            CustomerUploadJob: The claimed job, or None if there are no pending jobs.
+        """
+        CustomerUploadJobService.recover_stale_jobs()
+        with transaction.atomic():
+            job = CustomerUploadJob.objects.select_for_update(skip_locked=True).filter(status=1).order_by("id").first()
+            if not job:
+                return None
+            job.status = 2
+            job.attempts += 1
+            job.started_at = timezone.now()
+            job.save(update_fields=["status", "attempts", "started_at", "updated_at"])
+        return job
+
+    @staticmethod
+    def recover_stale_jobs() -> dict:
+        """
+        Requeue or fail the processing jobs whose worker stopped sending a heartbeat.
+
+        The heartbeat of a job is its `updated_at`, set when it is claimed and after every chunk.
+        A job without a heartbeat for `CUSTOMER_JOBS_STALE_TIMEOUT` seconds is requeued when
+        none of its rows were written and it has attempts left, otherwise it is marked as
+        failed and its file is deleted, processing it again would write its rows twice.
+
+        Returns:
+            dict: The number of jobs requeued and failed.
+        """
+        now = timezone.now()
+        deadline = now - timedelta(seconds=settings.CUSTOMER_JOBS_STALE_TIMEOUT)
+        recovered = {"requeued": 0, "failed": 0}
+        with transaction.atomic():
+            jobs = CustomerUploadJob.objects.select_for_update(skip_locked=True).filter(
+                status=2, updated_at__lt=deadline
+            )
+            for job in jobs:
+                if not job.rows_done and not job.rows_failed and job.attempts < settings.CUSTOMER_JOBS_MAX_ATTEMPTS:
+                    job.status = 1
+                    job.started_at = None
+                    job.save(update_fields=["status", "started_at", "updated_at"])
+                    recovered["requeued"] += 1
+                    continue
+                job.status = 4
+                job.error_message = MESSAGE_UPLOAD_JOB_STALE.format(attempts=job.attempts)
+                job.finished_at = now
+                job.save(update_fields=["status", "error_message", "finished_at", "updated_at"])
+                transaction.on_commit(partial(job.file.delete, save=False))
+                recovered["failed"] += 1
+        return recovered
+
+    @staticmethod
+    def run_job(job: CustomerUploadJob):
+        """
+        Process the stored upload of a job and keep its progress updated.
+
+        Args:
+            job (CustomerUploadJob): The job to process.
+        """
+        strategy = ProcessingFactory.get_chunked_strategy(job.processing_type)
+        # The progress of a strategy that writes the whole file in one transaction is written on
+        # its own connection, so it is visible while the job runs and does not lock the job row.
+        if strategy.single_transaction:
+            progress_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        else:
+            progress_connection = connection
+        table = CustomerUploadJob._meta.db_table
+
+        def on_chunk(chunk_report: dict):
+            with progress_connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET rows_done = rows_done + %s, rows_failed = rows_failed + %s, "  # nosec
+                    "updated_at = %s WHERE id = %s",
+                    [chunk_report["rows"] - chunk_report["failed"], chunk_report["failed"], timezone.now(), job.pk],
+                )
+
+        try:
+            with job.file.open("rb") as file:
+                report = strategy.process_file(file, on_chunk=on_chunk)
+        except Exception as e:  # pylint: disable=broad-except
+            job.refresh_from_db(fields=["rows_done", "rows_failed"])
+            if strategy.single_transaction:
+                job.rows_done = job.rows_failed = 0
+            job.status = 4
+            job.error_message = str(e)
+            job.finished_at = timezone.now()
+            job.save(update_fields=["rows_done", "rows_failed", "status", "error_message", "finished_at", "updated_at"])
+            return
+        finally:
+            if progress_connection is not connection:
+                progress_connection.close()
+        job.rows_failed = report["failed"] + report.get("skipped", 0)
+        job.rows_done = report["rows"] - job.rows_failed
+        job.status = 3
+        job.errors = report["errors"]
+        job.finished_at = timezone.now()
+        job.save(update_fields=["rows_done", "rows_failed", "status", "errors", "finished_at", "updated_at"])
+        job.file.delete(save=False)
+
+
+class CustomerBalanceService:
+    balance_fields = ["total_debt", "pending_total", "active_total", "available_amount"]
+
+    @staticmethod
+    def apply(customer_id: int, total_debt=0, pending_total=0, active_total=0):
+        """
+        Add the changes of a loan or payment write to the balance of a customer.
+
+        The balance is updated with a single `UPDATE` relative to the stored values, so it must
+        run in the transaction of the write. A customer without a balance gets it rebuilt from
+        its loans, which already include the write. The customer is locked first, so concurrent
+        first writes of a customer rebuild it one after another and the later ones only add their
+        change to the rebuilt balance.
+
+        Args:
+            customer_id (int): The id of the customer.
+            total_debt (Decimal): The change of the outstanding of the loans.
+            pending_total (Decimal): The change of the amount of the pending loans.
+            active_total (Decimal): The change of the amount of the active loans.
+        """
+        balance = CustomerBalance.objects.filter(customer_id=customer_id)
+        changes = {
+            "total_debt": F("total_debt") + total_debt,
+            "pending_total": F("pending_total") + pending_total,
+            "active_total": F("active_total") + active_total,
+            "available_amount": F("available_amount") - total_debt,
+            "updated_at": timezone.now(),
+        }
+        if balance.update(**changes):
+            return
+        CustomerBalanceService.lock_customers([customer_id])
+        if not balance.update(**changes):
+            CustomerBalanceService.rebuild(Customer.objects.filter(pk=customer_id))
+
+    @staticmethod
+    def apply_many(changes: dict):
+        """
+        Add the changes of a batch of writes to the balances of several customers.
+
+        The balances are updated with one `UPDATE` per `CUSTOMER_BULK_BATCH_SIZE` customers, the
+        change of every customer is selected with a `CASE` on its id. Customers without a
+        balance are locked and get it rebuilt from their loans, like in `apply`.
+
+        Args:
+            changes (dict): The changes by customer id, each a dictionary with any of the
+                total_debt, pending_total and active_total keys.
+        """
+        existing = set(
+            CustomerBalance.objects.filter(customer_id__in=list(changes)).values_list("customer_id", flat=True)
+        )
+        missing = set(changes) - existing
+        if missing:
+            CustomerBalanceService.lock_customers(missing)
+            existing.update(
+                CustomerBalance.objects.filter(customer_id__in=missing).values_list("customer_id", flat=True)
+            )
+            missing -= existing
+        amount_field = DecimalField(max_digits=14, decimal_places=2)
+        batch_size = settings.CUSTOMER_BULK_BATCH_SIZE
+
+        def change(field, customer_ids):
+            whens = [
+                When(customer_id=customer_id, then=Value(changes[customer_id][field]))
+                for customer_id in customer_ids
+                if changes[customer_id].get(field)
+            ]
+            return Case(*whens, default=Value(0), output_field=amount_field) if whens else Value(0)
+
+        remaining = iter(sorted(existing))
+        while customer_ids := list(islice(remaining, batch_size)):
+            total_debt = change("total_debt", customer_ids)
+            CustomerBalance.objects.filter(customer_id__in=customer_ids).update(
+                total_debt=F("total_debt") + total_debt,
+                pending_total=F("pending_total") + change("pending_total", customer_ids),
+                active_total=F("active_total") + change("active_total", customer_ids),
+                available_amount=F("available_amount") - total_debt,
+                updated_at=timezone.now(),
+            )
+        if missing:
+            CustomerBalanceService.rebuild(Customer.objects.filter(pk__in=missing))
+
+    @staticmethod
+    def lock_customers(customer_ids):
+        """
+        Lock the customers in id order until the end of the transaction.
+
+        Args:
+            customer_ids (Iterable): The ids of the customers.
+        """
+        list(Customer.objects.select_for_update().filter(pk__in=customer_ids).order_by("pk").values_list("pk"))
+
+    @staticmethod
+    def expected_balances(customers=None):
+        """
+        Compute the balances of the customers from their loans.
+
+        Args:
+            customers (QuerySet, optional): The customers, all of them by default.
+
+        Returns:
+            QuerySet: The id and the balance fields of every customer, as dictionaries.
+        """
+        amount_field = DecimalField(max_digits=14, decimal_places=2)
+
+        def total(field, condition=None):
+            return Coalesce(Sum(field, filter=condition), Value(0), output_field=amount_field)
+
+        customers = Customer.objects.all() if customers is None else customers
+        return (
+            customers.annotate(
+                total_debt=total("loans__outstanding"),
+                pending_total=total("loans__amount", Q(loans__status=1)),
+                active_total=total("loans__amount", Q(loans__status=2)),
+            )
+            .annotate(available_amount=F("score") - F("total_debt"))
+            .order_by("id")
+            .values("id", "external_id", *CustomerBalanceService.balance_fields)
+        )
+
+    @staticmethod
+    def rebuild(customers=None, dry_run: bool = False) -> list:
+        """
+        Rebuild the balances of the customers from their loans and report the drift.
+
+        The customers are read in batches of `CUSTOMER_BULK_BATCH_SIZE` and their balances are
+        written with `bulk_create(update_conflicts=True)`.
+
+        Args:
+            customers (QuerySet, optional): The customers, all of them by default.
+            dry_run (bool): Whether to only report the drift without writing the balances.
+
+        Returns:
+            list: A dictionary for every stored value different from the one computed from the
+                loans, with the external_id, field, stored and expected keys. Missing balances
+                of customers with loans are reported with a stored value of None, a customer
+                without loans needs no balance.
+        """
+        fields = CustomerBalanceService.balance_fields
+        batch_size = settings.CUSTOMER_BULK_BATCH_SIZE
+        expected = CustomerBalanceService.expected_balances(customers).iterator(chunk_size=batch_size)
+        drift = []
+        while batch := list(islice(expected, batch_size)):
+            stored = CustomerBalance.objects.in_bulk([row["id"] for row in batch], field_name="customer_id")
+            for row in batch:
+                balance = stored.get(row["id"])
+                if not balance and not any(row[field] for field in ["total_debt", "pending_total", "active_total"]):
+                    continue
+                drift.extend(
+                    {
+                        "external_id": row["external_id"],
+                        "field": field,
+                        "stored": getattr(balance, field) if balance else None,
+                        "expected": Decimal(row[field]),
+                    }
+                    for field in fields
+                    if not balance or getattr(balance, field) != row[field]
+                )
+            if dry_run:
+                continue
+            CustomerBalance.objects.bulk_create(
+                [CustomerBalance(customer_id=row["id"], **{field: row[field] for field in fields}) for row in batch],
+                update_conflicts=True,
+                unique_fields=["customer"],
+                update_fields=[*fields, "updated_at"],
+            )
+        return drift
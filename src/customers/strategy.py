@@ -1,9 +1,30 @@
+import csv
+import io
+import json
+import logging
 from abc import ABC, abstractmethod
+from decimal import Decimal
+from itertools import islice
 
+import ijson
 import pandas as pd
-from rest_framework.exceptions import ValidationError
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.fields import Field, empty
+from rest_framework.serializers import ListSerializer
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
 
+from customers.models import Customer
 from customers.serializers import CustomerFileSerializer, CustomerSerializer
+from customers.utils import find_existing_external_ids, upsert_customers
+from customers.validation import CustomerDataFrameValidator
+from utils.messages import MESSAGE_INVALID_JSON, MESSAGE_INVALID_JSON_LINE
+
+logger = logging.getLogger(__name__)
 
 
 class ProcessingStrategy(ABC):
@@ -41,6 +62,9 @@ class TxtProcessing(ProcessingStrategy):
         """
         Process the customer data from a file.
 
+        The rows are validated column by column with `CustomerDataFrameValidator` and, when all
+        of them are valid, inserted with the bulk path of `CustomerSerializer`.
+
         Args:
             request (Request): The HTTP request object.
 
@@ -53,10 +77,590 @@ class TxtProcessing(ProcessingStrategy):
         serializer = CustomerFileSerializer(data=request.data)
         if serializer.is_valid():
             file = serializer.validated_data["file"]
-            dataframe = pd.read_csv(file, delimiter=",")
-            serializer = CustomerSerializer(data=dataframe.to_dict(orient="records"), many=True)
-            if serializer.is_valid():
-                serializer.save()
-                return serializer.data
-            raise ValidationError(serializer.errors)
+            dataframe = pd.read_csv(file, delimiter=",", dtype=str, keep_default_na=False)
+            rows, errors = CustomerDataFrameValidator().validate(dataframe)
+            if errors:
+                raise ValidationError([errors.get(position, {}) for position in range(len(dataframe))])
+            customers = CustomerSerializer(many=True).create(rows)
+            return CustomerSerializer(customers, many=True).data
         raise ValidationError(serializer.errors)
+
+
+class ChunkedProcessing(ProcessingStrategy):
+    """
+    A base processing strategy that validates and inserts customers in fixed-size chunks.
+
+    Each chunk is validated with `CustomerSerializer` and the valid rows are written with
+    `bulk_create` in their own transaction, so peak memory depends on the chunk size and not
+    on the size of the upload. Invalid rows are skipped and reported with their row number, as
+    are the rows whose external_id was inserted by another request after the validation.
+    Subclasses implement `read_chunks` for their input format.
+
+    Attributes:
+        max_reported_errors (int): The maximum number of row errors kept in the report.
+        serializer_context (dict): The context passed to `CustomerSerializer`.
+        single_transaction (bool): Whether the whole file is written in a single transaction,
+            the progress of a job must then be written on another connection.
+
+    Methods:
+        processing(request): Validates the upload and processes the file.
+        read_chunks(file): Yields the records of a file in chunks.
+        process_file(file, on_chunk): Processes a file object and returns the report.
+        process_chunks(chunks, on_chunk): Processes an iterable of chunks and returns the report.
+        read_until_error(chunks, report): Yields the chunks and reports a read error.
+        process_chunk(records, first_row): Validates and writes a single chunk.
+        validate_chunk(records): Validates a chunk and splits the valid rows from the errors.
+        write_rows(rows, lines): Writes the valid rows of a chunk.
+    """
+
+    max_reported_errors = 1000
+    serializer_context: dict = {}
+    single_transaction = False
+
+    def processing(self, request):
+        """
+        Process the customer data from a file in chunks.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            dict: The processing report with totals, per-chunk progress and row errors.
+
+        Raises:
+            ValidationError: If the uploaded file is not valid.
+        """
+        serializer = CustomerFileSerializer(data=request.data)
+        if serializer.is_valid():
+            return self.process_file(serializer.validated_data["file"])
+        raise ValidationError(serializer.errors)
+
+    @abstractmethod
+    def read_chunks(self, file):
+        """
+        Yields the records of the file in lists of at most `CUSTOMER_UPLOAD_CHUNK_SIZE` items.
+        """
+
+    def process_file(self, file, on_chunk=None):
+        """
+        Process a customers file chunk by chunk.
+
+        Args:
+            file (File): The file object with the customers.
+            on_chunk (callable, optional): Called with the report of every processed chunk.
+
+        Returns:
+            dict: The processing report with totals, per-chunk progress and row errors.
+        """
+        return self.process_chunks(self.read_chunks(file), on_chunk=on_chunk)
+
+    def process_chunks(self, chunks, on_chunk=None):
+        """
+        Process the customers chunk by chunk.
+
+        The chunks already processed are committed, so when the file cannot be read after the
+        first chunk the processing stops and the report is returned with `truncated` set and
+        the read error reported on the first row that was not processed.
+
+        Args:
+            chunks (iterable): An iterable of lists of records.
+            on_chunk (callable, optional): Called with the report of every processed chunk.
+
+        Returns:
+            dict: The processing report with totals, per-chunk progress and row errors.
+
+        Raises:
+            ValidationError: If the file cannot be read before the first chunk is processed.
+        """
+        report = {"rows": 0, "created": 0, "failed": 0, "truncated": False, "chunks": [], "errors": []}
+        for number, records in enumerate(self.read_until_error(chunks, report), start=1):
+            chunk_report = self.process_chunk(records, first_row=report["rows"] + 1)
+            available = self.max_reported_errors - len(report["errors"])
+            report["errors"].extend(chunk_report.pop("errors")[:available])
+            for key, value in chunk_report.items():
+                report[key] = report.get(key, 0) + value
+            chunk_report["chunk"] = number
+            report["chunks"].append(chunk_report)
+            logger.info(
+                "Customers chunk %s processed: %s rows, %s created, %s failed",
+                number,
+                chunk_report["rows"],
+                chunk_report["created"],
+                chunk_report["failed"],
+            )
+            if on_chunk:
+                on_chunk(chunk_report)
+        return report
+
+    def read_until_error(self, chunks, report: dict):
+        """
+        Yields the chunks until the file cannot be read, then reports the read error.
+
+        Args:
+            chunks (iterable): An iterable of lists of records.
+            report (dict): The processing report, updated in place on a read error.
+
+        Yields:
+            list: The records of the chunk.
+
+        Raises:
+            ValidationError: If the file cannot be read before the first chunk is processed.
+        """
+        chunks = iter(chunks)
+        while True:
+            try:
+                records = next(chunks)
+            except StopIteration:
+                return
+            except (ValidationError, ValueError) as exc:
+                detail = exc.detail if isinstance(exc, ValidationError) else [str(exc)]
+                if not report["rows"]:
+                    raise ValidationError(detail) from exc
+                report["truncated"] = True
+                report["errors"].append(
+                    {"row": report["rows"] + 1, "errors": {api_settings.NON_FIELD_ERRORS_KEY: detail}}
+                )
+                logger.warning("Customers file truncated after row %s: %s", report["rows"], detail)
+                return
+            yield records
+
+    def process_chunk(self, records: list, first_row: int = 1):
+        """
+        Validate a chunk of records and write the valid ones.
+
+        When the write fails because another request inserted some of the external_ids after
+        the validation, those rows get the unique error and the rest of the chunk is written
+        again.
+
+        Args:
+            records (list): The records of the chunk.
+            first_row (int): The row number of the first record in the file.
+
+        Returns:
+            dict: The chunk report with the rows, created, failed and errors keys, plus the
+                counters returned by `write_rows`.
+        """
+        rows, errors = self.validate_chunk(records)
+        positions = [position for position in range(len(records)) if position not in errors]
+        while True:
+            try:
+                with transaction.atomic():
+                    counters = self.write_rows(rows, [first_row + position for position in positions])
+                break
+            except IntegrityError:
+                conflicts = find_existing_external_ids([row["external_id"] for row in rows])
+                if not conflicts:
+                    raise
+                message = [ErrorDetail(self.unique_message(), code="unique")]
+                for position, row in zip(positions, rows):
+                    if row["external_id"] in conflicts:
+                        errors[position] = {"external_id": message}
+                kept = [(position, row) for position, row in zip(positions, rows) if position not in errors]
+                positions, rows = [position for position, _ in kept], [row for _, row in kept]
+        return {
+            "rows": len(records),
+            **counters,
+            "failed": len(records) - len(rows),
+            "errors": [{"row": first_row + position, "errors": errors[position]} for position in sorted(errors)],
+        }
+
+    def unique_message(self) -> str:
+        """
+        Returns the message of the `UniqueValidator` of the external_id.
+        """
+        validators = CustomerSerializer().fields["external_id"].validators
+        return next(validator.message for validator in validators if isinstance(validator, UniqueValidator))
+
+    def validate_chunk(self, records: list):
+        """
+        Validate a chunk of records with `CustomerSerializer`.
+
+        Args:
+            records (list): The records of the chunk.
+
+        Returns:
+            tuple: The validated rows and a dictionary with the errors by position in the chunk.
+        """
+        serializer = CustomerSerializer(data=records, many=True, context=self.serializer_context)
+        if serializer.is_valid():
+            return serializer.validated_data, {}
+        errors = {position: error for position, error in enumerate(serializer.errors) if error}
+        positions = [position for position in range(len(records)) if position not in errors]
+        rows, retry_errors = self.validate_chunk([records[position] for position in positions])
+        errors.update({positions[position]: error for position, error in retry_errors.items()})
+        return rows, errors
+
+    def write_rows(self, rows: list, lines: list) -> dict:
+        """
+        Insert the validated rows with `bulk_create`.
+
+        Args:
+            rows (list): The validated rows.
+            lines (list): The row number in the file of every validated row.
+
+        Returns:
+            dict: The number of customers created.
+        """
+        customers = [Customer(**row) for row in rows]
+        Customer.objects.bulk_create(customers, batch_size=settings.CUSTOMER_BULK_BATCH_SIZE)
+        return {"created": len(customers)}
+
+
+class DataFrameChunkedProcessing(ChunkedProcessing):
+    """
+    A base chunked processing strategy for formats read into pandas DataFrames.
+
+    Each chunk is validated column by column with `CustomerDataFrameValidator`, subclasses
+    implement `read_chunks` yielding a DataFrame per chunk.
+    """
+
+    def validate_chunk(self, records: pd.DataFrame):
+        """
+        Validate a chunk of rows with `CustomerDataFrameValidator`.
+
+        Args:
+            records (DataFrame): The rows of the chunk.
+
+        Returns:
+            tuple: The validated rows and a dictionary with the errors by position in the chunk.
+        """
+        validator = CustomerDataFrameValidator(check_existing=self.serializer_context.get("check_existing", True))
+        return validator.validate(records)
+
+
+class TxtChunkedProcessing(DataFrameChunkedProcessing):
+    """
+    A chunked processing strategy for customers files in csv format.
+
+    The file is read with pandas `CUSTOMER_UPLOAD_CHUNK_SIZE` rows at a time. All the columns are
+    read as text so every chunk is validated the same way regardless of the inferred dtypes.
+    """
+
+    def read_chunks(self, file):
+        """
+        Yields the rows of the csv file in chunks.
+
+        Args:
+            file (File): The file object with the customers in csv format.
+
+        Yields:
+            DataFrame: The rows of the chunk.
+        """
+        reader = pd.read_csv(
+            file,
+            delimiter=",",
+            dtype=str,
+            keep_default_na=False,
+            chunksize=settings.CUSTOMER_UPLOAD_CHUNK_SIZE,
+        )
+        with reader:
+            yield from reader
+
+
+class ParquetChunkedProcessing(DataFrameChunkedProcessing):
+    """
+    A chunked processing strategy for customers files in Parquet format.
+
+    The file is read `CUSTOMER_UPLOAD_CHUNK_SIZE` rows at a time with the column types of the
+    file, so integer statuses, decimal scores and timestamps are validated without parsing text.
+    """
+
+    def read_chunks(self, file):
+        """
+        Yields the rows of the Parquet file in chunks.
+
+        Args:
+            file (File): The file object with the customers in Parquet format.
+
+        Yields:
+            DataFrame: The rows of the chunk.
+        """
+        parquet_file = pq.ParquetFile(file)
+        for batch in parquet_file.iter_batches(batch_size=settings.CUSTOMER_UPLOAD_CHUNK_SIZE):
+            yield batch.to_pandas(integer_object_nulls=True)
+
+
+class ArrowChunkedProcessing(DataFrameChunkedProcessing):
+    """
+    A chunked processing strategy for customers files in Arrow IPC format.
+
+    Both the streaming and the file (random access) formats are accepted. The record batches of
+    the file are split in chunks of at most `CUSTOMER_UPLOAD_CHUNK_SIZE` rows and read with their
+    column types, like the Parquet files.
+    """
+
+    file_magic = b"ARROW1"
+
+    def read_chunks(self, file):
+        """
+        Yields the rows of the Arrow file in chunks.
+
+        Args:
+            file (File): The file object with the customers in Arrow IPC format.
+
+        Yields:
+            DataFrame: The rows of the chunk.
+        """
+        chunk_size = settings.CUSTOMER_UPLOAD_CHUNK_SIZE
+        is_file_format = file.read(len(self.file_magic)) == self.file_magic
+        file.seek(0)
+        if is_file_format:
+            reader = pa.ipc.open_file(file)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+        else:
+            batches = pa.ipc.open_stream(file)
+        for batch in batches:
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size).to_pandas(integer_object_nulls=True)
+
+
+class NdjsonChunkedProcessing(DataFrameChunkedProcessing):
+    """
+    A chunked processing strategy for customers files in NDJSON format, one customer per line.
+
+    The file is read one line at a time and only the customers of the current chunk are kept
+    in memory. Decimal numbers are read as `Decimal`, so the scores keep their digits. Blank
+    lines are ignored. A line that is not a JSON object stops the processing, the customers of
+    the previous chunks are kept.
+    """
+
+    def read_chunks(self, file):
+        """
+        Yields the customers of the NDJSON file in chunks.
+
+        Args:
+            file (File): The file object with a JSON object per line.
+
+        Yields:
+            DataFrame: The customers of the chunk.
+
+        Raises:
+            ValidationError: If a line is not a JSON object.
+        """
+        chunk_size = settings.CUSTOMER_UPLOAD_CHUNK_SIZE
+        records = []
+        for number, line in enumerate(file, start=1):
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line, parse_float=Decimal)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                raise ValidationError(MESSAGE_INVALID_JSON_LINE.format(line=number))
+            records.append(record)
+            if len(records) == chunk_size:
+                yield self.build_dataframe(records)
+                records = []
+        if records:
+            yield self.build_dataframe(records)
+
+    def build_dataframe(self, records: list) -> pd.DataFrame:
+        """
+        Build the DataFrame of a chunk, the keys missing from a line are set to `empty` so they
+        are told apart from explicit nulls.
+
+        Args:
+            records (list): The customers of the chunk.
+
+        Returns:
+            DataFrame: The customers of the chunk.
+        """
+        names = list(dict.fromkeys(name for record in records for name in record))
+        return pd.DataFrame({name: [record.get(name, empty) for record in records] for name in names}, dtype=object)
+
+
+class JsonChunkedProcessing(ChunkedProcessing):
+    """
+    A chunked processing strategy for customers sent as a JSON list.
+
+    The `customers` list of a JSON request body, or the list stored in a JSON file, is read
+    incrementally with `ijson` and validated and inserted `CUSTOMER_UPLOAD_CHUNK_SIZE` customers
+    at a time, so only the current chunk is kept in memory whatever the size of the payload.
+    Decimal numbers are read as `Decimal`.
+    """
+
+    def processing(self, request):
+        """
+        Process the customers of the request body in chunks, as the body is read.
+
+        The request body is read from `request.stream` instead of `request.data`, so the body is
+        never loaded as a whole. The `customers` key is checked from the parser events, like the
+        `json` processing it must be a list.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            dict: The processing report with totals, per-chunk progress and row errors, with
+                `truncated` set when the body stops being valid JSON after the first chunk.
+
+        Raises:
+            ValidationError: If the body is not valid JSON before the first chunk is processed,
+                or if its `customers` key is missing or is not a list.
+        """
+        events = ijson.parse(request.stream) if request.stream is not None else iter(())
+        return self.process_chunks(self.read_chunks(self.check_customers(events), prefix="customers.item"))
+
+    def check_customers(self, events):
+        """
+        Yields the parser events of the request body, checking that its `customers` key is a list.
+
+        Args:
+            events (iterable): The `ijson.parse` events of the body.
+
+        Yields:
+            tuple: The prefix, event and value of every parser event.
+
+        Raises:
+            ValidationError: If the `customers` key is not a list, when its value is read, or if
+                the body has no `customers` key, when the body ends.
+        """
+        found = False
+        for prefix, event, value in events:
+            if prefix == "customers" and not found:
+                if event != "start_array":
+                    input_type = "dict" if event == "start_map" else type(value).__name__
+                    message = ListSerializer.default_error_messages["not_a_list"].format(input_type=input_type)
+                    raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]})
+                found = True
+            yield prefix, event, value
+        if not found:
+            raise ValidationError({"customers": [Field.default_error_messages["required"]]})
+
+    def read_chunks(self, file, prefix: str = "item"):
+        """
+        Yields the customers of a JSON file in chunks.
+
+        Args:
+            file (File): The file object with the JSON document.
+            prefix (str): The ijson prefix of the customers in the document, by default the
+                items of a top level list.
+
+        Yields:
+            list: The records of the chunk.
+
+        Raises:
+            ValidationError: If the file is not valid JSON.
+        """
+        chunk_size = settings.CUSTOMER_UPLOAD_CHUNK_SIZE
+        items = ijson.items(file, prefix) if file is not None else iter(())
+        try:
+            while records := list(islice(items, chunk_size)):
+                yield records
+        except ijson.JSONError as e:
+            raise ValidationError(MESSAGE_INVALID_JSON.format(error=e))
+
+
+class TxtUpsertProcessing(TxtChunkedProcessing):
+    """
+    A chunked processing strategy that upserts the customers of a csv file by external_id.
+
+    New external_ids are inserted and existing ones get their status, score and preapproved_at
+    updated, only when at least one of them changed. Re-sending a file is therefore safe and
+    only touches the rows that are different.
+    """
+
+    serializer_context = {"check_existing": False}
+
+    def write_rows(self, rows: list, lines: list) -> dict:
+        """
+        Upsert the validated rows.
+
+        Args:
+            rows (list): The validated rows.
+            lines (list): The row number in the file of every validated row.
+
+        Returns:
+            dict: The number of customers created, updated and unchanged.
+        """
+        return upsert_customers(rows)
+
+
+class TxtCopyProcessing(TxtChunkedProcessing):
+    """
+    A processing strategy that loads a csv file with PostgreSQL `COPY`.
+
+    Every chunk is validated with `CustomerSerializer` and the valid rows are streamed into a
+    temporary staging table with `COPY FROM STDIN`, with their row number. When the whole file
+    is staged, the rows are merged into the customers table with a single
+    `INSERT ... SELECT ... ON CONFLICT DO NOTHING`. The file is loaded in one transaction, rows
+    that conflict at merge time (an external_id repeated in the file or inserted concurrently)
+    are counted as skipped and reported with the unique error. Of the rows repeating an
+    external_id in the file, the first one is inserted.
+    """
+
+    staging_table = "tmp_customers_customer_staging"
+    columns = ["external_id", "status", "score", "preapproved_at"]
+    single_transaction = True
+
+    def process_chunks(self, chunks, on_chunk=None):
+        """
+        Stage every chunk and merge the staged rows into the customers table.
+
+        Args:
+            chunks (iterable): An iterable of lists of records.
+            on_chunk (callable, optional): Called with the report of every processed chunk.
+
+        Returns:
+            dict: The processing report with totals, per-chunk progress and row errors.
+
+        Raises:
+            ValidationError: If the database is not PostgreSQL.
+        """
+        if connection.vendor != "postgresql":
+            raise ValidationError("The copy strategy requires PostgreSQL.")
+        table = Customer._meta.db_table
+        columns = ", ".join(self.columns)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {self.staging_table} "  # nosec
+                "(external_id varchar(60), status smallint, score numeric(12, 2), preapproved_at timestamptz, "
+                "line integer) ON COMMIT DROP"
+            )
+            report = super().process_chunks(chunks, on_chunk=on_chunk)
+            cursor.execute(
+                f"WITH inserted AS (INSERT INTO {table} ({columns}, created_at, updated_at) "  # nosec
+                f"SELECT DISTINCT ON (external_id) {columns}, now(), now() FROM {self.staging_table} "
+                "ORDER BY external_id, line ON CONFLICT (external_id) DO NOTHING RETURNING external_id), "
+                "merged AS (SELECT staging.line, inserted.external_id IS NOT NULL "
+                "AND staging.line = min(staging.line) OVER (PARTITION BY staging.external_id) AS created "
+                f"FROM {self.staging_table} staging "
+                "LEFT JOIN inserted ON inserted.external_id = staging.external_id) "
+                "SELECT count(*) FILTER (WHERE created), "
+                "(array_agg(line ORDER BY line) FILTER (WHERE NOT created))[1:%s] FROM merged",
+                [self.max_reported_errors],
+            )
+            created, skipped_lines = cursor.fetchone()
+            report["created"] = created
+            report["skipped"] = report.get("staged", 0) - created
+            message = [ErrorDetail(self.unique_message(), code="unique")]
+            skipped_errors = [{"row": line, "errors": {"external_id": message}} for line in skipped_lines or []]
+            errors = sorted(report["errors"] + skipped_errors, key=lambda error: error["row"])
+            report["errors"] = errors[: self.max_reported_errors]
+            cursor.execute(f"DROP TABLE {self.staging_table}")
+        return report
+
+    def write_rows(self, rows: list, lines: list) -> dict:
+        """
+        Stream the validated rows into the staging table with `COPY FROM STDIN`.
+
+        Args:
+            rows (list): The validated rows.
+            lines (list): The row number in the file of every validated row.
+
+        Returns:
+            dict: The number of rows staged.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row, line in zip(rows, lines):
+            writer.writerow([row["external_id"], row["status"], row["score"], row["preapproved_at"].isoformat(), line])
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self.staging_table} ({', '.join(self.columns)}, line) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        return {"created": 0, "staged": len(rows)}
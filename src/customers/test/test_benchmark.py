@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import signal
+import tempfile
+from test.test_setup import TestSetup
+
+import django
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase
+
+from customers.benchmark import find_regressions, measure_isolated, run_suite
+from customers.factory import ProcessingFactory
+from customers.models import Customer
+
+
+class TestIngestionBenchmark(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestIngestionBenchmark, cls).setUpClass()
+        django.setup()
+
+    def test_run_suite_every_strategy(self):
+        """
+        Test case to verify that every strategy of the factory is measured with a payload of its
+        format and that the customers created by the runs are rolled back.
+        """
+        strategies = list(ProcessingFactory.strategy_map_processing)
+        results = run_suite([20], strategies, isolate=False)
+        assert set(results) == set(strategies)
+        for result in (sizes["20"] for sizes in results.values()):
+            assert result["rows_per_second"] > 0
+            assert result["queries"] > 0
+            assert result["peak_rss_mb"] > 0
+        assert Customer.objects.count() == 0
+
+    def test_run_suite_serializer(self):
+        """
+        Test case to verify that the per-row and bulk serializer saves are measured with the
+        strategies and that the command prints the speedup of the bulk save.
+        """
+        results = run_suite([20], ["txt"], isolate=False, serializer=True, batch_size=5)
+        assert set(results) == {"txt", "serializer_per_row", "serializer_bulk"}
+        assert results["serializer_bulk"]["20"]["queries"] < results["serializer_per_row"]["20"]["queries"]
+        stdout = io.StringIO()
+        call_command(
+            "benchmark_ingestion",
+            "--sizes",
+            "10",
+            "--strategies",
+            "txt",
+            "--no-isolation",
+            "--serializer",
+            stdout=stdout,
+        )
+        assert "bulk serializer save is" in stdout.getvalue()
+        assert Customer.objects.count() == 0
+
+    def test_find_regressions(self):
+        """
+        Test case to verify the comparison of the results with the baseline, the rows per second
+        and the peak RSS are allowed to change within the tolerance and the queries are not.
+        """
+        baseline = {"txt": {"1000": {"rows_per_second": 1000, "peak_rss_mb": 100, "queries": 5}}}
+        within = {"txt": {"1000": {"rows_per_second": 850, "peak_rss_mb": 115, "queries": 5}}}
+        worse = {"txt": {"1000": {"rows_per_second": 700, "peak_rss_mb": 130, "queries": 6}}}
+        missing = {"copy": {"1000": {"rows_per_second": 1, "peak_rss_mb": 1000, "queries": 100}}}
+        assert find_regressions(within, baseline, tolerance=0.2) == []
+        assert find_regressions(missing, baseline, tolerance=0.2) == []
+        assert find_regressions(worse, baseline, tolerance=0.2) == [
+            "txt rows=1000 rows_per_second: 700 (baseline 1000)",
+            "txt rows=1000 peak_rss_mb: 130 (baseline 100)",
+            "txt rows=1000 queries: 6 (baseline 5)",
+        ]
+
+    def test_benchmark_command_fails_on_regression(self):
+        """
+        Test case to verify that the command stores a baseline and fails against a baseline it
+        can not reach.
+        """
+        options = ["--sizes", "10", "--strategies", "txt_chunked", "--no-isolation"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            call_command("benchmark_ingestion", *options, "--baseline", path, "--save-baseline", stdout=io.StringIO())
+            with open(path) as file:
+                baseline = json.load(file)
+            assert set(baseline["txt_chunked"]["10"]) == {"seconds", "queries", "rows_per_second", "peak_rss_mb"}
+            baseline["txt_chunked"]["10"]["queries"] = 0
+            with open(path, "w") as file:
+                json.dump(baseline, file)
+            with self.assertRaises(CommandError):
+                call_command("benchmark_ingestion", *options, "--baseline", path, stdout=io.StringIO())
+
+
+class TestMeasureIsolated(TransactionTestCase):
+    def test_measure_isolated_killed_process(self):
+        """
+        Test case to verify that a benchmark process killed before sending its result raises an
+        error instead of waiting forever.
+        """
+        with self.assertRaisesMessage(RuntimeError, f"exited with code {-signal.SIGKILL} without a result"):
+            measure_isolated(lambda: os.kill(os.getpid(), signal.SIGKILL), 10)
@@ -0,0 +1,106 @@
+import io
+from decimal import Decimal
+from test.test_setup import TestSetup
+
+import django
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, CustomerBalance
+from customers.utils import upsert_customers
+from loans.models import Loan
+
+
+class TestCustomerBalance(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestCustomerBalance, cls).setUpClass()
+        django.setup()
+
+    def setUp(self):
+        super().setUp()
+        self.url_loan = reverse("loans:loan")
+        self.url_loan_update = reverse("loans:loan_status")
+        self.url_payment = reverse("payments:payment")
+        self.url_balance = reverse("customers:customer_balance")
+        self.customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+
+    def assert_balance(self, total_debt, pending_total, active_total):
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        assert balance.total_debt == Decimal(total_debt)
+        assert balance.pending_total == Decimal(pending_total)
+        assert balance.active_total == Decimal(active_total)
+        assert balance.available_amount == self.customer.score - Decimal(total_debt)
+
+    def test_balance_updated_on_write(self):
+        """
+        Test case to verify that the balance is updated when a loan is created and activated and
+        when a payment is made, and that the balance endpoint reads it.
+        """
+        for external_id, amount in [("1", 1000), ("2", 500)]:
+            body_loan = {"customer": self.customer.id, "amount": amount, "external_id": external_id}
+            response = self.client_auth.post(self.url_loan, body_loan, format="json")
+            assert response.status_code == 201
+        self.assert_balance("1500", "1500", "0")
+
+        response = self.client_auth.put(self.url_loan_update, {"external_id": "1", "status": 2}, format="json")
+        assert response.status_code == 200
+        self.assert_balance("1500", "500", "1000")
+
+        body_payment = {
+            "payment_detail": [{"amount": 500, "loan_external_id": "1"}],
+            "payment": {"external_id": "p1", "customer_external_id": "12"},
+        }
+        response = self.client_auth.post(self.url_payment, body_payment, format="json")
+        assert response.status_code == 201
+        self.assert_balance("1000", "500", "1000")
+
+        response = self.client_auth.get(self.url_balance)
+        balance = response.json()["results"][0]
+        assert Decimal(str(balance["total_debt"])) == Decimal("1000")
+        assert Decimal(str(balance["available_amount"])) == Decimal("9000")
+
+    def test_balance_created_for_existing_loans(self):
+        """
+        Test case to verify that a customer without balance gets it built from all its loans, the
+        loans written before the ledger existed included.
+        """
+        Loan.objects.create(external_id="1", amount=1000, outstanding=800, status=2, customer=self.customer)
+        body_loan = {"customer": self.customer.id, "amount": 100, "external_id": "2"}
+        response = self.client_auth.post(self.url_loan, body_loan, format="json")
+        assert response.status_code == 201
+        self.assert_balance("900", "100", "1000")
+
+    def test_reconcile_customer_balances(self):
+        """
+        Test case to verify that the reconcile command reports the drift, only writes without
+        --dry-run and leaves no drift after rebuilding.
+        """
+        Loan.objects.create(external_id="1", amount=1000, outstanding=1000, status=1, customer=self.customer)
+        Customer.objects.create(external_id="13", status=1, score=10, preapproved_at=timezone.now())
+        CustomerBalance.objects.create(customer=self.customer, total_debt=10, pending_total=1000, available_amount=9990)
+
+        out = io.StringIO()
+        call_command("reconcile_customer_balances", "--dry-run", stdout=out)
+        assert "customer=12 total_debt: stored=10.00 expected=1000.00" in out.getvalue()
+        assert "customer=12 available_amount: stored=9990.00 expected=9000.00" in out.getvalue()
+        assert "2 drifted values in 1 customers, nothing was written" in out.getvalue()
+        assert CustomerBalance.objects.get(customer=self.customer).total_debt == 10
+
+        call_command("reconcile_customer_balances", stdout=io.StringIO())
+        self.assert_balance("1000", "1000", "0")
+        assert CustomerBalance.objects.get(customer__external_id="13").available_amount == 10
+        out = io.StringIO()
+        call_command("reconcile_customer_balances", "--dry-run", stdout=out)
+        assert "0 drifted values in 0 customers" in out.getvalue()
+
+    def test_upsert_refreshes_available_amount(self):
+        """
+        Test case to verify that the available amount follows the new score of an upserted customer.
+        """
+        CustomerBalance.objects.create(customer=self.customer, total_debt=1000, pending_total=1000, available_amount=9000)
+        row = {"external_id": "12", "status": 1, "score": Decimal("5000"), "preapproved_at": timezone.now()}
+        assert upsert_customers([row])["updated"] == 1
+        self.customer.refresh_from_db()
+        self.assert_balance("1000", "1000", "0")
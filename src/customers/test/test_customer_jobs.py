@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from test.test_setup import TestSetup
+
+import django
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, CustomerUploadJob
+from customers.services import CustomerUploadJobService
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestCustomerJobs(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestCustomerJobs, cls).setUpClass()
+        django.setup()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super(TestCustomerJobs, cls).tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("customers:customer")
+
+    def test_create_customer_txt_async(self):
+        """
+        Test case to verify that an async txt upload is queued and processed by the workers.
+
+        The upload returns a 202 with a pending job, the worker command processes it and the
+        status endpoint reports the rows done and failed.
+        """
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers_chunked.txt")
+        with open(file_path, "rb") as f:
+            file = SimpleUploadedFile(f.name, f.read(), content_type="text/plain")
+            response = self.client_auth.post(
+                f"{self.url}?processing_type=txt&async=true", {"file": file}, format="multipart"
+            )
+        assert response.status_code == 202
+        assert response.json()["status"] == 1
+        assert Customer.objects.count() == 0
+
+        call_command("process_customer_jobs", "--once")
+
+        response_status = self.client_auth.get(reverse("customers:customer_job", args=[response.json()["id"]]))
+        assert response_status.status_code == 200
+        job = response_status.json()
+        assert job["status"] == 3
+        assert job["rows_done"] == 3
+        assert job["rows_failed"] == 2
+        assert job["throughput"] > 0
+        assert len(job["errors"]) == 2
+        assert Customer.objects.count() == 3
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_copy_async(self):
+        """
+        Test case to verify that an async copy upload counts the rows skipped at merge time as
+        failed and reports them with their row number.
+        """
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers_chunked.txt")
+        with open(file_path, "rb") as f:
+            file = SimpleUploadedFile(f.name, f.read(), content_type="text/plain")
+            response = self.client_auth.post(
+                f"{self.url}?processing_type=copy&async=true", {"file": file}, format="multipart"
+            )
+        assert response.status_code == 202
+
+        call_command("process_customer_jobs", "--once")
+
+        job = CustomerUploadJob.objects.get(pk=response.json()["id"])
+        assert job.status == 3
+        assert job.rows_done == 3
+        assert job.rows_failed == 2
+        assert [error["row"] for error in job.errors] == [3, 5]
+        assert Customer.objects.count() == 3
+
+    def test_create_customer_json_async(self):
+        """
+        Test case to verify that an async JSON upload is queued and processed by the workers.
+        """
+        body = {
+            "customers": [
+                {
+                    "external_id": "12",
+                    "status": 1,
+                    "score": 100,
+                    "preapproved_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
+                }
+            ]
+        }
+        response = self.client_auth.post(f"{self.url}?processing_type=json&async=true", body, format="json")
+        assert response.status_code == 202
+
+        call_command("process_customer_jobs", "--once")
+
+        job = CustomerUploadJob.objects.get(pk=response.json()["id"])
+        assert job.status == 3
+        assert job.rows_done == 1
+        assert Customer.objects.filter(external_id="12").exists()
+
+    def test_create_customer_async_invalid_strategy(self):
+        """
+        Test case to verify that an async upload with an invalid processing type is rejected.
+        """
+        response = self.client_auth.post(f"{self.url}?processing_type=xml&async=true", {}, format="json")
+        assert response.status_code == 422
+        assert CustomerUploadJob.objects.count() == 0
+
+    def test_job_status_not_found(self):
+        """
+        Test case to verify that the status of a job of another user is not returned.
+        """
+        job = CustomerUploadJob.objects.create(processing_type="txt", file="customer_uploads/file.txt")
+        response = self.client_auth.get(reverse("customers:customer_job", args=[job.pk]))
+        assert response.status_code == 404
+
+    def create_stale_job(self, **fields):
+        """
+        Create a processing job whose last heartbeat is older than the stale timeout.
+        """
+        job = CustomerUploadJob.objects.create(
+            processing_type="txt", file=ContentFile(b"external_id\n", name="customers.txt"), status=2, **fields
+        )
+        CustomerUploadJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=601))
+        return job
+
+    @override_settings(CUSTOMER_JOBS_STALE_TIMEOUT=600, CUSTOMER_JOBS_MAX_ATTEMPTS=3)
+    def test_claim_job_requeues_stale_job(self):
+        """
+        Test case to verify that a processing job without heartbeat and without written rows is
+        claimed again, while a job with a recent heartbeat is left to its worker.
+        """
+        stale = self.create_stale_job(attempts=1)
+        running = CustomerUploadJob.objects.create(processing_type="txt", file="customer_uploads/file.txt", status=2)
+
+        job = CustomerUploadJobService.claim_job()
+
+        assert job.pk == stale.pk
+        assert job.status == 2
+        assert job.attempts == 2
+        assert CustomerUploadJobService.claim_job() is None
+        running.refresh_from_db()
+        assert running.status == 2
+
+    @override_settings(CUSTOMER_JOBS_STALE_TIMEOUT=600, CUSTOMER_JOBS_MAX_ATTEMPTS=3)
+    def test_recover_stale_jobs_fails_partial_job(self):
+        """
+        Test case to verify that a stale job with written rows, or without attempts left, is
+        marked as failed and its file is deleted.
+        """
+        partial = self.create_stale_job(attempts=1, rows_done=5000)
+        exhausted = self.create_stale_job(attempts=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recovered = CustomerUploadJobService.recover_stale_jobs()
+
+        assert recovered == {"requeued": 0, "failed": 2}
+        for job in (partial, exhausted):
+            job.refresh_from_db()
+            assert job.status == 4
+            assert job.finished_at is not None
+            assert not job.file.storage.exists(job.file.name)
+        assert exhausted.error_message == "El worker del job dejo de reportar progreso despues de 3 intentos"
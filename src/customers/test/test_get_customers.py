@@ -1,9 +1,14 @@
 from datetime import datetime
+from decimal import Decimal
 
 import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from customers.models import Customer
+from customers.services import CustomerBalanceService
+from loans.models import Loan
 from test.test_setup import TestSetup
 
 
@@ -95,6 +100,27 @@ class TestGetCustomers(TestSetup):
         assert len(response_filter_1.json()["results"]) == 1
         assert response_filter_1.json()["results"][0]["external_id"] == "3"
 
+    def test_filter_external_match(self):
+        """
+        Test case to verify the match modes of the external_id filter.
+
+        `contains`, the default, finds the external_id anywhere and without case, `prefix` only at
+        the start and with the same case and `exact` only the whole external_id.
+        """
+        for external_id in ["abc-1", "ABC-2", "x-abc"]:
+            Customer.objects.create(external_id=external_id, status=1, score=100, preapproved_at=timezone.now())
+        cases = [
+            ({"external_id": "abc"}, {"abc-1", "ABC-2", "x-abc"}),
+            ({"external_id": "abc", "match": "contains"}, {"abc-1", "ABC-2", "x-abc"}),
+            ({"external_id": "abc", "match": "prefix"}, {"abc-1"}),
+            ({"external_id": "abc", "match": "exact"}, set()),
+            ({"external_id": "ABC-2", "match": "exact"}, {"ABC-2"}),
+        ]
+        for query_params, external_ids in cases:
+            response = self.client_auth.get(self.url, query_params)
+            assert response.status_code == 200
+            assert {customer["external_id"] for customer in response.json()["results"]} == external_ids
+
     def test_filter_page(self):
         """
         Test case to verify filtering customers by external_id.
@@ -178,3 +204,39 @@ class TestGetCustomers(TestSetup):
         }
         response_filter_1 = self.client_auth.get(self.url, query_params)
         assert response_filter_1.status_code == 422
+
+    def test_balance_single_query(self):
+        """
+        Test case to verify the balance of the customers, read from the balances ledger in the
+        query of the page.
+
+        The total debt is the sum of the outstanding of the loans of the customer, zero without
+        loans, and the available amount is the score minus the total debt. The page is read with
+        the same number of queries whatever the number of customers and loans.
+        """
+        url = reverse("customers:customer_balance")
+        customer = Customer.objects.create(external_id="1", status=1, score=1000, preapproved_at=timezone.now())
+        Customer.objects.create(external_id="2", status=1, score=500, preapproved_at=timezone.now())
+        Loan.objects.create(external_id="l1", amount=300, outstanding=300, customer=customer)
+        Loan.objects.create(external_id="l2", amount=200, outstanding=150.5, customer=customer)
+        CustomerBalanceService.rebuild()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.get(url)
+        assert response.status_code == 200
+        balances = {balance["external_id"]: balance for balance in response.json()["results"]}
+        assert Decimal(str(balances["1"]["total_debt"])) == Decimal("450.50")
+        assert Decimal(str(balances["1"]["available_amount"])) == Decimal("549.50")
+        assert Decimal(str(balances["2"]["total_debt"])) == 0
+        assert Decimal(str(balances["2"]["available_amount"])) == Decimal("500")
+        assert not [query for query in queries.captured_queries if 'FROM "loans_loan"' in query["sql"]]
+
+        for number in range(3, 13):
+            other = Customer.objects.create(
+                external_id=str(number), status=1, score=100, preapproved_at=timezone.now()
+            )
+            Loan.objects.create(external_id=f"l{number}", amount=10, outstanding=10, customer=other)
+        CustomerBalanceService.rebuild()
+        with self.assertNumQueries(len(queries)):
+            response = self.client_auth.get(url)
+        assert response.json()["count"] == 12
@@ -1,13 +1,24 @@
+import io
 from datetime import datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import django
 from django.core.management import call_command
+from django.db import connection
 from django.db.models.query import QuerySet
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient, APITestCase
 from test.test_setup import TestSetup
 from customers.models import Customer
+from customers.serializers import CustomerSerializer
+from customers.strategy import TxtChunkedProcessing
+from customers.utils import find_existing_external_ids
 from django.core.files.uploadedfile import SimpleUploadedFile
 import os
 
@@ -140,3 +151,433 @@ class TestCreateCustomers(TestSetup):
             response = self.client_auth.post(f"{self.url}?processing_type=txt", {"file": file}, format="multipart")
             assert response.status_code == 422
             assert response.json() == [{"preapproved_at": ["This field is required."]}]
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_txt_chunked(self):
+        """
+        Test case for creating customers from a file processed in chunks.
+
+        The file has five rows read two at a time, one row with an invalid status and one row
+        repeating an external_id of the previous chunk. The valid rows are created and the
+        invalid ones are reported with their row number.
+        """
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers_chunked.txt")
+        with open(file_path, "rb") as f:
+            file = SimpleUploadedFile(f.name, f.read(), content_type="text/plain")
+
+            response = self.client_auth.post(
+                f"{self.url}?processing_type=txt_chunked", {"file": file}, format="multipart"
+            )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["rows"] == 5
+        assert report["created"] == 3
+        assert report["failed"] == 2
+        assert [chunk["rows"] for chunk in report["chunks"]] == [2, 2, 1]
+        assert report["errors"] == [
+            {"row": 3, "errors": {"status": ['"5" is not a valid choice.']}},
+            {"row": 5, "errors": {"external_id": ["customer with this external id already exists."]}},
+        ]
+        assert set(Customer.objects.values_list("external_id", flat=True)) == {"1", "2", "4"}
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_txt_chunked_concurrent_insert(self):
+        """
+        Test case for an external_id inserted by another request after a chunk was validated.
+
+        The customer "2" is created between the validation and the write of the first chunk. Its
+        row is reported with the unique error and the rest of the chunk is still created.
+        """
+
+        class ConcurrentInsertProcessing(TxtChunkedProcessing):
+            def validate_chunk(self, records):
+                validated = super().validate_chunk(records)
+                Customer.objects.get_or_create(
+                    external_id="2", defaults={"status": 1, "score": 100, "preapproved_at": timezone.now()}
+                )
+                return validated
+
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers_chunked.txt")
+        with open(file_path, "rb") as file:
+            report = ConcurrentInsertProcessing().process_file(file)
+        assert report["created"] == 2
+        assert report["failed"] == 3
+        assert report["chunks"][0] == {"rows": 2, "created": 1, "failed": 1, "chunk": 1}
+        assert report["errors"][0] == {
+            "row": 2,
+            "errors": {"external_id": ["customer with this external id already exists."]},
+        }
+        assert Customer.objects.get(external_id="2").score == 100
+        assert set(Customer.objects.values_list("external_id", flat=True)) == {"1", "2", "4"}
+
+    @override_settings(CUSTOMER_BULK_BATCH_SIZE=2)
+    def test_create_customer_json_bulk_insert(self):
+        """
+        Test case to verify that customers sent as JSON are written with batched inserts.
+
+        Five customers with a batch size of two must be written with three INSERT statements
+        instead of one INSERT per customer.
+        """
+        body = {
+            "customers": [
+                {
+                    "external_id": str(number),
+                    "status": 1,
+                    "score": 100,
+                    "preapproved_at": timezone.now().strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                for number in range(5)
+            ]
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.post(f"{self.url}?processing_type=json", body, format="json")
+        assert response.status_code == 200
+        assert len(response.json()) == 5
+        inserts = [query for query in queries.captured_queries if query["sql"].startswith("INSERT")]
+        assert len(inserts) == 3
+        assert Customer.objects.count() == 5
+
+    def test_create_customer_json_unique_external_id(self):
+        """
+        Test case to verify the bulk uniqueness validation of the external_id.
+
+        The payload has an external_id that already exists, an external_id repeated inside the
+        payload and an invalid row with an existing external_id. Every row keeps the message of
+        the unique validator and the existing external_ids are checked with a single query.
+        """
+        Customer.objects.create(external_id="1", status=1, score=100, preapproved_at=timezone.now())
+        preapproved_at = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
+        body = {
+            "customers": [
+                {"external_id": "1", "status": 1, "score": 100, "preapproved_at": preapproved_at},
+                {"external_id": "2", "status": 1, "score": 100, "preapproved_at": preapproved_at},
+                {"external_id": "2", "status": 1, "score": 100, "preapproved_at": preapproved_at},
+                {"external_id": "3", "status": 1, "score": 100, "preapproved_at": preapproved_at},
+                {"external_id": "1", "status": 1, "preapproved_at": preapproved_at},
+            ]
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.post(f"{self.url}?processing_type=json", body, format="json")
+        assert response.status_code == 422
+        unique_error = ["customer with this external id already exists."]
+        assert response.json() == [
+            {"external_id": unique_error},
+            {},
+            {"external_id": unique_error},
+            {},
+            {"external_id": unique_error, "score": ["This field is required."]},
+        ]
+        selects = [query for query in queries.captured_queries if 'FROM "customers_customer"' in query["sql"]]
+        assert len(selects) == 1
+        assert Customer.objects.count() == 1
+
+    def test_customer_list_serializer_length_checks(self):
+        """
+        Test case to verify that the bulk list serializer keeps the list checks of DRF and the
+        unique validator of a single customer.
+        """
+        row = {"external_id": "1", "status": 1, "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"}
+        serializer = CustomerSerializer(data=[], many=True, allow_empty=False)
+        assert not serializer.is_valid()
+        assert serializer.errors == {"non_field_errors": ["This list may not be empty."]}
+        serializer = CustomerSerializer(data=[row, {**row, "external_id": "2"}], many=True, max_length=1)
+        assert not serializer.is_valid()
+        assert serializer.errors == {"non_field_errors": ["Ensure this field has no more than 1 elements."]}
+        Customer.objects.create(external_id="1", status=1, score=100, preapproved_at=timezone.now())
+        serializer = CustomerSerializer(data=row)
+        assert not serializer.is_valid()
+        assert serializer.errors == {"external_id": ["customer with this external id already exists."]}
+
+    @override_settings(CUSTOMER_UNIQUE_IN_QUERY_LIMIT=2)
+    def test_find_existing_external_ids_large_list(self):
+        """
+        Test case to verify the lookup of existing external_ids above the `external_id__in` limit.
+        """
+        for number in range(3):
+            Customer.objects.create(external_id=str(number), status=1, score=100, preapproved_at=timezone.now())
+        assert find_existing_external_ids(["0", "2", "5", "7", "2"]) == {"0", "2"}
+
+    def test_upsert_customer_txt(self):
+        """
+        Test case for re-sending a customers file with the upsert processing type.
+
+        The customer "1" is sent without changes, the customer "2" changes its status and score,
+        the customer "3" is new and is repeated in the file. Only the changed customer is updated.
+        """
+        Customer.objects.create(
+            external_id="1", status=1, score=1311, preapproved_at=datetime.fromisoformat("2023-02-12T22:29:27+00:00")
+        )
+        Customer.objects.create(
+            external_id="2", status=1, score=100, preapproved_at=datetime.fromisoformat("2023-02-13T10:00:00+00:00")
+        )
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers_upsert.txt")
+        with open(file_path, "rb") as f:
+            file = SimpleUploadedFile(f.name, f.read(), content_type="text/plain")
+            response = self.client_auth.post(f"{self.url}?processing_type=upsert", {"file": file}, format="multipart")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["created"] == 1
+        assert report["updated"] == 1
+        assert report["unchanged"] == 1
+        assert report["failed"] == 1
+        assert report["errors"] == [
+            {"row": 4, "errors": {"external_id": ["customer with this external id already exists."]}}
+        ]
+        customer = Customer.objects.get(external_id="2")
+        assert customer.status == 2
+        assert customer.score == 500
+        assert Customer.objects.count() == 3
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_copy(self):
+        """
+        Test case for creating customers from a file loaded with PostgreSQL COPY.
+
+        The valid rows of every chunk are staged and merged at the end, the invalid rows are
+        reported with their row number like in the chunked processing. The external_id "4" is
+        repeated in different chunks, so the second one is skipped at merge time.
+        """
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers_chunked.txt")
+        with open(file_path, "rb") as f:
+            file = SimpleUploadedFile(f.name, f.read(), content_type="text/plain")
+            response = self.client_auth.post(f"{self.url}?processing_type=copy", {"file": file}, format="multipart")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["rows"] == 5
+        assert report["staged"] == 4
+        assert report["created"] == 3
+        assert report["skipped"] == 1
+        assert report["failed"] == 1
+        assert report["errors"] == [
+            {"row": 3, "errors": {"status": ['"5" is not a valid choice.']}},
+            {"row": 5, "errors": {"external_id": ["customer with this external id already exists."]}},
+        ]
+        assert Customer.objects.get(external_id="4").score == 900
+        customer = Customer.objects.get(external_id="2")
+        assert customer.score == Decimal("2500.50")
+        assert set(Customer.objects.values_list("external_id", flat=True)) == {"1", "2", "4"}
+
+    def build_typed_customers_table(self):
+        """
+        Build an Arrow table of customers with typed columns, the third row has an invalid status
+        and the fourth row has no score nor preapproved_at.
+        """
+        return pa.table(
+            {
+                "external_id": pa.array(["1", "2", "3", "4"]),
+                "status": pa.array([1, 2, 5, 1], type=pa.int16()),
+                "score": pa.array(
+                    [Decimal("1311.00"), Decimal("2500.50"), Decimal("100.00"), None], type=pa.decimal128(12, 2)
+                ),
+                "preapproved_at": pa.array(
+                    [datetime(2023, 2, 12, 22, 29, 27), datetime(2023, 2, 13), datetime(2023, 2, 14), None],
+                    type=pa.timestamp("us", tz="UTC"),
+                ),
+            }
+        )
+
+    def assert_typed_customers_report(self, response):
+        assert response.status_code == 200
+        report = response.json()
+        assert report["rows"] == 4
+        assert report["created"] == 2
+        assert report["failed"] == 2
+        assert [chunk["rows"] for chunk in report["chunks"]] == [2, 2]
+        assert report["errors"] == [
+            {"row": 3, "errors": {"status": ['"5" is not a valid choice.']}},
+            {
+                "row": 4,
+                "errors": {"score": ["This field may not be null."], "preapproved_at": ["This field may not be null."]},
+            },
+        ]
+        customer = Customer.objects.get(external_id="2")
+        assert customer.status == 2
+        assert customer.score == Decimal("2500.50")
+        assert customer.preapproved_at == timezone.make_aware(datetime(2023, 2, 13))
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_parquet(self):
+        """
+        Test case for creating customers from a Parquet file read with its column types.
+        """
+        buffer = io.BytesIO()
+        pq.write_table(self.build_typed_customers_table(), buffer)
+        file = SimpleUploadedFile("customers.parquet", buffer.getvalue(), content_type="application/octet-stream")
+        response = self.client_auth.post(f"{self.url}?processing_type=parquet", {"file": file}, format="multipart")
+        self.assert_typed_customers_report(response)
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_arrow(self):
+        """
+        Test case for creating customers from Arrow IPC files, in stream and file formats. The
+        single record batch of the file is split in chunks.
+        """
+        table = self.build_typed_customers_table()
+        for new_writer in (pa.ipc.new_stream, pa.ipc.new_file):
+            Customer.objects.all().delete()
+            buffer = io.BytesIO()
+            with new_writer(buffer, table.schema) as writer:
+                writer.write_table(table)
+            file = SimpleUploadedFile("customers.arrow", buffer.getvalue(), content_type="application/octet-stream")
+            response = self.client_auth.post(f"{self.url}?processing_type=arrow", {"file": file}, format="multipart")
+            self.assert_typed_customers_report(response)
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_ndjson(self):
+        """
+        Test case for creating customers from a NDJSON file read one line at a time. Blank lines
+        are ignored and the scores keep the digits of the file.
+        """
+        file_path = os.path.join(os.path.dirname(__file__), "mock_data", "data_customers.ndjson")
+        with open(file_path, "rb") as f:
+            file = SimpleUploadedFile(f.name, f.read(), content_type="application/x-ndjson")
+            response = self.client_auth.post(f"{self.url}?processing_type=ndjson", {"file": file}, format="multipart")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["rows"] == 4
+        assert report["created"] == 2
+        assert report["errors"] == [
+            {"row": 3, "errors": {"status": ['"5" is not a valid choice.']}},
+            {"row": 4, "errors": {"score": ["Ensure that there are no more than 2 decimal places."]}},
+        ]
+        assert Customer.objects.get(external_id="2").score == Decimal("2500.50")
+
+    def test_create_customer_ndjson_invalid_line(self):
+        """
+        Test case for a NDJSON file with a line that is not a JSON object.
+        """
+        file = SimpleUploadedFile("customers.ndjson", b'{"external_id": "1"}\n[1, 2]\n')
+        response = self.client_auth.post(f"{self.url}?processing_type=ndjson", {"file": file}, format="multipart")
+        assert response.status_code == 422
+        assert response.json() == ["La linea 2 no es un objeto JSON valido."]
+
+    def test_create_customer_ndjson_missing_keys(self):
+        """
+        Test case for a NDJSON file with lines missing keys and lines with null values. A missing
+        key gets the required error of the serializer, or its default, and a null the null error.
+        """
+        content = (
+            '{"external_id": "1", "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"}\n'
+            '{"external_id": "2", "status": 1, "preapproved_at": "2023-02-13T10:00:00Z"}\n'
+            '{"external_id": "3", "status": 1, "score": null, "preapproved_at": "2023-02-13T10:00:00Z"}\n'
+        )
+        file = SimpleUploadedFile("customers.ndjson", content.encode())
+        response = self.client_auth.post(f"{self.url}?processing_type=ndjson", {"file": file}, format="multipart")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["created"] == 1
+        assert report["errors"] == [
+            {"row": 2, "errors": {"score": ["This field is required."]}},
+            {"row": 3, "errors": {"score": ["This field may not be null."]}},
+        ]
+        assert Customer.objects.get(external_id="1").status == 1
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_ndjson_invalid_line_after_first_chunk(self):
+        """
+        Test case for a NDJSON file with an invalid line after the first chunk was committed.
+
+        The customers of the first chunk are kept and the report says the file was cut short,
+        with the read error on the first row that was not processed.
+        """
+        line = '{{"external_id": "{}", "status": 1, "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"}}\n'
+        content = "".join(line.format(number) for number in range(1, 4)) + "{not json\n" + line.format(5)
+        file = SimpleUploadedFile("customers.ndjson", content.encode())
+        response = self.client_auth.post(f"{self.url}?processing_type=ndjson", {"file": file}, format="multipart")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["truncated"] is True
+        assert report["rows"] == 2
+        assert report["created"] == 2
+        assert report["errors"] == [
+            {"row": 3, "errors": {"non_field_errors": ["La linea 4 no es un objeto JSON valido."]}}
+        ]
+        assert set(Customer.objects.values_list("external_id", flat=True)) == {"1", "2"}
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_json_chunked_stream(self):
+        """
+        Test case for creating customers from a JSON body read incrementally in chunks.
+
+        The customers are read from the request stream two at a time, the body is never parsed by
+        DRF. Decimal scores keep their digits and invalid rows are reported with their row number.
+        """
+        body = (
+            '{"customers": ['
+            '{"external_id": "1", "status": 1, "score": 2500.50, "preapproved_at": "2023-02-13T10:00:00Z"},'
+            '{"external_id": "2", "status": 5, "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"},'
+            '{"external_id": "3", "status": 2, "score": "900", "preapproved_at": "2023-02-13T10:00:00Z"},'
+            '{"external_id": "1", "status": 1, "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"},'
+            '{"external_id": "5", "status": 1, "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"}'
+            "]}"
+        )
+        response = self.client_auth.post(
+            f"{self.url}?processing_type=json_chunked", body, content_type="application/json"
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["rows"] == 5
+        assert report["created"] == 3
+        assert [chunk["rows"] for chunk in report["chunks"]] == [2, 2, 1]
+        assert report["errors"] == [
+            {"row": 2, "errors": {"status": ['"5" is not a valid choice.']}},
+            {"row": 4, "errors": {"external_id": ["customer with this external id already exists."]}},
+        ]
+        assert Customer.objects.get(external_id="1").score == Decimal("2500.50")
+        assert set(Customer.objects.values_list("external_id", flat=True)) == {"1", "3", "5"}
+
+    def test_create_customer_json_chunked_stream_invalid(self):
+        """
+        Test case for a JSON body that is cut in the middle of the customers list.
+        """
+        body = '{"customers": [{"external_id": "1", "status": 1'
+        response = self.client_auth.post(
+            f"{self.url}?processing_type=json_chunked", body, content_type="application/json"
+        )
+        assert response.status_code == 422
+        assert response.json()[0].startswith("El JSON no es valido")
+        assert Customer.objects.count() == 0
+
+    def test_create_customer_json_chunked_stream_without_list(self):
+        """
+        Test case for a JSON body whose customers key is not a list or is missing. Like the json
+        processing the body is rejected instead of reporting zero rows.
+        """
+        for body, input_type in [('{"customers": "1"}', "str"), ('{"customers": {"external_id": "1"}}', "dict")]:
+            for processing_type in ["json", "json_chunked"]:
+                response = self.client_auth.post(
+                    f"{self.url}?processing_type={processing_type}", body, content_type="application/json"
+                )
+                assert response.status_code == 422
+                assert response.json() == {
+                    "non_field_errors": [f'Expected a list of items but got type "{input_type}".']
+                }
+
+        for body in ['{"clients": []}', "[]", ""]:
+            response = self.client_auth.post(
+                f"{self.url}?processing_type=json_chunked", body, content_type="application/json"
+            )
+            assert response.status_code == 422
+            assert response.json() == {"customers": ["This field is required."]}
+        assert Customer.objects.count() == 0
+
+    @override_settings(CUSTOMER_UPLOAD_CHUNK_SIZE=2)
+    def test_create_customer_json_chunked_stream_invalid_after_first_chunk(self):
+        """
+        Test case for a JSON body that is cut after the first chunk was committed. The customers
+        of the first chunk are kept and the report says the body was cut short.
+        """
+        customer = '{{"external_id": "{}", "status": 1, "score": 100, "preapproved_at": "2023-02-13T10:00:00Z"}}'
+        body = '{"customers": [' + ",".join(customer.format(number) for number in range(1, 4)) + ', {"external_id": "4"'
+        response = self.client_auth.post(
+            f"{self.url}?processing_type=json_chunked", body, content_type="application/json"
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["truncated"] is True
+        assert report["rows"] == 2
+        assert report["created"] == 2
+        assert len(report["errors"]) == 1
+        assert report["errors"][0]["row"] == 3
+        assert report["errors"][0]["errors"]["non_field_errors"][0].startswith("El JSON no es valido")
+        assert set(Customer.objects.values_list("external_id", flat=True)) == {"1", "2"}
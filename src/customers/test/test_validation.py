@@ -0,0 +1,62 @@
+from test.test_setup import TestSetup
+
+import django
+import pandas as pd
+from django.utils import timezone
+
+from customers.models import Customer
+from customers.serializers import CustomerSerializer
+from customers.validation import CustomerDataFrameValidator
+
+
+class TestCustomerDataFrameValidator(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestCustomerDataFrameValidator, cls).setUpClass()
+        django.setup()
+
+    def test_same_result_as_serializer(self):
+        """
+        Test case to verify that the vectorized validation gives the same result as the serializer.
+
+        Every row is validated on its own with `CustomerSerializer` and compared with the errors
+        and the values returned by `CustomerDataFrameValidator` for the whole DataFrame.
+        """
+        rows = [
+            {"external_id": "1", "status": "1", "score": "1311", "preapproved_at": "2023-02-12T22:29:27.177914Z"},
+            {"external_id": " 2 ", "status": "2", "score": " 12.5 ", "preapproved_at": "2023-02-12 10:00"},
+            {"external_id": "3", "status": "1", "score": "-0.05", "preapproved_at": "2023-02-12"},
+            {"external_id": "4", "status": "1", "score": "1e3", "preapproved_at": "2023-02-12T10:00:00-05:00"},
+            {"external_id": "5", "status": "3", "score": "1.234", "preapproved_at": "bad"},
+            {"external_id": "6", "status": "", "score": "12345678901.5", "preapproved_at": "2023-02-30T00:00:00"},
+            {"external_id": "", "status": "1", "score": "abc", "preapproved_at": "2023-02-12T10:00:00Z"},
+            {"external_id": "x" * 61, "status": "1", "score": "", "preapproved_at": ""},
+            {"external_id": "9", "status": "1", "score": "0000000000012.00", "preapproved_at": "2023-02-12T10:00Z"},
+        ]
+        valid_rows, errors = CustomerDataFrameValidator().validate(pd.DataFrame(rows))
+        expected_valid = []
+        for position, row in enumerate(rows):
+            serializer = CustomerSerializer(data=row)
+            if serializer.is_valid():
+                expected_valid.append(dict(serializer.validated_data))
+                assert position not in errors
+            else:
+                assert errors[position] == serializer.errors
+        assert valid_rows == expected_valid
+
+    def test_duplicated_and_existing_external_ids(self):
+        """
+        Test case to verify the unique error of repeated and existing external_ids.
+        """
+        Customer.objects.create(external_id="1", status=1, score=100, preapproved_at=timezone.now())
+        row = {"status": "1", "score": "100", "preapproved_at": "2023-02-12T10:00:00Z"}
+        dataframe = pd.DataFrame([{"external_id": "1", **row}, {"external_id": "2", **row}, {"external_id": "2", **row}])
+        unique_error = {"external_id": ["customer with this external id already exists."]}
+
+        valid_rows, errors = CustomerDataFrameValidator().validate(dataframe)
+        assert errors == {0: unique_error, 2: unique_error}
+        assert [valid_row["external_id"] for valid_row in valid_rows] == ["2"]
+
+        valid_rows, errors = CustomerDataFrameValidator(check_existing=False).validate(dataframe)
+        assert errors == {2: unique_error}
+        assert [valid_row["external_id"] for valid_row in valid_rows] == ["1", "2"]
@@ -2,11 +2,12 @@
 
 from django.urls import path
 
-from customers.views import CustomerBalanceView, CustomerView
+from customers.views import CustomerBalanceView, CustomerUploadJobView, CustomerView
 
 app_name = "customers"  # pylint: disable=C0103
 
 urlpatterns = [
     path("", CustomerView.as_view(), name="customer"),
     path("balance/", CustomerBalanceView.as_view(), name="customer_balance"),
+    path("jobs/<int:job_id>/", CustomerUploadJobView.as_view(), name="customer_job"),
 ]
@@ -0,0 +1,128 @@
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from customers.models import Customer, CustomerBalance
+
+
+def find_existing_external_ids(external_ids: list) -> set:
+    """
+    Returns the external_ids of the list that already exist in the Customer table.
+
+    Up to `CUSTOMER_UNIQUE_IN_QUERY_LIMIT` ids are checked with one `external_id__in` query. Larger
+    lists are loaded into a temporary table and joined with the customers table on PostgreSQL, and
+    checked in `external_id__in` batches on other databases.
+
+    Args:
+        external_ids (list): The external_ids to check.
+
+    Returns:
+        set: The external_ids that already exist.
+    """
+    external_ids = list(set(external_ids))
+    limit = settings.CUSTOMER_UNIQUE_IN_QUERY_LIMIT
+    if len(external_ids) > limit and connection.vendor == "postgresql":
+        return find_existing_external_ids_temp_table(external_ids)
+    existing = set()
+    remaining = iter(external_ids)
+    while batch := list(islice(remaining, limit)):
+        existing.update(Customer.objects.filter(external_id__in=batch).values_list("external_id", flat=True))
+    return existing
+
+
+def find_existing_external_ids_temp_table(external_ids: list) -> set:
+    """
+    Returns the external_ids that already exist using a temporary table join.
+
+    The ids are streamed into a temporary table with `COPY FROM STDIN` and joined with the
+    customers table in a single query. The table is dropped when the transaction ends.
+
+    Args:
+        external_ids (list): The external_ids to check.
+
+    Returns:
+        set: The external_ids that already exist.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([external_id] for external_id in external_ids)
+    buffer.seek(0)
+    table = Customer._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("CREATE TEMPORARY TABLE tmp_customer_external_ids (external_id varchar(60)) ON COMMIT DROP")
+        cursor.copy_expert("COPY tmp_customer_external_ids (external_id) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"SELECT customer.external_id FROM {table} customer "  # nosec
+            "INNER JOIN tmp_customer_external_ids ids ON ids.external_id = customer.external_id"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        cursor.execute("DROP TABLE tmp_customer_external_ids")
+    return existing
+
+
+def upsert_customers(rows: list) -> dict:
+    """
+    Insert or update the customers by external_id.
+
+    On PostgreSQL the rows are written with `INSERT ... ON CONFLICT (external_id) DO UPDATE` and
+    the update only happens when the status, score or preapproved_at changed. Other databases
+    use `bulk_create(update_conflicts=True)`, which updates every existing row. The available
+    amount of the balances of the customers is refreshed with their new scores.
+
+    Args:
+        rows (list): The validated customers, the external_ids must not repeat.
+
+    Returns:
+        dict: The number of customers created, updated and unchanged.
+    """
+    if not rows:
+        return {"created": 0, "updated": 0, "unchanged": 0}
+    if connection.vendor != "postgresql":
+        existing = find_existing_external_ids([row["external_id"] for row in rows])
+        Customer.objects.bulk_create(
+            [Customer(**row) for row in rows],
+            batch_size=settings.CUSTOMER_BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["external_id"],
+            update_fields=["status", "score", "preapproved_at", "updated_at"],
+        )
+        refresh_available_amounts([row["external_id"] for row in rows])
+        return {"created": len(rows) - len(existing), "updated": len(existing), "unchanged": 0}
+
+    now = timezone.now()
+    table = Customer._meta.db_table
+    sql = (
+        f"INSERT INTO {table} (external_id, status, score, preapproved_at, created_at, updated_at) "  # nosec
+        "VALUES %s ON CONFLICT (external_id) DO UPDATE SET "
+        "status = EXCLUDED.status, score = EXCLUDED.score, "
+        "preapproved_at = EXCLUDED.preapproved_at, updated_at = EXCLUDED.updated_at "
+        f"WHERE ({table}.status, {table}.score, {table}.preapproved_at) "
+        "IS DISTINCT FROM (EXCLUDED.status, EXCLUDED.score, EXCLUDED.preapproved_at) "
+        "RETURNING (xmax = 0) AS inserted"
+    )
+    values = [(row["external_id"], row["status"], row["score"], row["preapproved_at"], now, now) for row in rows]
+    with connection.cursor() as cursor:
+        results = execute_values(cursor.cursor, sql, values, page_size=settings.CUSTOMER_BULK_BATCH_SIZE, fetch=True)
+    created = sum(1 for (inserted,) in results if inserted)
+    updated = len(results) - created
+    if updated:
+        refresh_available_amounts([row["external_id"] for row in rows])
+    return {"created": created, "updated": updated, "unchanged": len(rows) - created - updated}
+
+
+def refresh_available_amounts(external_ids: list):
+    """
+    Set the available amount of the balances of the customers from their current score.
+
+    Args:
+        external_ids (list): The external_ids of the customers.
+    """
+    score = Customer.objects.filter(pk=OuterRef("customer_id")).values("score")[:1]
+    CustomerBalance.objects.filter(customer__external_id__in=external_ids).update(
+        available_amount=Subquery(score) - F("total_debt"), updated_at=timezone.now()
+    )
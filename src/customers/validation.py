@@ -0,0 +1,239 @@
+"""
+Vectorized validation of customers read into a pandas DataFrame.
+"""
+
+import numbers
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.fields import empty
+from rest_framework.validators import UniqueValidator
+
+from customers.models import Customer
+from customers.serializers import CustomerSerializer
+from customers.utils import find_existing_external_ids
+
+DECIMAL_PATTERN = r"\s*[+-]?(?P<whole>\d+)(?:\.(?P<fraction>\d+))?\s*"
+DATETIME_PATTERN = r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:\d{2})?"
+INVALID_CHARACTERS_PATTERN = "[\x00\ud800-\udfff]"
+
+
+class CustomerDataFrameValidator:
+    """
+    Validates a DataFrame of customers column by column.
+
+    Every column is checked at once with pandas operations: text length and blanks for
+    `external_id`, allowed choices for `status`, digits and decimal places for `score` and ISO
+    8601 parsing for `preapproved_at`, plus duplicated and existing external_ids. Only the cells
+    that fail the vectorized checks are run through the `CustomerSerializer` field, so the rows
+    that fail get exactly the error the serializer gives.
+
+    Columns read with their types (integers, `Decimal` scores and datetime columns, as read from
+    Parquet, Arrow or JSON) are checked on their values, without converting them to text.
+
+    Attributes:
+        check_existing (bool): Whether the external_ids that already exist are rejected.
+
+    Methods:
+        validate(dataframe): Returns the valid rows and the errors by position.
+    """
+
+    def __init__(self, check_existing: bool = True):
+        self.check_existing = check_existing
+        self.fields = CustomerSerializer(context={"skip_unique_external_id": True}).fields
+        self.unique_message = next(
+            validator.message
+            for validator in self.fields["external_id"].validators
+            if isinstance(validator, UniqueValidator)
+        )
+
+    def validate(self, dataframe: pd.DataFrame):
+        """
+        Validate the customers of the DataFrame.
+
+        Args:
+            dataframe (DataFrame): The customers, one per row.
+
+        Returns:
+            tuple: The valid rows as dictionaries for `Customer` and a dictionary with the
+                errors of the invalid rows by position, with the shape of the serializer errors.
+        """
+        dataframe = dataframe.reset_index(drop=True)
+        values, errors = {}, {}
+        checks = {
+            "external_id": self.check_external_id,
+            "status": self.check_status,
+            "score": self.check_score,
+            "preapproved_at": self.check_preapproved_at,
+        }
+        for name, check in checks.items():
+            if name not in dataframe.columns:
+                values[name], errors[name] = self.missing_column(name, len(dataframe))
+                continue
+            valid, converted = check(dataframe[name])
+            values[name], errors[name] = self.run_field_fallback(name, dataframe[name], valid, converted)
+        self.check_unique(values["external_id"], errors)
+
+        row_errors = {}
+        for name in checks:
+            for position in np.flatnonzero(errors[name].notna().to_numpy()):
+                row_errors.setdefault(int(position), {})[name] = errors[name].iat[position]
+        clean = [position for position in range(len(dataframe)) if position not in row_errors]
+        names = [name for name in checks if values[name] is not None]
+        rows = [dict(zip(names, row)) for row in zip(*(values[name].take(clean) for name in names))]
+        return rows, row_errors
+
+    def missing_column(self, name: str, size: int):
+        """
+        Returns the values and errors of a column that is not in the file.
+        """
+        value, error = self.missing_value(name)
+        if error:
+            return None, pd.Series([error] * size, dtype=object)
+        return pd.Series([value] * size, dtype=object), pd.Series([None] * size, dtype=object)
+
+    def missing_value(self, name: str):
+        """
+        Returns the value and the error of a field that is not in a row, the required error or
+        the default of the field.
+        """
+        field = self.fields[name]
+        if field.required:
+            return None, [ErrorDetail(field.error_messages["required"], code="required")]
+        default = Customer._meta.get_field(name).get_default() if field.default is empty else field.get_default()
+        return default, None
+
+    def run_field_fallback(self, name: str, column: pd.Series, valid: pd.Series, converted: pd.Series):
+        """
+        Run the serializer field on the cells that did not pass the vectorized check.
+
+        The cells set to `empty` are fields missing from their row, as read from NDJSON, they get
+        the required error or the default of the field instead of the null error.
+
+        Args:
+            name (str): The name of the field.
+            column (Series): The column as read.
+            valid (Series): The mask of the cells that passed the vectorized check.
+            converted (Series): The converted values of the valid cells.
+
+        Returns:
+            tuple: The values and the errors of the column.
+        """
+        values = converted.astype(object).where(valid, None)
+        errors = pd.Series([None] * len(column), dtype=object)
+        field = self.fields[name]
+        for position in np.flatnonzero(~valid.to_numpy()):
+            value = column.iat[position]
+            if value is empty:
+                values.iat[position], errors.iat[position] = self.missing_value(name)
+                continue
+            if not isinstance(value, str) and pd.isna(value):
+                value = None
+            try:
+                values.iat[position] = field.run_validation(value)
+            except serializers.ValidationError as exc:
+                errors.iat[position] = exc.detail
+        return values, errors
+
+    def check_unique(self, external_ids: pd.Series, errors: dict):
+        """
+        Add the unique error to the external_ids repeated in the file or that already exist.
+        """
+        candidates = external_ids.where(errors["external_id"].isna())
+        duplicated = candidates.notna() & candidates.duplicated(keep="first")
+        if self.check_existing:
+            existing = find_existing_external_ids(candidates.dropna().unique().tolist())
+            duplicated |= candidates.isin(existing)
+        message = [ErrorDetail(self.unique_message, code="unique")]
+        for position in np.flatnonzero(duplicated.to_numpy()):
+            errors["external_id"].iat[position] = message
+
+    def check_external_id(self, column: pd.Series):
+        """
+        Check the text, not blank and at most `max_length` characters, of the external_ids.
+        """
+        is_text = column.map(type) == str
+        stripped = column.where(is_text, "").str.strip()
+        valid = (
+            is_text
+            & (stripped.str.len() > 0)
+            & (stripped.str.len() <= self.fields["external_id"].max_length)
+            & ~stripped.str.contains(INVALID_CHARACTERS_PATTERN, regex=True)
+        )
+        return valid, stripped
+
+    def check_status(self, column: pd.Series):
+        """
+        Check that the status is one of the allowed choices.
+        """
+        choices = self.fields["status"].choice_strings_to_values
+        as_text = column.where(column.map(type) == str, column.astype(str))
+        valid = as_text.isin(list(choices)) & column.notna()
+        converted = pd.Series([choices.get(value) for value in as_text], index=column.index, dtype=object)
+        return valid, converted
+
+    def check_score(self, column: pd.Series):
+        """
+        Check the digits and decimal places of the scores.
+
+        A plain decimal number is valid when it has at most `decimal_places` decimals and at
+        most `max_digits - decimal_places` significant digits before the decimal point. Text and
+        float cells are checked on their text, as the serializer does, `Decimal` and integer
+        cells on their digits.
+        """
+        field = self.fields["score"]
+        is_text = column.map(type) == str
+        is_number = column.map(lambda value: isinstance(value, numbers.Real) and not isinstance(value, bool))
+        is_integer = column.map(lambda value: isinstance(value, numbers.Integral) and not isinstance(value, bool))
+        is_decimal = column.map(lambda value: isinstance(value, Decimal)) | is_integer
+        as_text = column.where(is_text, column.where(is_number & ~is_integer, "").astype(str)).astype(str)
+        matched = as_text.str.extract(f"^{DECIMAL_PATTERN}$")
+        whole_digits = matched["whole"].fillna("").str.lstrip("0").str.len()
+        decimal_places = matched["fraction"].fillna("").str.len()
+        valid_text = (
+            matched["whole"].notna()
+            & (as_text.str.len() <= field.MAX_STRING_LENGTH)
+            & (decimal_places <= field.decimal_places)
+            & (whole_digits <= field.max_whole_digits)
+        )
+        decimals = column.where(is_decimal, Decimal(0)).map(
+            lambda value: Decimal(int(value)) if not isinstance(value, Decimal) else value
+        )
+        valid = valid_text.where(~is_decimal, decimals.map(self.decimal_fits))
+        quantum = Decimal(1).scaleb(-field.decimal_places)
+        texts = as_text.where(valid & ~is_decimal, "0").map(lambda value: Decimal(value.strip()))
+        converted = texts.where(~is_decimal, decimals.where(valid, Decimal(0))).map(
+            lambda value: value.quantize(quantum)
+        )
+        return valid, converted
+
+    def decimal_fits(self, value: Decimal) -> bool:
+        """
+        Returns whether a `Decimal` score has the digits and decimal places of the field.
+        """
+        if not value.is_finite():
+            return False
+        field = self.fields["score"]
+        _, digits, exponent = value.as_tuple()
+        decimal_places = max(-exponent, 0)
+        whole_digits = max(len(digits) + exponent, 0) if decimal_places else len(digits) + exponent
+        return decimal_places <= field.decimal_places and whole_digits <= field.max_whole_digits
+
+    def check_preapproved_at(self, column: pd.Series):
+        """
+        Check that the preapproved_at values are ISO 8601 datetimes, naive values are read as UTC.
+        Datetime columns are checked on their values, without converting them to text.
+        """
+        if pd.api.types.is_datetime64_any_dtype(column.dtype):
+            parsed = column.dt.tz_localize("UTC") if column.dt.tz is None else column.dt.tz_convert("UTC")
+            valid = parsed.notna()
+        else:
+            as_text = column.where(column.map(type) == str, "").astype(str)
+            matched = as_text.str.fullmatch(DATETIME_PATTERN).fillna(False).astype(bool)
+            parsed = pd.to_datetime(as_text.where(matched, None), format="ISO8601", utc=True, errors="coerce")
+            valid = matched & parsed.notna()
+        converted = pd.Series(parsed.array.to_pydatetime(), index=column.index, dtype=object)
+        return valid, converted
@@ -1,10 +1,15 @@
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Coalesce
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from customers.factory import ProcessingFactory
 from customers.filters import CustomerFilters
-from customers.models import Customer
-from customers.serializers import CustomerSerializer, CustomerSerializerBalance
+from customers.models import Customer, CustomerUploadJob
+from customers.serializers import CustomerSerializer, CustomerSerializerBalance, CustomerUploadJobSerializer
+from customers.services import CustomerUploadJobService
 from utils.views_template import ViewTemplateFilters
 
 
@@ -52,6 +57,9 @@ class CustomerView(CustomerViewTemplate):
         """
         Handle HTTP POST requests.
 
+        With the `async=true` query param the upload is stored and processed by the customer
+        jobs workers, the response is a 202 with the job to follow its progress.
+
         Args:
             request (HttpRequest): The HTTP request object.
 
@@ -65,6 +73,9 @@ class CustomerView(CustomerViewTemplate):
         """
         try:
             processing_type = request.query_params.get("processing_type")
+            if request.query_params.get("async") == "true":
+                job = CustomerUploadJobService.create_job(processing_type=processing_type, request=request)
+                return Response(CustomerUploadJobSerializer(job).data, status=202)
             response = ProcessingFactory.processing(strategy_name=processing_type, request=request)
             return Response(response)
         except ValidationError as validation_error:
@@ -88,6 +99,55 @@ class CustomerBalanceView(CustomerViewTemplate):
 
     Attributes:
         serializer_class (class): The serializer class used for serializing the customer's balance.
+
+    Methods:
+        get_queryset(): Annotates the total debt and the available amount of every customer.
     """
 
     serializer_class = CustomerSerializerBalance
+
+    def get_queryset(self):
+        """
+        Annotate the balance of the customers from the `CustomerBalance` ledger, so a page is read
+        with a single query. Customers without loans have no balance, their debt is zero.
+
+        Returns:
+            QuerySet: The queryset of Customer objects with the `total_debt` and
+                `available_amount` annotations.
+        """
+        amount_field = DecimalField(max_digits=14, decimal_places=2)
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                total_debt=Coalesce(F("balance__total_debt"), Value(0), output_field=amount_field),
+                available_amount=Coalesce(F("balance__available_amount"), F("score"), output_field=amount_field),
+            )
+        )
+
+
+class CustomerUploadJobView(APIView):
+    """
+    API endpoint for the status of a customers upload processed in the background.
+
+    Methods:
+        get: Retrieve the status of a job.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """
+        Retrieve the status of a job of the user.
+
+        Parameters:
+            request: HTTP request.
+            job_id: The id of the job.
+
+        Returns:
+            Response: HTTP response with the rows done, rows failed and throughput of the job.
+        """
+        job = CustomerUploadJob.objects.filter(pk=job_id, user=request.user).first()
+        if not job:
+            return Response({"error": "Job no encontrado"}, status=404)
+        return Response(CustomerUploadJobSerializer(job).data, status=200)
@@ -1,12 +1,10 @@
-from django_filters import rest_framework as filters
-
 from loans.models import Loan
-from utils.filters import BaseFilterStatus
+from utils.filters import BaseFilterMatch, BaseFilterStatus, MatchCharFilter
 
 
-class LoanFilters(BaseFilterStatus):
-    external_id = filters.CharFilter(field_name="external_id", lookup_expr="icontains")
-    customer_external_id = filters.CharFilter(field_name="customer__external_id", lookup_expr="icontains")
+class LoanFilters(BaseFilterStatus, BaseFilterMatch):
+    external_id = MatchCharFilter(field_name="external_id")
+    customer_external_id = MatchCharFilter(field_name="customer__external_id")
 
     class Meta:
         model = Loan
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built with CREATE INDEX CONCURRENTLY, which can not run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("loans", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                fields=["customer", "status"], include=("amount", "outstanding"), name="loan_customer_status_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["created_at", "id"],
+                name="loan_created_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["status", "created_at"],
+                name="loan_status_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-18 21:03
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The indexes are built with CREATE INDEX CONCURRENTLY, which can not run in a transaction.
+    atomic = False
+
+    dependencies = [
+        # The pg_trgm extension is created by this migration.
+        ("customers", "0005_external_id_trigram"),
+        ("loans", "0002_list_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="loan",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("external_id"), name="gin_trgm_ops"
+                ),
+                name="loan_external_id_trgm_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 
 from core.models import BaseModel
 from customers.models import Customer
@@ -32,3 +35,20 @@ class Loan(BaseModel):
     outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     taken_at = models.DateTimeField(null=True, blank=True)
     customer = models.ForeignKey(Customer, related_name="loans", on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            # Debt of a customer by status, the amounts are in the index so the sums skip the table.
+            models.Index(
+                fields=["customer", "status"], include=["amount", "outstanding"], name="loan_customer_status_idx"
+            ),
+            # The list endpoint only reads the loans that are not deleted.
+            models.Index(
+                fields=["created_at", "id"], condition=Q(deleted_at__isnull=True), name="loan_created_active_idx"
+            ),
+            models.Index(
+                fields=["status", "created_at"], condition=Q(deleted_at__isnull=True), name="loan_status_active_idx"
+            ),
+            # The `icontains` filters compare UPPER(external_id) with LIKE '%value%'.
+            GinIndex(OpClass(Upper("external_id"), name="gin_trgm_ops"), name="loan_external_id_trgm_idx"),
+        ]
@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
+from customers.services import CustomerBalanceService
 from loans.models import STATUS_LOAN, Loan
 from utils.messages import MESSAGE_AMOUNT_NOT_NEGATIVE, MESSAGE_STATUS_PERMISSION
 
@@ -61,7 +64,8 @@ class LoanSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Create a new loan instance and set the outstanding amount.
+        Create a new loan instance with the outstanding amount set in the same INSERT and add it
+        to the balance of the customer.
 
         Parameters:
             validated_data: Validated data for creating the loan.
@@ -69,9 +73,9 @@ class LoanSerializer(serializers.ModelSerializer):
         Returns:
             loan: The created Loan instance.
         """
-        loan = Loan.objects.create(**validated_data)
-        loan.outstanding = validated_data["amount"]
-        loan.save()
+        with transaction.atomic():
+            loan = Loan.objects.create(**validated_data, outstanding=validated_data["amount"])
+            CustomerBalanceService.apply(loan.customer_id, total_debt=loan.outstanding, pending_total=loan.amount)
         return loan
 
 
@@ -91,5 +95,64 @@ class LoanUpdateSerializer(serializers.Serializer):
         """
         Check that the status is valid.
         """
-        if value not in dict(STATUS_LOAN).keys():  # pylint: disable=C0201
-            raise serializers.ValidationError(MESSAGE_STATUS_PERMISSION.format(status=dict(STATUS_LOAN).keys()))  # noqa
+        statuses = list(dict(STATUS_LOAN))
+        if value not in statuses:
+            raise serializers.ValidationError(MESSAGE_STATUS_PERMISSION.format(status=statuses))
+        return value
+
+
+class LoanBulkItemSerializer(serializers.Serializer):
+    """
+    Serializer for a loan of a bulk creation.
+
+    The customer is its id, the customers of all the loans are loaded together by the service.
+
+    Attributes:
+        external_id (str): The external ID of the loan.
+        amount (Decimal): The amount of the loan.
+        contract_version (str): The version of the loan contract.
+        customer (int): The id of the customer.
+    """
+
+    external_id = serializers.CharField(max_length=60)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    contract_version = serializers.CharField(max_length=30, required=False, allow_null=True, allow_blank=True)
+    customer = serializers.IntegerField()
+
+    def validate_amount(self, value):
+        """
+        Check that the amount is not negative.
+        """
+        if value < 0:
+            raise serializers.ValidationError(MESSAGE_AMOUNT_NOT_NEGATIVE)
+        return value
+
+
+class LoanBulkSerializer(serializers.Serializer):
+    """
+    Serializer for a bulk creation of loans, every loan is validated on its own by the service.
+
+    Attributes:
+        loans (list): The loans to create, at most `LOAN_BULK_MAX_ITEMS`.
+    """
+
+    loans = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=settings.LOAN_BULK_MAX_ITEMS
+    )
+
+
+class LoanBulkStatusSerializer(serializers.Serializer):
+    """
+    Serializer for updating the status of a batch of loans.
+
+    Attributes:
+        external_ids (list): The external IDs of the loans, at most `LOAN_BULK_MAX_ITEMS`.
+        status (int): The new status of the loans.
+    """
+
+    external_ids = serializers.ListField(
+        child=serializers.CharField(max_length=60), allow_empty=False, max_length=settings.LOAN_BULK_MAX_ITEMS
+    )
+    status = serializers.IntegerField(required=True)
+
+    validate_status = LoanUpdateSerializer.validate_status
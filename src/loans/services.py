@@ -1,21 +1,205 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
 from django.utils import timezone
+from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from customers.models import Customer
+from customers.services import CustomerBalanceService
+from utils.messages import (
+    MESSAGE_CUSTOMER_NOT_FOUND,
+    MESSAGE_LOAN_ALREADY_PENDING,
+    MESSAGE_LOAN_CREATE,
+    MESSAGE_LOAN_EXTERNAL_ID_EXISTS,
+    MESSAGE_LOAN_NOT_FOUND,
+    MESSAGE_LOAN_NOT_PENDING,
+    MESSAGE_LOAN_UPDATED,
+)
+
 from .models import Loan
+from .serializers import LoanBulkItemSerializer
 
 
 class LoanService:
     @staticmethod
+    @transaction.atomic
     def activate_loan(data: dict):
-        loan = Loan.objects.filter(external_id=data["external_id"]).first()
+        loan = Loan.objects.select_for_update().filter(external_id=data["external_id"]).first()
         if not loan:
-            raise ValidationError({"error": "Prestamo no encontrado"})
+            raise ValidationError({"error": MESSAGE_LOAN_NOT_FOUND})
         if loan.status != 1:
-            raise ValidationError({"error": "Prestamo solo se puede modificar si esta en estado pending"})
+            raise ValidationError({"error": MESSAGE_LOAN_NOT_PENDING})
         if data["status"] == 1 and loan.status == 1:
-            raise ValidationError({"error": "El prestamo no se puede actualizar a pending porque esta en pending"})
+            raise ValidationError({"error": MESSAGE_LOAN_ALREADY_PENDING})
         if data["status"] == 2:
             loan.taken_at = timezone.now()
         loan.status = data["status"]
-        loan.save()
-        return {"message": "Prestamo actualizado correctamente"}
+        loan.save(update_fields=["status", "taken_at", "updated_at"])
+        CustomerBalanceService.apply(
+            loan.customer_id, pending_total=-loan.amount, active_total=loan.amount if loan.status == 2 else 0
+        )
+        return {"message": MESSAGE_LOAN_UPDATED}
+
+    @staticmethod
+    @transaction.atomic
+    def update_loans_status(external_ids: list, status: int) -> dict:
+        """
+        Move a batch of pending loans to a new status with the rules of `activate_loan`.
+
+        The loans are read and locked with one query, to report every external_id and to know
+        the amounts for the balances, and the pending ones are updated with a single conditional
+        `UPDATE ... WHERE status = 1` that also sets `taken_at` when they become active.
+
+        Args:
+            external_ids (list): The external_ids of the loans.
+            status (int): The new status of the loans.
+
+        Returns:
+            dict: The number of updated and rejected loans and the result of every external_id,
+                in the order of the request.
+        """
+        loans = {
+            external_id: (loan_status, customer_id, amount)
+            for external_id, loan_status, customer_id, amount in Loan.objects.select_for_update()
+            .filter(external_id__in=set(external_ids))
+            .order_by("pk")
+            .values_list("external_id", "status", "customer_id", "amount")
+        }
+        errors = {}
+        for external_id in external_ids:
+            if external_id not in loans:
+                errors[external_id] = MESSAGE_LOAN_NOT_FOUND
+            elif loans[external_id][0] != 1:
+                errors[external_id] = MESSAGE_LOAN_NOT_PENDING
+            elif status == 1:
+                errors[external_id] = MESSAGE_LOAN_ALREADY_PENDING
+        pending = [external_id for external_id in loans if external_id not in errors]
+
+        updated = 0
+        if pending:
+            now = timezone.now()
+            updated = Loan.objects.filter(external_id__in=pending, status=1).update(
+                status=status, taken_at=now if status == 2 else F("taken_at"), updated_at=now
+            )
+            changes = {}
+            for external_id in pending:
+                _, customer_id, amount = loans[external_id]
+                change = changes.setdefault(customer_id, {"pending_total": 0, "active_total": 0})
+                change["pending_total"] -= amount
+                change["active_total"] += amount if status == 2 else 0
+            CustomerBalanceService.apply_many(changes)
+
+        results = [
+            {"external_id": external_id, "updated": False, "error": errors[external_id]}
+            if external_id in errors
+            else {"external_id": external_id, "updated": True, "message": MESSAGE_LOAN_UPDATED}
+            for external_id in external_ids
+        ]
+        return {"updated": updated, "rejected": len(set(errors)), "results": results}
+
+    @staticmethod
+    @transaction.atomic
+    def create_loans(items: list) -> dict:
+        """
+        Create a batch of loans, checking the score of every customer like `LoanView.post`.
+
+        The customers of the batch are locked in id order, their current debt is read with one
+        grouped aggregate and the score check runs in memory, adding the accepted loans of the
+        batch to the debt of their customer. The accepted loans are written with `bulk_create`
+        and `outstanding` set to the amount. When the write fails because another request
+        created some of the external_ids after the check, those loans are rejected and the others
+        are written again.
+
+        Args:
+            items (list): The loans, dictionaries with the fields of `LoanBulkItemSerializer`.
+
+        Returns:
+            dict: The number of accepted and rejected loans and the result of every loan in the
+                order of the batch, with the errors of the rejected ones.
+        """
+        item_serializer = LoanBulkItemSerializer()
+        validated, errors = [], {}
+        for position, item in enumerate(items):
+            try:
+                validated.append(item_serializer.run_validation(item))
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                errors[position] = exc.detail
+
+        rows = [row for row in validated if row]
+        existing = set(
+            Loan.objects.filter(external_id__in=[row["external_id"] for row in rows]).values_list(
+                "external_id", flat=True
+            )
+        )
+        customer_ids = sorted({row["customer"] for row in rows})
+        customers = {
+            customer.pk: customer
+            for customer in Customer.objects.select_for_update().filter(pk__in=customer_ids).order_by("pk")
+        }
+        debts = dict(
+            Loan.objects.filter(customer_id__in=customer_ids, status__in=[1, 2])
+            .values("customer_id")
+            .annotate(total=Sum("amount"))
+            .values_list("customer_id", "total")
+        )
+
+        loans = {}
+        for position, row in enumerate(validated):
+            if row is None:
+                continue
+            customer = customers.get(row["customer"])
+            if row["external_id"] in existing:
+                errors[position] = {"external_id": [MESSAGE_LOAN_EXTERNAL_ID_EXISTS]}
+            elif not customer:
+                errors[position] = {"customer": [MESSAGE_CUSTOMER_NOT_FOUND.format(value=row["customer"])]}
+            elif debts.get(customer.pk, 0) + row["amount"] > customer.score:
+                total_debt = debts.get(customer.pk, 0)
+                errors[position] = {
+                    "error": MESSAGE_LOAN_CREATE.format(
+                        custom_score=customer.score, debt=total_debt, max_debt=customer.score - total_debt
+                    )
+                }
+            else:
+                existing.add(row["external_id"])
+                debts[customer.pk] = debts.get(customer.pk, 0) + row["amount"]
+                loans[position] = Loan(
+                    external_id=row["external_id"],
+                    amount=row["amount"],
+                    outstanding=row["amount"],
+                    contract_version=row.get("contract_version"),
+                    customer=customer,
+                )
+        while True:
+            try:
+                with transaction.atomic():
+                    Loan.objects.bulk_create(list(loans.values()), batch_size=settings.CUSTOMER_BULK_BATCH_SIZE)
+                break
+            except IntegrityError:
+                conflicts = set(
+                    Loan.objects.filter(external_id__in=[loan.external_id for loan in loans.values()]).values_list(
+                        "external_id", flat=True
+                    )
+                )
+                if not conflicts:
+                    raise
+                for position, loan in list(loans.items()):
+                    if loan.external_id in conflicts:
+                        errors[position] = {"external_id": [MESSAGE_LOAN_EXTERNAL_ID_EXISTS]}
+                        del loans[position]
+
+        changes = {}
+        for loan in loans.values():
+            change = changes.setdefault(loan.customer_id, {"total_debt": 0, "pending_total": 0})
+            change["total_debt"] += loan.amount
+            change["pending_total"] += loan.amount
+        CustomerBalanceService.apply_many(changes)
+
+        results = [
+            {"external_id": item.get("external_id") if isinstance(item, dict) else None, "status": "accepted"}
+            for item in items
+        ]
+        for position, error in errors.items():
+            results[position].update(status="rejected", errors=error)
+        return {"accepted": len(loans), "rejected": len(errors), "results": results}
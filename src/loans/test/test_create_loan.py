@@ -1,9 +1,12 @@
 from datetime import datetime
 
 import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from customers.models import Customer
+from loans.models import Loan
 from test.test_setup import TestSetup
 
 
@@ -70,3 +73,29 @@ class TestCreateLoans(TestSetup):
         response = self.client_auth.post(self.url_loan, body_loan, format="json")
         assert response.status_code == 422
         assert response.json() == {"amount": ["This field is required."]}
+
+    def test_create_loan_single_insert(self):
+        """
+        Test case to verify that a loan is written with a single INSERT that sets the outstanding,
+        and that activating it only updates its status columns.
+        """
+        body_loan = {"customer": self.customer.id, "amount": 1000, "external_id": "123"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.post(self.url_loan, body_loan, format="json")
+        assert response.status_code == 201
+        loan_writes = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(('INSERT INTO "loans_loan"', 'UPDATE "loans_loan"'))
+        ]
+        assert len(loan_writes) == 1
+        assert loan_writes[0].startswith('INSERT INTO "loans_loan"')
+        assert Loan.objects.get(external_id="123").outstanding == 1000
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.put(reverse("loans:loan_status"), {"external_id": "123", "status": 2}, format="json")
+        assert response.status_code == 200
+        loan_updates = [query["sql"] for query in queries.captured_queries if query["sql"].startswith('UPDATE "loans_loan"')]
+        assert len(loan_updates) == 1
+        assert '"amount"' not in loan_updates[0]
+        assert '"outstanding"' not in loan_updates[0]
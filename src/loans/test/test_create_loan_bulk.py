@@ -0,0 +1,106 @@
+from decimal import Decimal
+from test.test_setup import TestSetup
+
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, CustomerBalance
+from loans.models import Loan
+
+
+class TestCreateLoansBulk(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestCreateLoansBulk, cls).setUpClass()
+        django.setup()
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("loans:loan_bulk")
+        self.customer = Customer.objects.create(external_id="12", status=1, score=1000, preapproved_at=timezone.now())
+        self.customer_2 = Customer.objects.create(external_id="13", status=1, score=500, preapproved_at=timezone.now())
+        Loan.objects.create(external_id="existing", amount=300, outstanding=300, status=1, customer=self.customer)
+
+    def test_create_loans_bulk(self):
+        """
+        Test case for creating a batch of loans.
+
+        The score of every customer is checked with its current debt plus the loans accepted
+        before in the batch. Repeated external_ids, unknown customers and invalid loans are
+        rejected without stopping the batch.
+        """
+        loans = [
+            {"external_id": "1", "amount": 500, "customer": self.customer.id},
+            {"external_id": "2", "amount": 300, "customer": self.customer.id},
+            {"external_id": "3", "amount": 200, "customer": self.customer.id, "contract_version": "v2"},
+            {"external_id": "4", "amount": 600, "customer": self.customer_2.id},
+            {"external_id": "5", "amount": 100, "customer": self.customer_2.id},
+            {"external_id": "existing", "amount": 1, "customer": self.customer_2.id},
+            {"external_id": "5", "amount": 1, "customer": self.customer_2.id},
+            {"external_id": "6", "amount": 1, "customer": 0},
+            {"external_id": "7", "amount": -1, "customer": self.customer_2.id},
+        ]
+        response = self.client_auth.post(self.url, {"loans": loans}, format="json")
+        assert response.status_code == 200
+        result = response.json()
+        assert result["accepted"] == 3
+        assert result["rejected"] == 6
+        assert [item["status"] for item in result["results"]] == [
+            "accepted",
+            "rejected",
+            "accepted",
+            "rejected",
+            "accepted",
+            "rejected",
+            "rejected",
+            "rejected",
+            "rejected",
+        ]
+        assert result["results"][1]["errors"] == {
+            "error": " The customer's score is not enough to request the loan. customer_score = 1000.00 and "
+            "total_debt = 800.00, you can request a maximum of 200.00 "
+        }
+        assert result["results"][5]["errors"] == {"external_id": ["loan with this external id already exists."]}
+        assert result["results"][6]["errors"] == {"external_id": ["loan with this external id already exists."]}
+        assert result["results"][7]["errors"] == {"customer": ['Invalid pk "0" - object does not exist.']}
+        assert result["results"][8]["errors"] == {"amount": ["El monto no puede ser negativo"]}
+
+        loan = Loan.objects.get(external_id="3")
+        assert (loan.status, loan.outstanding, loan.contract_version) == (1, Decimal("200"), "v2")
+        assert set(Loan.objects.values_list("external_id", flat=True)) == {"existing", "1", "3", "5"}
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        assert (balance.total_debt, balance.pending_total) == (Decimal("1000"), Decimal("1000"))
+        assert CustomerBalance.objects.get(customer=self.customer_2).available_amount == Decimal("400")
+
+    def test_create_loans_bulk_query_count(self):
+        """
+        Test case to verify that the number of queries of a batch does not grow with its size.
+
+        Every batch has loans of all the customers, the first one creates their balances.
+        """
+        customers = [
+            Customer.objects.create(external_id=f"c{number}", status=1, score=1000, preapproved_at=timezone.now())
+            for number in range(20)
+        ]
+        counts = []
+        for size in (20, 40, 200):
+            loans = [
+                {"external_id": f"{size}-{number}", "amount": 10, "customer": customers[number % 20].id}
+                for number in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client_auth.post(self.url, {"loans": loans}, format="json")
+            assert response.json()["accepted"] == size
+            counts.append(len(queries))
+        assert counts[1] == counts[2]
+
+    def test_create_loans_bulk_invalid(self):
+        """
+        Test case for a request without a list of loans.
+        """
+        response = self.client_auth.post(self.url, {"loans": []}, format="json")
+        assert response.status_code == 422
+        assert response.json() == {"loans": ["This list may not be empty."]}
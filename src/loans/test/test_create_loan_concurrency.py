@@ -0,0 +1,116 @@
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from customers.models import Customer
+from loans.models import Loan
+from user.models import User
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Row locks require PostgreSQL")
+class TestCreateLoanConcurrency(APITransactionTestCase):
+    """
+    Stress tests of the loan creation with concurrent requests, every thread has its own
+    connection so the requests really run in parallel transactions.
+    """
+
+    def setUp(self):
+        self.url_loan = reverse("loans:loan")
+        self.user = User.objects.create_user(email="loans@test.com", password="password")
+
+    def post_loans_concurrently(self, bodies: list) -> list:
+        barrier = threading.Barrier(len(bodies))
+        status_codes = [None] * len(bodies)
+
+        def post(position, body):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            try:
+                barrier.wait()
+                status_codes[position] = client.post(self.url_loan, body, format="json").status_code
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post, args=(position, body)) for position, body in enumerate(bodies)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return status_codes
+
+    def test_concurrent_loans_same_customer(self):
+        """
+        Test case to verify that concurrent loans of the same customer never exceed its score.
+
+        Ten requests of 200 for a customer with a score of 1000 are sent at the same time, only
+        five of them fit in the score.
+        """
+        customer = Customer.objects.create(external_id="12", status=1, score=1000, preapproved_at=timezone.now())
+        bodies = [{"customer": customer.id, "amount": 200, "external_id": f"loan-{number}"} for number in range(10)]
+        status_codes = self.post_loans_concurrently(bodies)
+        assert sorted(status_codes) == [201] * 5 + [422] * 5
+        assert Loan.objects.filter(customer=customer).count() == 5
+        assert sum(loan.amount for loan in Loan.objects.filter(customer=customer)) == Decimal("1000")
+        assert customer.balance.pending_total == Decimal("1000")
+
+    def test_concurrent_loans_different_customers(self):
+        """
+        Test case to verify that concurrent loans of different customers are all created.
+        """
+        customers = [
+            Customer.objects.create(external_id=str(number), status=1, score=1000, preapproved_at=timezone.now())
+            for number in range(8)
+        ]
+        bodies = [
+            {"customer": customer.id, "amount": 600, "external_id": f"loan-{customer.external_id}"}
+            for customer in customers
+        ]
+        status_codes = self.post_loans_concurrently(bodies)
+        assert status_codes == [201] * 8
+        assert Loan.objects.count() == 8
+
+    def test_concurrent_insert_bulk(self):
+        """
+        Test case to verify that a loan created by another request after the bulk creation
+        checked its external_id is rejected as existing and the rest of the batch is created.
+        """
+        customer = Customer.objects.create(external_id="12", status=1, score=1000, preapproved_at=timezone.now())
+        other = Customer.objects.create(external_id="13", status=1, score=1000, preapproved_at=timezone.now())
+        bulk_create = Loan.objects.bulk_create
+
+        def create_in_other_request():
+            try:
+                Loan.objects.create(external_id="loan-2", amount=100, outstanding=100, customer=other)
+            finally:
+                connection.close()
+
+        def bulk_create_after_other_request(loans, **kwargs):
+            if not Loan.objects.filter(external_id="loan-2").exists():
+                thread = threading.Thread(target=create_in_other_request)
+                thread.start()
+                thread.join()
+            return bulk_create(loans, **kwargs)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        body = {
+            "loans": [{"customer": customer.id, "amount": 100, "external_id": f"loan-{number}"} for number in range(3)]
+        }
+        with mock.patch.object(Loan.objects, "bulk_create", side_effect=bulk_create_after_other_request):
+            response = client.post(reverse("loans:loan_bulk"), body, format="json")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["accepted"] == 2
+        assert report["results"][2] == {
+            "external_id": "loan-2",
+            "status": "rejected",
+            "errors": {"external_id": ["loan with this external id already exists."]},
+        }
+        assert Loan.objects.get(external_id="loan-2").customer == other
+        assert customer.balance.pending_total == Decimal("200")
@@ -79,6 +79,30 @@ class TestGetLoans(TestSetup):
         assert response.status_code == 200
         assert len(response.json()["results"]) == 1
 
+    def test_get_filter_external_id_match(self):
+        """
+        Test case to verify the match modes of the external_id filters.
+
+        `exact` compares the whole external_id, `prefix` the start of it and `contains`, the
+        default, any part of it without case. An unknown match mode is rejected.
+        """
+        cases = [
+            ({"external_id": "12-1", "match": "exact"}, {"12-1"}),
+            ({"external_id": "12", "match": "exact"}, set()),
+            ({"external_id": "12-", "match": "prefix"}, {"12-1", "12-2"}),
+            ({"external_id": "-2", "match": "prefix"}, set()),
+            ({"external_id": "-2", "match": "contains"}, {"12-2"}),
+            ({"customer_external_id": "12", "match": "exact"}, {"12-1", "12-2"}),
+            ({"customer_external_id": "1", "match": "exact"}, set()),
+        ]
+        for query_params, external_ids in cases:
+            response = self.client_auth.get(self.url_loan, query_params)
+            assert response.status_code == 200
+            assert {loan["external_id"] for loan in response.json()["results"]} == external_ids
+
+        response = self.client_auth.get(self.url_loan, {"external_id": "12", "match": "regex"})
+        assert response.status_code == 422
+
     def test_get_filter_customer_external_id(self):
         """
         Test case to verify the filtering of loans by customer external ID.
@@ -100,3 +124,61 @@ class TestGetLoans(TestSetup):
         response = self.client_auth.get(self.url_loan, query_params)
         assert response.status_code == 200
         assert len(response.json()["results"]) == 10
+
+    def test_get_loan_query_count(self):
+        """
+        Test case to verify that the loans are listed with the customer joined in the same query.
+
+        A page is read with the count query and the page query whatever the number of loans, and
+        every loan has the external_id of its customer.
+        """
+        with self.assertNumQueries(2):
+            response = self.client_auth.get(self.url_loan)
+        assert {loan["customer_external_id"] for loan in response.json()["results"]} == {"12"}
+
+        customer_2 = Customer.objects.create(external_id="13", status=1, score=10000, preapproved_at=timezone.now())
+        for i in range(10):
+            Loan.objects.create(customer=customer_2, amount=1000, external_id=f"13-{i}", status=1)
+        with self.assertNumQueries(2):
+            response = self.client_auth.get(self.url_loan, {"customer_external_id": "13"})
+        assert len(response.json()["results"]) == 10
+        assert {loan["customer_external_id"] for loan in response.json()["results"]} == {"13"}
+
+    def test_get_loan_cursor_pagination(self):
+        """
+        Test case to verify the cursor pagination of the loans with `pagination=cursor`.
+
+        The pages are walked forward and backward with the links of the responses, the loans
+        that share the same created_at are not repeated nor skipped, every page is read with a
+        single query and the rows are not counted. An invalid cursor is rejected.
+        """
+        customer = Customer.objects.get(external_id="12")
+        for i in range(23):
+            Loan.objects.create(customer=customer, amount=10, external_id=f"12-cursor-{i}", status=1)
+        Loan.objects.filter(external_id__in=[f"12-cursor-{i}" for i in range(5, 15)]).update(
+            created_at=timezone.now()
+        )
+        expected = list(Loan.objects.order_by("created_at", "id").values_list("external_id", flat=True))
+
+        pages, url, params = [], self.url_loan, {"pagination": "cursor", "page_size": 10}
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client_auth.get(url, params)
+            assert response.status_code == 200
+            assert "count" not in response.json()
+            pages.append(response.json())
+            url, params = response.json()["next"], None
+        assert [len(page["results"]) for page in pages] == [10, 10, 5]
+        assert [loan["external_id"] for page in pages for loan in page["results"]] == expected
+        assert pages[0]["previous"] is None
+
+        backward, url = [], pages[-1]["previous"]
+        while url:
+            response = self.client_auth.get(url)
+            assert response.status_code == 200
+            backward.insert(0, [loan["external_id"] for loan in response.json()["results"]])
+            url = response.json()["previous"]
+        assert backward == [[loan["external_id"] for loan in page["results"]] for page in pages[:-1]]
+
+        response = self.client_auth.get(self.url_loan, {"pagination": "cursor", "cursor": "invalid"})
+        assert response.status_code == 404
@@ -0,0 +1,85 @@
+from decimal import Decimal
+from test.test_setup import TestSetup
+
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, CustomerBalance
+from loans.models import Loan
+
+
+class TestUpdateLoansStatusBulk(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestUpdateLoansStatusBulk, cls).setUpClass()
+        django.setup()
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("loans:loan_status_bulk")
+        self.customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+        for number, status in enumerate([1, 1, 1, 2]):
+            Loan.objects.create(
+                external_id=f"loan-{number}", amount=100, outstanding=100, status=status, customer=self.customer
+            )
+
+    def test_update_loans_status_bulk(self):
+        """
+        Test case to verify that the pending loans are activated with a single UPDATE that sets
+        taken_at, and that every external_id gets its result.
+        """
+        body = {"external_ids": ["loan-0", "loan-1", "loan-3", "missing"], "status": 2}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.put(self.url, body, format="json")
+        assert response.status_code == 200
+        assert response.json() == {
+            "updated": 2,
+            "rejected": 2,
+            "results": [
+                {"external_id": "loan-0", "updated": True, "message": "Prestamo actualizado correctamente"},
+                {"external_id": "loan-1", "updated": True, "message": "Prestamo actualizado correctamente"},
+                {
+                    "external_id": "loan-3",
+                    "updated": False,
+                    "error": "Prestamo solo se puede modificar si esta en estado pending",
+                },
+                {"external_id": "missing", "updated": False, "error": "Prestamo no encontrado"},
+            ],
+        }
+        loan_updates = [query for query in queries.captured_queries if query["sql"].startswith('UPDATE "loans_loan"')]
+        assert len(loan_updates) == 1
+        assert set(Loan.objects.filter(status=2).values_list("external_id", flat=True)) == {
+            "loan-0",
+            "loan-1",
+            "loan-3",
+        }
+        assert Loan.objects.filter(external_id__in=["loan-0", "loan-1"], taken_at__isnull=True).count() == 0
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        assert (balance.pending_total, balance.active_total) == (Decimal("100"), Decimal("300"))
+
+    def test_update_loans_status_bulk_rejected(self):
+        """
+        Test case to verify that the pending loans are rejected without taken_at, and that they
+        can not be moved to pending.
+        """
+        response = self.client_auth.put(self.url, {"external_ids": ["loan-2"], "status": 1}, format="json")
+        assert response.json()["results"][0]["error"] == (
+            "El prestamo no se puede actualizar a pending porque esta en pending"
+        )
+        response = self.client_auth.put(self.url, {"external_ids": ["loan-2"], "status": 3}, format="json")
+        assert response.json()["updated"] == 1
+        loan = Loan.objects.get(external_id="loan-2")
+        assert (loan.status, loan.taken_at) == (3, None)
+
+    def test_update_loans_status_bulk_invalid(self):
+        """
+        Test case for a request with a status that does not exist.
+        """
+        response = self.client_auth.put(self.url, {"external_ids": ["loan-0"], "status": 9}, format="json")
+        assert response.status_code == 422
+        assert response.json() == {
+            "status": ["El estatus para actualizar no permitido, status permitidos: [1, 2, 3, 4]"]
+        }
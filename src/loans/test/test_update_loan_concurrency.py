@@ -0,0 +1,63 @@
+import threading
+import unittest
+from decimal import Decimal
+
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from customers.models import Customer, CustomerBalance
+from loans.models import Loan
+from user.models import User
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Row locks require PostgreSQL")
+class TestUpdateLoanConcurrency(APITransactionTestCase):
+    """
+    Stress tests of the loan activation with concurrent requests, every thread has its own
+    connection so the requests really run in parallel transactions.
+    """
+
+    def setUp(self):
+        self.url_loan = reverse("loans:loan")
+        self.url_loan_update = reverse("loans:loan_status")
+        self.user = User.objects.create_user(email="loans@test.com", password="password")
+        self.customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+
+    def put_loans_concurrently(self, bodies: list) -> list:
+        barrier = threading.Barrier(len(bodies))
+        status_codes = [None] * len(bodies)
+
+        def put(position, body):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            try:
+                barrier.wait()
+                status_codes[position] = client.put(self.url_loan_update, body, format="json").status_code
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=put, args=(position, body)) for position, body in enumerate(bodies)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return status_codes
+
+    def test_concurrent_activations_same_loan(self):
+        """
+        Test case to verify that concurrent activations of the same loan move it out of pending
+        once, so the balance of the customer is changed only once.
+        """
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        body = {"customer": self.customer.id, "amount": 1000, "external_id": "loan-1"}
+        assert client.post(self.url_loan, body, format="json").status_code == 201
+
+        status_codes = self.put_loans_concurrently([{"external_id": "loan-1", "status": 2}] * 8)
+        assert sorted(status_codes) == [200] + [422] * 7
+        assert Loan.objects.get(external_id="loan-1").status == 2
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        assert balance.pending_total == Decimal("0")
+        assert balance.active_total == Decimal("1000")
@@ -2,11 +2,13 @@
 
 from django.urls import path
 
-from loans.views import LoanStatusLoan, LoanView
+from loans.views import LoanBulkStatusView, LoanBulkView, LoanStatusLoan, LoanView
 
 app_name = "loans"  # pylint: disable=C0103
 
 urlpatterns = [
     path("", LoanView.as_view(), name="loan"),
     path("status/", LoanStatusLoan.as_view(), name="loan_status"),
+    path("bulk/", LoanBulkView.as_view(), name="loan_bulk"),
+    path("status/bulk/", LoanBulkStatusView.as_view(), name="loan_status_bulk"),
 ]
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.db.models import Sum
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
@@ -7,8 +8,15 @@ from rest_framework.views import APIView
 from customers.models import Customer
 from loans.filters import LoanFilters
 from loans.models import Loan
-from loans.serializers import LoanSerializer, LoanSerializerObjects, LoanUpdateSerializer
+from loans.serializers import (
+    LoanBulkSerializer,
+    LoanBulkStatusSerializer,
+    LoanSerializer,
+    LoanSerializerObjects,
+    LoanUpdateSerializer,
+)
 from loans.services import LoanService
+from utils.idempotency import idempotent
 from utils.messages import MESSAGE_LOAN_CREATE
 from utils.views_template import ViewTemplateFilters
 
@@ -25,29 +33,41 @@ class LoanView(ViewTemplateFilters):
         """
         Override of the get_queryset method to allow filtering by attorney_client.
 
+        The customer is joined in the same query, `LoanSerializerObjects` reads its external_id.
+
         Returns:
-            QuerySet: The queryset of Customer objects.
+            QuerySet: The queryset of Loan objects.
         """
-        get_queryset = Loan.objects.filter(deleted_at=None)
+        get_queryset = Loan.objects.filter(deleted_at=None).select_related("customer")
         return get_queryset
 
+    @idempotent
     def post(self, request):
-        """Handle POST request."""
+        """
+        Handle POST request.
+
+        The debt check and the creation of the loan run in a transaction that locks the row of
+        the customer, so concurrent requests for the same customer are checked one after the
+        other and requests for different customers do not wait for each other.
+        """
         try:
             serializer = LoanSerializer(data=request.data)
             if serializer.is_valid():
-                customer: Customer = serializer.validated_data["customer"]
-                total_debt = customer.loans.filter(status__in=[1, 2]).aggregate(Sum("amount"))["amount__sum"] or 0
-                if total_debt + serializer.validated_data["amount"] > customer.score:
-                    return Response(
-                        {
-                            "error": MESSAGE_LOAN_CREATE.format(
-                                custom_score=customer.score, debt=total_debt, max_debt=customer.score - total_debt
-                            )
-                        },
-                        status=422,
+                with transaction.atomic():
+                    customer: Customer = Customer.objects.select_for_update().get(
+                        pk=serializer.validated_data["customer"].pk
                     )
-                serializer.save()
+                    total_debt = customer.loans.filter(status__in=[1, 2]).aggregate(Sum("amount"))["amount__sum"] or 0
+                    if total_debt + serializer.validated_data["amount"] > customer.score:
+                        return Response(
+                            {
+                                "error": MESSAGE_LOAN_CREATE.format(
+                                    custom_score=customer.score, debt=total_debt, max_debt=customer.score - total_debt
+                                )
+                            },
+                            status=422,
+                        )
+                    serializer.save()
                 response = {**serializer.data, "customer_external_id": customer.external_id}
                 return Response(response, status=201)
             return Response(serializer.errors, status=422)
@@ -95,3 +115,78 @@ class LoanStatusLoan(APIView):
                 {"error": str(e)},
                 status=500,
             )
+
+
+class LoanBulkView(APIView):
+    """
+    API endpoint for creating a batch of loans in a single request.
+
+    Methods:
+        post: Create the loans of the batch.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Create a batch of loans.
+
+        Every loan is accepted or rejected on its own, the rejected loans do not stop the batch.
+
+        Parameters:
+            request: HTTP request with the `loans` list.
+
+        Returns:
+            Response: HTTP response with the accepted and rejected counts and the result of
+                every loan.
+        """
+        try:
+            serializer = LoanBulkSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=422)
+            result = LoanService.create_loans(serializer.validated_data["loans"])
+            return Response(result, status=200)
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=500,
+            )
+
+
+class LoanBulkStatusView(APIView):
+    """
+    API endpoint for updating the status of a batch of pending loans.
+
+    Methods:
+        put: Update the status of the loans.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request):
+        """
+        Update the status of a batch of loans.
+
+        Every loan is updated or rejected with the rules of the single loan update, the
+        rejected loans do not stop the batch.
+
+        Parameters:
+            request: HTTP request with the `external_ids` list and the new `status`.
+
+        Returns:
+            Response: HTTP response with the updated and rejected counts and the result of
+                every external_id.
+        """
+        try:
+            serializer = LoanBulkStatusSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=422)
+            result = LoanService.update_loans_status(
+                serializer.validated_data["external_ids"], serializer.validated_data["status"]
+            )
+            return Response(result, status=200)
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=500,
+            )
@@ -0,0 +1,21 @@
+from rest_framework.exceptions import ValidationError
+
+from payments.strategy import CsvPaymentProcessing, NdjsonPaymentProcessing, PaymentProcessingStrategy
+
+
+class PaymentProcessingFactory:
+    strategy_map_processing = {
+        "csv": CsvPaymentProcessing(),
+        "ndjson": NdjsonPaymentProcessing(),
+    }
+
+    @classmethod
+    def get_strategy(cls, strategy_name: str):
+        return cls.strategy_map_processing.get(strategy_name, None)
+
+    @classmethod
+    def processing(cls, strategy_name: str, request):
+        strategy: PaymentProcessingStrategy = cls.get_strategy(strategy_name=strategy_name)
+        if not strategy:
+            raise ValidationError(f"Invalid strategy: {strategy_name}")
+        return strategy.processing(request=request)
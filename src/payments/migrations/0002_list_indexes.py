@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built with CREATE INDEX CONCURRENTLY, which can not run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("payments", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(fields=["customer", "status"], name="payment_customer_status_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["created_at", "id"],
+                name="payment_created_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="paymentdetail",
+            index=models.Index(fields=["loan", "payment"], include=("amount",), name="paymentdetail_loan_idx"),
+        ),
+    ]
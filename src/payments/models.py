@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 
 from core.models import BaseModel
 from customers.models import Customer
@@ -19,6 +20,15 @@ class Payment(BaseModel):
     paid_at = models.DateTimeField(null=True, blank=True)
     customer = models.ForeignKey(Customer, related_name="payments", on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "status"], name="payment_customer_status_idx"),
+            # The list endpoint only reads the payments that are not deleted.
+            models.Index(
+                fields=["created_at", "id"], condition=Q(deleted_at__isnull=True), name="payment_created_active_idx"
+            ),
+        ]
+
 
 class PaymentDetail(BaseModel):
     """
@@ -28,3 +38,9 @@ class PaymentDetail(BaseModel):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment = models.ForeignKey(Payment, related_name="details", on_delete=models.CASCADE)
     loan = models.ForeignKey(Loan, related_name="payment_details", on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            # Payments of a loan, the amount is in the index so the sums skip the table.
+            models.Index(fields=["loan", "payment"], include=["amount"], name="paymentdetail_loan_idx"),
+        ]
@@ -21,8 +21,11 @@ class PaymentDetailSerializer(serializers.Serializer):
     def validate_loan_external_id(self, value):
         """
         Verifica que el loan ID exista en el modelo Loan.
+
+        The loan is read from the loans prefetched by `PaymentSerializer`, if any.
         """
-        loan = Loan.objects.filter(external_id=value).first()
+        loans = self.context.get("loans")
+        loan = loans.get(value) if loans is not None else Loan.objects.filter(external_id=value).first()
         if not loan:
             raise serializers.ValidationError(MESSAGE_LOAD_EXTERNAL_ID_NOT_FOUND.format(value=value))
         if loan.status != 2:
@@ -54,8 +57,11 @@ class PaymentOnly(serializers.Serializer):
     def validate_customer_external_id(self, value):
         """
         Verifica que el customer ID exista en el modelo Customer.
+
+        The customer is read from the customers prefetched by `PaymentSerializer`, if any.
         """
-        customer = Customer.objects.filter(external_id=value).first()
+        customers = self.context.get("customers")
+        customer = customers.get(value) if customers is not None else Customer.objects.filter(external_id=value).first()
         if not customer:
             raise serializers.ValidationError(MESSAGE_CUSTOMER_EXTERNAL_ID_NOT_FOUND.format(value=value))
         return value
@@ -73,6 +79,50 @@ class PaymentSerializer(serializers.Serializer):
     payment = PaymentOnly()
     payment_detail = PaymentDetailSerializer(many=True)
 
+    def to_internal_value(self, data):
+        """
+        Prefetch the loans and the customer referenced by the payment before validating it.
+
+        The loans are read with one query and the customer with another, the nested serializers
+        read them from the context instead of querying them one by one. The validated data
+        carries them to `PaymentService.create_payment`.
+        """
+        self.prefetch(data)
+        return super().to_internal_value(data)
+
+    def prefetch(self, data):
+        """
+        Read the loans and the customer referenced by the data into the context.
+
+        Args:
+            data (dict): The data of the request, not validated yet.
+        """
+        data = data if isinstance(data, dict) else {}
+        payment = data.get("payment") if isinstance(data.get("payment"), dict) else {}
+        details = data.get("payment_detail") if isinstance(data.get("payment_detail"), list) else []
+        loan_external_ids = {
+            str(detail["loan_external_id"]).strip()
+            for detail in details
+            if isinstance(detail, dict) and isinstance(detail.get("loan_external_id"), (str, int))
+        }
+        customer_external_id = payment.get("customer_external_id")
+        customer_external_ids = (
+            [str(customer_external_id).strip()] if isinstance(customer_external_id, (str, int)) else []
+        )
+        self.context["loans"] = Loan.objects.in_bulk(loan_external_ids, field_name="external_id")
+        self.context["customers"] = Customer.objects.in_bulk(customer_external_ids, field_name="external_id")
+
+    def validate(self, attrs):
+        """
+        Add the prefetched loans and customer of the payment to the validated data.
+        """
+        attrs["loans"] = {
+            detail["loan_external_id"]: self.context["loans"][detail["loan_external_id"]]
+            for detail in attrs["payment_detail"]
+        }
+        attrs["customer"] = self.context["customers"][attrs["payment"]["customer_external_id"]]
+        return attrs
+
     def validate_payment_detail(self, value):
         """
         Validates the payment detail.
@@ -97,6 +147,62 @@ class PaymentSerializer(serializers.Serializer):
         return value
 
 
+class PaymentBulkDetailSerializer(PaymentDetailSerializer):
+    """
+    Serializer for the details of a payment of a bulk upload.
+
+    The loans are checked by `PaymentService.create_payments` for the whole chunk at once.
+    """
+
+    def validate_loan_external_id(self, value):
+        return value
+
+
+class PaymentBulkOnlySerializer(PaymentOnly):
+    """
+    Serializer for a payment of a bulk upload.
+
+    The external_id and the customer are checked by `PaymentService.create_payments` for the
+    whole chunk at once.
+    """
+
+    def validate_external_id(self, value):
+        return value
+
+    def validate_customer_external_id(self, value):
+        return value
+
+
+class PaymentBulkItemSerializer(serializers.Serializer):
+    """
+    Serializer for a payment of a bulk upload, with the shape of `PaymentSerializer`.
+
+    Attributes:
+        payment (PaymentBulkOnlySerializer): The payment.
+        payment_detail (PaymentBulkDetailSerializer): The payment details.
+    """
+
+    payment = PaymentBulkOnlySerializer()
+    payment_detail = PaymentBulkDetailSerializer(many=True)
+
+    def validate_payment_detail(self, value):
+        """
+        Validates that the loans of the payment detail are not repeated, like `PaymentSerializer`.
+        """
+        return PaymentSerializer.validate_payment_detail(self, value)
+
+
+class PaymentFileSerializer(serializers.Serializer):
+    """
+    Serializer for a payments file.
+
+    Fields:
+        file: The payments file.
+    """
+
+    file = serializers.FileField()
+
+
 class PaymentUpdateSerializer(serializers.Serializer):
     """
     Serializer for updating loan information.
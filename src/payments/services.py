@@ -1,12 +1,23 @@
+from itertools import islice
+
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
 from django.utils import timezone
+from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from customers.models import Customer
+from customers.services import CustomerBalanceService
 from loans.models import Loan
 from payments.models import Payment, PaymentDetail
+from payments.serializers import PaymentBulkItemSerializer
 from utils.messages import (
     MESSAGE_AMOUNT_GREATHER,
+    MESSAGE_CUSTOMER_EXTERNAL_ID_NOT_FOUND,
+    MESSAGE_LOAD_EXTERNAL_ID_NOT_FOUND,
+    MESSAGE_NOT_PERMISSION_PAYMENT,
+    MESSAGE_PAYMENT_EXTERNAL_ID_EXISTS,
     MESSAGE_PAYMENT_NOT_FOUND,
     MESSAGE_PAYMENT_STATUS,
     MESSAGE_PAYMENT_UPDATE_ACTIVE_REJECTED,
@@ -15,45 +26,87 @@ from utils.messages import (
 
 class PaymentService:
     @staticmethod
-    def validate_loan_payment_amount(payments_detail: dict):
+    def outstanding_error(payment_details: list, loans: dict) -> str:
         """
-        Validates the payment amount for each loan in the payments_detail.
+        Returns the error of the first payment detail whose amount is greater than the
+        outstanding of its loan.
 
         Args:
-            payments_detail (dict): A dictionary containing payment details.
-
-        Raises:
-            ValidationError: If the payment amount is greater than the outstanding amount for a loan.
+            payment_details (list): The payment details, with the loan_external_id and the amount.
+            loans (dict): The loans by external_id.
 
         Returns:
-            None
+            str: The error message, with the amount and the outstanding of the loan.
         """
-        loans = Loan.objects.filter(external_id__in=[payment["loan_external_id"] for payment in payments_detail])
-        for payment in payments_detail:
-            loan = loans.get(external_id=payment["loan_external_id"])
-            if loan.outstanding < payment["amount"]:
-                raise ValidationError(
-                    MESSAGE_AMOUNT_GREATHER.format(
-                        amount=payment["amount"],
-                        outstanding=loan.outstanding,
-                    )
-                )
+        outstanding = dict(
+            Loan.objects.filter(pk__in=[loan.pk for loan in loans.values()]).values_list("external_id", "outstanding")
+        )
+        payment_detail = next(
+            (detail for detail in payment_details if outstanding[detail["loan_external_id"]] < detail["amount"]),
+            payment_details[0],
+        )
+        return MESSAGE_AMOUNT_GREATHER.format(
+            amount=payment_detail["amount"],
+            outstanding=outstanding[payment_detail["loan_external_id"]],
+        )
 
     @staticmethod
     @transaction.atomic
-    def create_payment(payment: dict, payment_details: list = []):  # pylint: disable=W0102
+    def create_payment(  # pylint: disable=W0102
+        payment: dict, payment_details: list = [], customer: Customer | None = None, loans: dict | None = None
+    ):
         """
         Create a payment and its associated payment details.
 
+        The loans are read with one query and the outstanding of every loan is decremented with
+        one guarded `UPDATE ... SET outstanding = outstanding - amount WHERE outstanding >= amount`,
+        the amount of each loan is selected with a `CASE` on its id. The check and the decrement
+        are the same statement, so concurrent payments of the same loan can not overwrite each
+        other nor leave a negative outstanding: when fewer loans than details are updated the
+        decrements are rolled back and the payment is rejected. The details are inserted with one
+        `INSERT`.
+
         Args:
             payment (dict): A dictionary containing payment information.
             payment_details (list, optional): A list of dictionaries containing payment details. Defaults to [].
+            customer (Customer, optional): The customer of the payment, read by external_id if not given.
+            loans (dict, optional): The loans of the payment details by external_id, read if not given.
 
         Returns:
             bool: True if the payment and payment details are created successfully, False otherwise.
+
+        Raises:
+            ValidationError: If a loan of the payment details does not exist or if the amount of a
+                payment detail is greater than the outstanding of its loan.
         """
 
-        customer = Customer.objects.get(external_id=payment["customer_external_id"])
+        if customer is None:
+            customer = Customer.objects.get(external_id=payment["customer_external_id"])
+        if loans is None:
+            loans = Loan.objects.in_bulk(
+                [payment_detail["loan_external_id"] for payment_detail in payment_details], field_name="external_id"
+            )
+        for payment_detail in payment_details:
+            if payment_detail["loan_external_id"] not in loans:
+                raise ValidationError(
+                    MESSAGE_LOAD_EXTERNAL_ID_NOT_FOUND.format(value=payment_detail["loan_external_id"])
+                )
+        if payment_details:
+            amounts = Case(
+                *[
+                    When(pk=loans[payment_detail["loan_external_id"]].pk, then=Value(payment_detail["amount"]))
+                    for payment_detail in payment_details
+                ],
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+            savepoint = transaction.savepoint()
+            updated = Loan.objects.filter(pk__in=[loan.pk for loan in loans.values()], outstanding__gte=amounts).update(
+                outstanding=F("outstanding") - amounts, updated_at=timezone.now()
+            )
+            if updated != len(payment_details):
+                transaction.savepoint_rollback(savepoint)
+                raise ValidationError(PaymentService.outstanding_error(payment_details, loans))
+            transaction.savepoint_commit(savepoint)
         payment_create = Payment.objects.create(
             customer=customer,
             paid_at=timezone.now(),
@@ -61,17 +114,174 @@ class PaymentService:
             total_amount=sum(payment["amount"] for payment in payment_details),
             external_id=payment["external_id"],
         )
-        payment_create.save()
-        for payment_detail in payment_details:
-            loan = Loan.objects.get(external_id=payment_detail["loan_external_id"])
-            payment_detail = PaymentDetail.objects.create(
-                payment=payment_create,
-                amount=payment_detail["amount"],
-                loan=loan,
+        details = PaymentDetail.objects.bulk_create(
+            [
+                PaymentDetail(
+                    payment=payment_create,
+                    amount=payment_detail["amount"],
+                    loan=loans[payment_detail["loan_external_id"]],
+                )
+                for payment_detail in payment_details
+            ]
+        )
+        paid_by_customer = {}
+        for detail in details:
+            customer_id = detail.loan.customer_id
+            paid_by_customer[customer_id] = paid_by_customer.get(customer_id, 0) + detail.amount
+        if paid_by_customer:
+            CustomerBalanceService.apply_many(
+                {customer_id: {"total_debt": -amount} for customer_id, amount in paid_by_customer.items()}
             )
-            loan.outstanding -= payment_detail.amount
-            payment_detail.save()
-            loan.save()
+
+    @staticmethod
+    def create_payments(items: list) -> dict:
+        """
+        Create a batch of payments, checking every payment like `PaymentView.post`.
+
+        The payments that already exist, the customers and the loans of the batch are read with
+        one query each, the loans locked in id order. The outstanding check runs in memory,
+        subtracting the accepted payments of the batch from the outstanding of their loans. The
+        accepted payments and their details are written with `bulk_create` and the outstanding of
+        every loan is decremented by the total paid in the batch with one `UPDATE` per
+        `CUSTOMER_BULK_BATCH_SIZE` loans. Must run in a transaction.
+
+        Args:
+            items (list): The payments, dictionaries with the shape of `PaymentSerializer`.
+
+        Returns:
+            dict: The number of accepted and rejected payments and the result of every payment in
+                the order of the batch, with the errors of the rejected ones.
+        """
+        item_serializer = PaymentBulkItemSerializer()
+        validated, errors = [], {}
+        for position, item in enumerate(items):
+            try:
+                validated.append(item_serializer.run_validation(item))
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                errors[position] = exc.detail
+
+        rows = [row for row in validated if row]
+        existing = set(
+            Payment.objects.filter(external_id__in=[row["payment"]["external_id"] for row in rows]).values_list(
+                "external_id", flat=True
+            )
+        )
+        customers = Customer.objects.in_bulk(
+            {row["payment"]["customer_external_id"] for row in rows}, field_name="external_id"
+        )
+        loan_external_ids = {detail["loan_external_id"] for row in rows for detail in row["payment_detail"]}
+        loans = {
+            loan.external_id: loan
+            for loan in Loan.objects.select_for_update().filter(external_id__in=loan_external_ids).order_by("pk")
+        }
+
+        payments, details, paid = [], [], {}
+        for position, row in enumerate(validated):
+            if row is None:
+                continue
+            payment = row["payment"]
+            error = PaymentService.bulk_payment_error(row, existing, customers, loans, paid)
+            if error:
+                errors[position] = error
+                continue
+            existing.add(payment["external_id"])
+            payment_create = Payment(
+                customer=customers[payment["customer_external_id"]],
+                paid_at=timezone.now(),
+                status=1,
+                total_amount=sum(detail["amount"] for detail in row["payment_detail"]),
+                external_id=payment["external_id"],
+            )
+            payments.append(payment_create)
+            for detail in row["payment_detail"]:
+                loan = loans[detail["loan_external_id"]]
+                paid[loan.pk] = paid.get(loan.pk, 0) + detail["amount"]
+                details.append(PaymentDetail(payment=payment_create, amount=detail["amount"], loan=loan))
+
+        batch_size = settings.CUSTOMER_BULK_BATCH_SIZE
+        Payment.objects.bulk_create(payments, batch_size=batch_size)
+        PaymentDetail.objects.bulk_create(details, batch_size=batch_size)
+        loan_ids = iter(paid)
+        while batch := list(islice(loan_ids, batch_size)):
+            Loan.objects.filter(pk__in=batch).update(
+                outstanding=F("outstanding")
+                - Case(
+                    *[When(pk=loan_id, then=Value(paid[loan_id])) for loan_id in batch],
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                updated_at=timezone.now(),
+            )
+        changes = {}
+        for loan in loans.values():
+            if loan.pk in paid:
+                change = changes.setdefault(loan.customer_id, {"total_debt": 0})
+                change["total_debt"] -= paid[loan.pk]
+        CustomerBalanceService.apply_many(changes)
+
+        results = [
+            {
+                "external_id": item["payment"].get("external_id")
+                if isinstance(item, dict) and isinstance(item.get("payment"), dict)
+                else None,
+                "status": "accepted",
+            }
+            for item in items
+        ]
+        for position, error in errors.items():
+            results[position].update(status="rejected", errors=error)
+        return {"accepted": len(payments), "rejected": len(errors), "results": results}
+
+    @staticmethod
+    def bulk_payment_error(row: dict, existing: set, customers: dict, loans: dict, paid: dict):
+        """
+        Returns the error of a validated payment of a batch, if any.
+
+        Args:
+            row (dict): The validated payment.
+            existing (set): The external_ids of the payments that exist or were accepted in the batch.
+            customers (dict): The customers of the batch by external_id.
+            loans (dict): The loans of the batch by external_id.
+            paid (dict): The amount already paid in the batch by loan id.
+
+        Returns:
+            dict: The errors of the payment, with the shape of the `PaymentSerializer` errors, or
+                None if the payment is accepted.
+        """
+        payment = row["payment"]
+        if payment["external_id"] in existing:
+            return {
+                "payment": {
+                    "external_id": [MESSAGE_PAYMENT_EXTERNAL_ID_EXISTS.format(external_id=payment["external_id"])]
+                }
+            }
+        if payment["customer_external_id"] not in customers:
+            return {
+                "payment": {
+                    "customer_external_id": [
+                        MESSAGE_CUSTOMER_EXTERNAL_ID_NOT_FOUND.format(value=payment["customer_external_id"])
+                    ]
+                }
+            }
+        detail_errors = []
+        for detail in row["payment_detail"]:
+            loan = loans.get(detail["loan_external_id"])
+            if not loan:
+                detail_errors.append(
+                    {"loan_external_id": [MESSAGE_LOAD_EXTERNAL_ID_NOT_FOUND.format(value=detail["loan_external_id"])]}
+                )
+            elif loan.status != 2:
+                detail_errors.append({"loan_external_id": [MESSAGE_NOT_PERMISSION_PAYMENT]})
+            else:
+                detail_errors.append({})
+        if any(detail_errors):
+            return {"payment_detail": detail_errors}
+        for detail in row["payment_detail"]:
+            loan = loans[detail["loan_external_id"]]
+            outstanding = loan.outstanding - paid.get(loan.pk, 0)
+            if outstanding < detail["amount"]:
+                return {"errors": [MESSAGE_AMOUNT_GREATHER.format(amount=detail["amount"], outstanding=outstanding)]}
+        return None
 
     @staticmethod
     def update_payment_status(payment_external_id: str, status: int):
@@ -83,4 +293,4 @@ class PaymentService:
         if payment.status == 2 and status == 1:
             raise ValidationError({"error": MESSAGE_PAYMENT_UPDATE_ACTIVE_REJECTED})
         payment.status = status
-        payment.save()
+        payment.save(update_fields=["status", "updated_at"])
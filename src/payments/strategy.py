@@ -0,0 +1,235 @@
+import csv
+import json
+import logging
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from payments.models import Payment
+from payments.serializers import PaymentFileSerializer
+from payments.services import PaymentService
+from utils.messages import MESSAGE_INVALID_JSON_LINE, MESSAGE_PAYMENT_FILE_COLUMNS, MESSAGE_PAYMENT_FILE_UNREADABLE
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentProcessingStrategy(ABC):
+    """
+    A base processing strategy that creates the payments of a settlement file in chunks.
+
+    Each chunk of `PAYMENT_UPLOAD_CHUNK_SIZE` payments is checked and written by
+    `PaymentService.create_payments` in its own transaction, so peak memory depends on the chunk
+    size and not on the size of the file. Rejected payments do not stop the file. The whole file
+    is read once before the first chunk is written, so a file that can not be read is rejected
+    without writing any payment. A chunk whose write fails because another request created some
+    of its payments after the check is rolled back and checked again, so those payments are
+    rejected as existing. Subclasses implement `read_payments` for their input format.
+
+    Methods:
+        processing(request): Validates the upload and processes the file.
+        read_payments(file): Yields the payments of a file with the shape of `PaymentSerializer`.
+        check_file(file): Reads the whole file without writing.
+        process_file(file): Processes a file object and returns the report.
+        process_chunk(payments): Creates the payments of a chunk in its own transaction.
+    """
+
+    def processing(self, request):
+        """
+        Process the payments of a file.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            dict: The number of accepted and rejected payments and the result of every payment.
+
+        Raises:
+            ValidationError: If the uploaded file is not valid.
+        """
+        serializer = PaymentFileSerializer(data=request.data)
+        if serializer.is_valid():
+            return self.process_file(serializer.validated_data["file"])
+        raise ValidationError(serializer.errors)
+
+    @abstractmethod
+    def read_payments(self, file):
+        """
+        Yields the payments of the file as tuples of the row number and the payment.
+        """
+
+    def check_file(self, file):
+        """
+        Read the whole file without writing and rewind it, keeping a single payment in memory.
+
+        Args:
+            file (File): The file object with the payments.
+
+        Raises:
+            ValidationError: If the file can not be read.
+        """
+        for _ in self.read_payments(file):
+            pass
+        file.seek(0)
+
+    def process_file(self, file):
+        """
+        Process a payments file chunk by chunk.
+
+        Args:
+            file (File): The file object with the payments.
+
+        Returns:
+            dict: The number of accepted and rejected payments and the result of every payment,
+                with the row of the file where the payment starts.
+
+        Raises:
+            ValidationError: If the file can not be read, no payment is written then.
+        """
+        self.check_file(file)
+        report = {"accepted": 0, "rejected": 0, "results": []}
+        payments = self.read_payments(file)
+        while chunk := list(islice(payments, settings.PAYMENT_UPLOAD_CHUNK_SIZE)):
+            chunk_report = self.process_chunk([payment for _, payment in chunk])
+            report["accepted"] += chunk_report["accepted"]
+            report["rejected"] += chunk_report["rejected"]
+            for (row, _), result in zip(chunk, chunk_report["results"]):
+                report["results"].append({"row": row, **result})
+            logger.info(
+                "Payments chunk processed: %s payments, %s accepted, %s rejected",
+                len(chunk),
+                chunk_report["accepted"],
+                chunk_report["rejected"],
+            )
+        return report
+
+    def process_chunk(self, payments: list) -> dict:
+        """
+        Create the payments of a chunk in its own transaction.
+
+        When the write fails because another request created some of the payments after they
+        were checked, the chunk is rolled back and checked again, and those payments are rejected
+        with the existing external_id error.
+
+        Args:
+            payments (list): The payments of the chunk.
+
+        Returns:
+            dict: The report of `PaymentService.create_payments`.
+        """
+        external_ids = [
+            payment["payment"].get("external_id")
+            for payment in payments
+            if isinstance(payment.get("payment"), dict) and isinstance(payment["payment"].get("external_id"), str)
+        ]
+        existing = None
+        while True:
+            try:
+                with transaction.atomic():
+                    return PaymentService.create_payments(payments)
+            except IntegrityError:
+                conflicts = set(
+                    Payment.objects.filter(external_id__in=external_ids).values_list("external_id", flat=True)
+                )
+                if not conflicts or conflicts == existing:
+                    raise
+                existing = conflicts
+
+
+class CsvPaymentProcessing(PaymentProcessingStrategy):
+    """
+    A processing strategy for payments files in csv format, one payment detail per row.
+
+    The columns are `external_id`, `customer_external_id`, `loan_external_id` and `amount`, the
+    consecutive rows with the same `external_id` are the details of the same payment.
+    """
+
+    columns = ["external_id", "customer_external_id", "loan_external_id", "amount"]
+
+    def read_payments(self, file):
+        """
+        Yields the payments of the csv file, grouping the consecutive rows of every payment.
+
+        Args:
+            file (File): The file object with the payment details.
+
+        Yields:
+            tuple: The row number of the first detail and the payment.
+
+        Raises:
+            ValidationError: If the header does not have the columns of the payments or if a row
+                is not valid utf-8 or csv.
+        """
+        reader = csv.DictReader(self.read_lines(file))
+        payment, first_row, number = None, 1, 0
+        try:
+            if not set(self.columns) <= set(reader.fieldnames or []):
+                raise ValidationError(MESSAGE_PAYMENT_FILE_COLUMNS.format(columns=", ".join(self.columns)))
+            for number, record in enumerate(reader, start=1):
+                if payment is None or record["external_id"] != payment["payment"]["external_id"]:
+                    if payment is not None:
+                        yield first_row, payment
+                    payment = {
+                        "payment": {
+                            "external_id": record["external_id"],
+                            "customer_external_id": record["customer_external_id"],
+                        },
+                        "payment_detail": [],
+                    }
+                    first_row = number
+                payment["payment_detail"].append(
+                    {"loan_external_id": record["loan_external_id"], "amount": record["amount"]}
+                )
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise ValidationError(MESSAGE_PAYMENT_FILE_UNREADABLE.format(row=number + 1, error=e))
+        if payment is not None:
+            yield first_row, payment
+
+    def read_lines(self, file):
+        """
+        Yields the lines of the file decoded one at a time, so a line that is not utf-8 fails on
+        its own row. The byte order mark of the first line is removed.
+
+        Args:
+            file (File): The file object with the payment details.
+
+        Yields:
+            str: The line, with its line break.
+        """
+        for number, line in enumerate(file):
+            yield line.decode("utf-8" if number else "utf-8-sig") if isinstance(line, bytes) else line
+
+
+class NdjsonPaymentProcessing(PaymentProcessingStrategy):
+    """
+    A processing strategy for payments files in NDJSON format, one payment per line with the
+    body of `PaymentView.post`. Blank lines are ignored.
+    """
+
+    def read_payments(self, file):
+        """
+        Yields the payments of the NDJSON file, reading one line at a time.
+
+        Args:
+            file (File): The file object with a JSON object per line.
+
+        Yields:
+            tuple: The line number and the payment.
+
+        Raises:
+            ValidationError: If a line is not a JSON object.
+        """
+        for number, line in enumerate(file, start=1):
+            try:
+                if isinstance(line, bytes):
+                    line = line.decode("utf-8")
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                raise ValidationError(MESSAGE_INVALID_JSON_LINE.format(line=number))
+            yield number, record
@@ -1,11 +1,16 @@
 from test.test_setup import TestSetup
 
 import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from customers.models import Customer
+from customers.models import Customer, CustomerBalance
+from customers.services import CustomerBalanceService
 from loans.models import Loan
+from payments.models import Payment, PaymentDetail
+from payments.services import PaymentService
 
 
 class TestCreatePayment(TestSetup):
@@ -245,3 +250,64 @@ class TestCreatePayment(TestSetup):
         response = self.client_auth.post(self.url, body_payment, format="json")
         assert response.status_code == 422
         assert response.json()["payment"] == {"external_id": ["El external_id 123 ya existe con el pago."]}
+
+    def test_create_payment_set_based(self):
+        """
+        Test case to verify that a payment is created with the same number of queries whatever
+        the number of its loans, with one detail per loan, the outstanding of every loan
+        decremented by its amount and the debt of the customer updated.
+        """
+        loans = [
+            Loan.objects.create(
+                external_id=f"loan-set-{i}", amount=1000, outstanding=1000, status=2, customer=self.customer
+            )
+            for i in range(20)
+        ]
+        CustomerBalanceService.rebuild()
+        total_debt = CustomerBalance.objects.get(customer=self.customer).total_debt
+
+        def create(external_id, loans):
+            details = [{"loan_external_id": loan.external_id, "amount": index + 1} for index, loan in enumerate(loans)]
+            with CaptureQueriesContext(connection) as queries:
+                PaymentService.create_payment(
+                    payment={"external_id": external_id, "customer_external_id": "12"}, payment_details=details
+                )
+            return len(queries)
+
+        assert create("payment-set-1", loans[:2]) == create("payment-set-2", loans)
+        payment = Payment.objects.get(external_id="payment-set-2")
+        assert payment.total_amount == sum(range(1, 21))
+        assert PaymentDetail.objects.filter(payment=payment).count() == 20
+        outstanding = dict(Loan.objects.filter(pk__in=[loan.pk for loan in loans]).values_list("external_id", "outstanding"))
+        assert outstanding["loan-set-0"] == 1000 - 1 - 1
+        assert outstanding["loan-set-1"] == 1000 - 2 - 2
+        assert outstanding["loan-set-19"] == 1000 - 20
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        assert balance.total_debt == total_debt - 3 - sum(range(1, 21))
+
+    def test_create_payment_query_count(self):
+        """
+        Test case to verify that a payment request reads its loans and customer once, with the
+        same number of queries whatever the number of its details.
+        """
+        loans = [
+            Loan.objects.create(
+                external_id=f"loan-query-{i}", amount=1000, outstanding=1000, status=2, customer=self.customer
+            )
+            for i in range(20)
+        ]
+        CustomerBalanceService.rebuild()
+
+        def post(external_id, loans):
+            body_payment = {
+                "payment_detail": [{"amount": 10, "loan_external_id": loan.external_id} for loan in loans],
+                "payment": {"external_id": external_id, "customer_external_id": "12"},
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client_auth.post(self.url, body_payment, format="json")
+            assert response.status_code == 201
+            return len(queries)
+
+        queries = post("payment-query-1", loans[:2])
+        assert queries == post("payment-query-2", loans)
+        assert queries <= 12
@@ -0,0 +1,262 @@
+import json
+from decimal import Decimal
+from test.test_setup import TestSetup
+from unittest import mock
+
+import django
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, CustomerBalance
+from customers.services import CustomerBalanceService
+from loans.models import Loan
+from payments.models import Payment, PaymentDetail
+from payments.services import PaymentService
+
+
+class TestCreatePaymentBulk(TestSetup):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super(TestCreatePaymentBulk, cls).setUpClass()
+        django.setup()
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("payments:payment_bulk")
+        self.customer = Customer.objects.create(external_id="12", status=1, score=10000, preapproved_at=timezone.now())
+        for number in range(1, 4):
+            Loan.objects.create(
+                external_id=f"loan-{number}", amount=1000, outstanding=1000, status=2, customer=self.customer
+            )
+        Loan.objects.create(external_id="loan-pending", amount=1000, outstanding=1000, status=1, customer=self.customer)
+        CustomerBalanceService.rebuild()
+
+    def post_file(self, processing_type: str, content: str):
+        file = SimpleUploadedFile(f"payments.{processing_type}", content.encode("utf-8"))
+        return self.client_auth.post(
+            f"{self.url}?processing_type={processing_type}", {"file": file}, format="multipart"
+        )
+
+    @override_settings(PAYMENT_UPLOAD_CHUNK_SIZE=2)
+    def test_create_payments_csv(self):
+        """
+        Test case for creating the payments of a csv file read in chunks of two payments.
+
+        The consecutive rows with the same external_id are the details of one payment. Every
+        payment is accepted or rejected on its own, with the errors of `PaymentView.post`, and the
+        outstanding check counts the payments accepted before in the file.
+        """
+        content = (
+            "external_id,customer_external_id,loan_external_id,amount\n"
+            "p-1,12,loan-1,600\n"
+            "p-1,12,loan-2,100\n"
+            "p-2,12,loan-1,500\n"
+            "p-3,12,loan-1,400\n"
+            "p-4,99,loan-1,10\n"
+            "p-5,12,loan-pending,10\n"
+            "p-6,12,loan-9,10\n"
+            "p-7,12,loan-3,-1\n"
+            "p-8,12,loan-3,5\n"
+            "p-8,12,loan-3,5\n"
+            "p-1,12,loan-3,5\n"
+        )
+        response = self.post_file("csv", content)
+        assert response.status_code == 200
+        report = response.json()
+        assert report["accepted"] == 2
+        assert report["rejected"] == 7
+        results = {(result["row"], result["external_id"]): result for result in report["results"]}
+        assert list(results) == [
+            (1, "p-1"),
+            (3, "p-2"),
+            (4, "p-3"),
+            (5, "p-4"),
+            (6, "p-5"),
+            (7, "p-6"),
+            (8, "p-7"),
+            (9, "p-8"),
+            (11, "p-1"),
+        ]
+        assert results[(1, "p-1")] == {"row": 1, "external_id": "p-1", "status": "accepted"}
+        assert results[(3, "p-2")]["errors"] == {
+            "errors": [
+                "El monto del pago no puede ser mayor que el saldo pendiente del préstamo."
+                "saldo_pendiente = 400.00 y monto_del_pago = 500"
+            ]
+        }
+        assert results[(4, "p-3")]["status"] == "accepted"
+        assert results[(5, "p-4")]["errors"] == {
+            "payment": {"customer_external_id": ["El customer_external_id 99 no existe."]}
+        }
+        assert results[(6, "p-5")]["errors"] == {
+            "payment_detail": [
+                {
+                    "loan_external_id": [
+                        "El estado del prestamo no esta activo por lo tanto no se puede realizar el pago."
+                    ]
+                }
+            ]
+        }
+        assert results[(7, "p-6")]["errors"] == {
+            "payment_detail": [{"loan_external_id": ["El load_external_id loan-9 no existe."]}]
+        }
+        assert results[(8, "p-7")]["errors"] == {"payment_detail": [{"amount": ["El monto no puede ser negativo"]}]}
+        assert results[(9, "p-8")]["errors"] == {"payment_detail": ["Duplicate load_external_id found: loan-3"]}
+        assert results[(11, "p-1")]["errors"] == {
+            "payment": {"external_id": ["El external_id p-1 ya existe con el pago."]}
+        }
+
+        outstanding = dict(Loan.objects.values_list("external_id", "outstanding"))
+        assert outstanding == {
+            "loan-1": Decimal("0"),
+            "loan-2": Decimal("900"),
+            "loan-3": Decimal("1000"),
+            "loan-pending": Decimal("1000"),
+        }
+        assert Payment.objects.get(external_id="p-1").total_amount == 700
+        assert PaymentDetail.objects.count() == 3
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        assert balance.total_debt == sum(outstanding.values())
+
+    def test_create_payments_ndjson(self):
+        """
+        Test case for creating the payments of a NDJSON file, one payment per line with the body
+        of `PaymentView.post`. Blank lines are ignored.
+        """
+        lines = [
+            {
+                "payment": {"external_id": "p-1", "customer_external_id": "12"},
+                "payment_detail": [
+                    {"loan_external_id": "loan-1", "amount": 100},
+                    {"loan_external_id": "loan-2", "amount": 50},
+                ],
+            },
+            {
+                "payment": {"external_id": "p-2", "customer_external_id": "12"},
+                "payment_detail": [{"loan_external_id": "loan-1", "amount": 2000}],
+            },
+        ]
+        content = json.dumps(lines[0]) + "\n\n" + json.dumps(lines[1]) + "\n"
+        response = self.post_file("ndjson", content)
+        assert response.status_code == 200
+        report = response.json()
+        assert report["accepted"] == 1
+        assert report["rejected"] == 1
+        assert [(result["row"], result["status"]) for result in report["results"]] == [(1, "accepted"), (3, "rejected")]
+        assert Loan.objects.get(external_id="loan-1").outstanding == Decimal("900")
+        assert Loan.objects.get(external_id="loan-2").outstanding == Decimal("950")
+
+    def test_create_payments_invalid_file(self):
+        """
+        Test case for the files that can not be processed: an unknown processing type, a csv
+        file without the payment columns and a NDJSON line that is not a JSON object.
+        """
+        response = self.post_file("xml", "<payments/>")
+        assert response.status_code == 422
+        assert response.json() == ["Invalid strategy: xml"]
+
+        response = self.post_file("csv", "external_id,amount\np-1,10\n")
+        assert response.status_code == 422
+        assert response.json() == [
+            "El archivo de pagos debe tener las columnas external_id, customer_external_id, loan_external_id, amount"
+        ]
+
+        response = self.post_file("ndjson", '{"payment": {}}\n[1]\n')
+        assert response.status_code == 422
+        assert response.json() == ["La linea 2 no es un objeto JSON valido."]
+        assert Payment.objects.count() == 0
+
+    @override_settings(PAYMENT_UPLOAD_CHUNK_SIZE=2)
+    def test_create_payments_unreadable_after_first_chunk(self):
+        """
+        Test case for files that can not be read after the first chunk: a NDJSON line that is
+        not a JSON object and a csv row that is not utf-8. The whole file is read before the first
+        chunk is written, so no payment is created and no outstanding is decremented.
+        """
+        line = '{{"payment": {{"external_id": "p-{}", "customer_external_id": "12"}}, '
+        line += '"payment_detail": [{{"loan_external_id": "loan-1", "amount": 10}}]}}\n'
+        content = "".join(line.format(number) for number in range(1, 4)) + "{not json\n" + line.format(5)
+        response = self.post_file("ndjson", content)
+        assert response.status_code == 422
+        assert response.json() == ["La linea 4 no es un objeto JSON valido."]
+
+        content = "external_id,customer_external_id,loan_external_id,amount\n" + "".join(
+            f"p-{number},12,loan-1,10\n" for number in range(1, 4)
+        )
+        file = SimpleUploadedFile("payments.csv", content.encode("utf-8") + b"p-4,\xff\xfe,loan-1,10\n")
+        response = self.client_auth.post(f"{self.url}?processing_type=csv", {"file": file}, format="multipart")
+        assert response.status_code == 422
+        assert response.json()[0].startswith("La fila 4 del archivo de pagos no se pudo leer")
+
+        assert Payment.objects.count() == 0
+        assert Loan.objects.get(external_id="loan-1").outstanding == Decimal("1000")
+
+    @override_settings(PAYMENT_UPLOAD_CHUNK_SIZE=2)
+    def test_create_payments_concurrent_insert(self):
+        """
+        Test case for a payment created by another request after its chunk was checked.
+
+        The payment p-2 is created before the file is processed but the first check of the chunk
+        does not see it, like when the other request commits between the check and the write. The
+        chunk is rolled back and checked again, p-2 is rejected as existing and p-1 is accepted.
+        """
+        Payment.objects.create(customer=self.customer, paid_at=timezone.now(), total_amount=1, external_id="p-2")
+        create_payments = PaymentService.create_payments
+        bulk_payment_error = PaymentService.bulk_payment_error
+        attempts = []
+
+        def check_without_p2(row, existing, *args):
+            return bulk_payment_error(row, existing - {"p-2"}, *args)
+
+        def create_payments_missing_p2(items):
+            attempts.append(items)
+            if len(attempts) > 1:
+                return create_payments(items)
+            with mock.patch.object(PaymentService, "bulk_payment_error", side_effect=check_without_p2):
+                return create_payments(items)
+
+        content = "external_id,customer_external_id,loan_external_id,amount\np-1,12,loan-1,100\np-2,12,loan-2,100\n"
+        with mock.patch.object(PaymentService, "create_payments", side_effect=create_payments_missing_p2):
+            response = self.post_file("csv", content)
+        assert response.status_code == 200
+        report = response.json()
+        assert len(attempts) == 2
+        assert report["accepted"] == 1
+        assert report["rejected"] == 1
+        assert report["results"][1] == {
+            "row": 2,
+            "external_id": "p-2",
+            "status": "rejected",
+            "errors": {"payment": {"external_id": ["El external_id p-2 ya existe con el pago."]}},
+        }
+        outstanding = dict(Loan.objects.values_list("external_id", "outstanding"))
+        assert outstanding["loan-1"] == Decimal("900")
+        assert outstanding["loan-2"] == Decimal("1000")
+        assert CustomerBalance.objects.get(customer=self.customer).total_debt == sum(outstanding.values())
+
+    def test_create_payments_query_count(self):
+        """
+        Test case to verify that a chunk of payments is checked and written with the same number
+        of queries whatever the number of payments and loans.
+        """
+        loans = [
+            Loan.objects.create(
+                external_id=f"loan-query-{number}", amount=1000, outstanding=1000, status=2, customer=self.customer
+            )
+            for number in range(100)
+        ]
+
+        def post(prefix, loans):
+            content = "external_id,customer_external_id,loan_external_id,amount\n" + "".join(
+                f"{prefix}-{loan.pk},12,{loan.external_id},10\n" for loan in loans
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post_file("csv", content)
+            assert response.json()["accepted"] == len(loans)
+            return len(queries)
+
+        assert post("few", loans[:5]) == post("many", loans)
@@ -0,0 +1,122 @@
+import threading
+import unittest
+from decimal import Decimal
+
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from customers.models import Customer, CustomerBalance
+from customers.services import CustomerBalanceService
+from loans.models import Loan
+from payments.models import Payment, PaymentDetail
+from user.models import User
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Row locks require PostgreSQL")
+class TestCreatePaymentConcurrency(APITransactionTestCase):
+    """
+    Stress tests of the payment creation with concurrent requests, every thread has its own
+    connection so the requests really run in parallel transactions.
+    """
+
+    def setUp(self):
+        self.url = reverse("payments:payment")
+        self.user = User.objects.create_user(email="payments@test.com", password="password")
+        self.customer = Customer.objects.create(
+            external_id="12", status=1, score=10000, preapproved_at=timezone.now()
+        )
+
+    def post_payments_concurrently(self, bodies: list) -> list:
+        barrier = threading.Barrier(len(bodies))
+        responses = [None] * len(bodies)
+
+        def post(position, body):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            try:
+                barrier.wait()
+                responses[position] = client.post(self.url, body, format="json")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post, args=(position, body)) for position, body in enumerate(bodies)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def payment_body(self, external_id: str, details: dict) -> dict:
+        return {
+            "payment_detail": [
+                {"loan_external_id": loan_external_id, "amount": amount} for loan_external_id, amount in details.items()
+            ],
+            "payment": {"external_id": external_id, "customer_external_id": "12"},
+        }
+
+    def test_concurrent_payments_same_loan(self):
+        """
+        Test case to verify that concurrent payments of the same loan never lose a decrement nor
+        leave a negative outstanding.
+
+        Twelve payments of 200 for a loan with an outstanding of 1000 are sent at the same time,
+        only five of them fit in the outstanding and the others are rejected with the amount error.
+        """
+        loan = Loan.objects.create(external_id="loan-1", amount=1000, outstanding=1000, status=2, customer=self.customer)
+        bodies = [self.payment_body(f"payment-{number}", {"loan-1": 200}) for number in range(12)]
+        responses = self.post_payments_concurrently(bodies)
+        assert sorted(response.status_code for response in responses) == [201] * 5 + [422] * 7
+        for response in responses:
+            if response.status_code == 422:
+                assert response.json()["errors"][0].startswith(
+                    "El monto del pago no puede ser mayor que el saldo pendiente del préstamo."
+                )
+        loan.refresh_from_db()
+        assert loan.outstanding == Decimal("0")
+        assert Payment.objects.count() == 5
+        assert PaymentDetail.objects.filter(loan=loan).count() == 5
+
+    def test_concurrent_payments_several_loans(self):
+        """
+        Test case to verify that a payment of several loans is rejected as a whole when one of
+        its loans has no outstanding left, and that the decrements of the other loans of the
+        payment are rolled back.
+        """
+        for number in range(3):
+            Loan.objects.create(
+                external_id=f"loan-{number}", amount=300, outstanding=300, status=2, customer=self.customer
+            )
+        bodies = [
+            self.payment_body(f"payment-{number}", {"loan-0": 100, f"loan-{1 + number % 2}": 100}) for number in range(8)
+        ]
+        responses = self.post_payments_concurrently(bodies)
+        assert sorted(response.status_code for response in responses) == [201] * 3 + [422] * 5
+        outstanding = dict(Loan.objects.values_list("external_id", "outstanding"))
+        paid = {
+            external_id: sum(
+                PaymentDetail.objects.filter(loan__external_id=external_id).values_list("amount", flat=True)
+            )
+            for external_id in outstanding
+        }
+        assert outstanding["loan-0"] == Decimal("0")
+        for external_id, value in outstanding.items():
+            assert value >= 0
+            assert value + paid[external_id] == Decimal("300")
+        assert self.customer.balance.total_debt == sum(outstanding.values())
+
+    def test_concurrent_payments_without_balance(self):
+        """
+        Test case to verify that concurrent first payments of a customer without a balance
+        rebuild it one after another, so no decrement of the outstanding is lost.
+        """
+        for number in range(8):
+            Loan.objects.create(
+                external_id=f"loan-{number}", amount=300, outstanding=300, status=2, customer=self.customer
+            )
+        bodies = [self.payment_body(f"payment-{number}", {f"loan-{number}": 100}) for number in range(8)]
+        responses = self.post_payments_concurrently(bodies)
+        assert [response.status_code for response in responses] == [201] * 8
+        assert CustomerBalance.objects.get(customer=self.customer).total_debt == Decimal("1600")
+        assert CustomerBalanceService.rebuild(dry_run=True) == []
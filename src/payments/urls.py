@@ -2,11 +2,12 @@
 
 from django.urls import path
 
-from payments.views import PaymentStatusView, PaymentView
+from payments.views import PaymentBulkView, PaymentStatusView, PaymentView
 
 app_name = "payments"  # pylint: disable=C0103
 
 urlpatterns = [
     path("", PaymentView.as_view(), name="payment"),
     path("status/", PaymentStatusView.as_view(), name="payment_status"),
+    path("bulk/", PaymentBulkView.as_view(), name="payment_bulk"),
 ]
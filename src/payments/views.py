@@ -3,8 +3,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from payments.factory import PaymentProcessingFactory
 from payments.serializers import PaymentSerializer, PaymentUpdateSerializer
 from payments.services import PaymentService
+from utils.idempotency import idempotent
 from utils.views_template import ViewTemplateFilters
 
 
@@ -13,15 +15,18 @@ class PaymentView(ViewTemplateFilters):
 
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         """Handle POST request."""
         try:
             serializer = PaymentSerializer(data=request.data)
             if serializer.is_valid():
                 payments_detail = serializer.validated_data
-                PaymentService.validate_loan_payment_amount(payments_detail=payments_detail["payment_detail"])
                 PaymentService.create_payment(
-                    payment=payments_detail["payment"], payment_details=payments_detail["payment_detail"]
+                    payment=payments_detail["payment"],
+                    payment_details=payments_detail["payment_detail"],
+                    customer=payments_detail["customer"],
+                    loans=payments_detail["loans"],
                 )
                 return Response(
                     {
@@ -42,6 +47,45 @@ class PaymentView(ViewTemplateFilters):
             )
 
 
+class PaymentBulkView(APIView):
+    """
+    API endpoint for creating the payments of a settlement file.
+
+    Methods:
+        post: Create the payments of the file.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Create the payments of a csv or NDJSON file, selected with the `processing_type` query param.
+
+        Every payment is accepted or rejected on its own, the rejected payments do not stop the file.
+
+        Parameters:
+            request: HTTP request with the payments `file`.
+
+        Returns:
+            Response: HTTP response with the accepted and rejected counts and the result of
+                every payment.
+        """
+        try:
+            processing_type = request.query_params.get("processing_type")
+            report = PaymentProcessingFactory.processing(strategy_name=processing_type, request=request)
+            return Response(report, status=200)
+        except ValidationError as validation_error:
+            return Response(
+                validation_error.detail,
+                status=422,
+            )
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=500,
+            )
+
+
 class PaymentStatusView(APIView):
     """
     API endpoint for activating a loan.
@@ -1,4 +1,19 @@
+from django import forms
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from utils.messages import MESSAGE_INVALID_MATCH
+
+MATCH_CHOICES = (
+    ("exact", "exact"),
+    ("prefix", "prefix"),
+    ("contains", "contains"),
+)
+MATCH_LOOKUPS = {
+    "exact": "exact",
+    "prefix": "startswith",
+    "contains": "icontains",
+}
 
 
 class BaseFilterStatus(filters.FilterSet):
@@ -18,3 +33,60 @@ class BaseFilterStatus(filters.FilterSet):
         """
         value = value.split(",")
         return qs.filter(status__in=value)
+
+
+class MatchCharFilter(filters.CharFilter):
+    """
+    A text filter whose lookup is chosen by the `match` parameter of the FilterSet.
+
+    `exact` uses the unique btree index of the column, `prefix` the `varchar_pattern_ops` index
+    Django adds to the unique text columns and `contains`, the default, the trigram index.
+    """
+
+    def filter(self, qs, value):
+        """
+        Filters the queryset with the lookup of the selected match mode.
+
+        Args:
+            qs: The queryset to filter.
+            value: The value of the filter.
+
+        Returns:
+            QuerySet: The filtered queryset.
+        """
+        if value in EMPTY_VALUES:
+            return qs
+        match = self.parent.form.cleaned_data.get("match") or "contains"
+        return qs.filter(**{f"{self.field_name}__{MATCH_LOOKUPS[match]}": value})
+
+
+class MatchFilter(filters.CharFilter):
+    """
+    The `match` parameter, validated against `MATCH_CHOICES`.
+    """
+
+    field_class = forms.ChoiceField
+
+
+class BaseFilterMatch(filters.FilterSet):
+    match = MatchFilter(choices=MATCH_CHOICES, method="filter_match")
+
+    def filter_queryset(self, queryset):
+        """
+        Filters the queryset, an unknown match mode is rejected instead of being ignored.
+
+        Raises:
+            ValueError: If the match mode is not one of `MATCH_CHOICES`.
+        """
+        if "match" in self.form.errors:
+            raise ValueError(MESSAGE_INVALID_MATCH)
+        return super().filter_queryset(queryset)
+
+    def filter_match(self, qs, _, value):  # pylint: disable=unused-argument
+        """
+        The match mode only selects the lookup of the `MatchCharFilter` filters.
+
+        Returns:
+            QuerySet: The queryset without changes.
+        """
+        return qs
@@ -0,0 +1,68 @@
+from functools import wraps
+
+from django.db import transaction
+from rest_framework.response import Response
+
+from core.services import IdempotencyService
+from utils.messages import (
+    MESSAGE_IDEMPOTENCY_KEY_IN_PROGRESS,
+    MESSAGE_IDEMPOTENCY_KEY_INVALID,
+    MESSAGE_IDEMPOTENCY_KEY_REUSED,
+)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def idempotent(view_method):
+    """
+    Make a view method idempotent with the `Idempotency-Key` header.
+
+    The first request with a key runs the view and its response is stored by user, path and
+    key, the retries with the same key and body get the stored response without running the
+    view again. A key sent with a different body is rejected with a 422 and a key whose request
+    is still running with a 409. The responses with a 5xx status are not stored, so the request
+    can be retried with the same key. The view runs in a transaction with the row of the key
+    locked, and its response is stored in that transaction, so a retry after the lease of
+    `IdempotencyService.claim` never runs the view of a request that finished. The writes of a
+    5xx response are rolled back. Requests without the header run the view as usual.
+
+    Args:
+        view_method (callable): The view method, called with the view and the request.
+
+    Returns:
+        callable: The wrapped view method.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > 255:
+            return Response({"error": MESSAGE_IDEMPOTENCY_KEY_INVALID}, status=422)
+        request_hash = IdempotencyService.request_hash(request.data)
+        record, claimed = IdempotencyService.claim(request.user, request.path, key, request_hash)
+        if not claimed:
+            if record.request_hash != request_hash:
+                return Response({"error": MESSAGE_IDEMPOTENCY_KEY_REUSED}, status=422)
+            if record.status_code is None:
+                return Response({"error": MESSAGE_IDEMPOTENCY_KEY_IN_PROGRESS}, status=409)
+            response = Response(record.response, status=record.status_code)
+            response["Idempotent-Replayed"] = "true"
+            return response
+        try:
+            with transaction.atomic():
+                if not IdempotencyService.lock(record):
+                    return Response({"error": MESSAGE_IDEMPOTENCY_KEY_IN_PROGRESS}, status=409)
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    IdempotencyService.store(record, response.status_code, response.data)
+                    return response
+                transaction.set_rollback(True)
+        except Exception:
+            IdempotencyService.release(record)
+            raise
+        IdempotencyService.release(record)
+        return response
+
+    return wrapper
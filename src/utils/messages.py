@@ -14,3 +14,18 @@ MESSAGE_NOT_PERMISSION_PAYMENT = "El estado del prestamo no esta activo por lo t
 MESSAGE_PAYMENT_NOT_FOUND = "Pago no encontrado"
 MESSAGE_PAYMENT_STATUS = "El pago ya esta en ese estado"
 MESSAGE_PAYMENT_UPDATE_ACTIVE_REJECTED = "El pago no se puede actualizar a active porque esta en active"
+MESSAGE_INVALID_JSON_LINE = "La linea {line} no es un objeto JSON valido."
+MESSAGE_INVALID_JSON = "El JSON no es valido: {error}"
+MESSAGE_LOAN_EXTERNAL_ID_EXISTS = "loan with this external id already exists."
+MESSAGE_CUSTOMER_NOT_FOUND = 'Invalid pk "{value}" - object does not exist.'
+MESSAGE_LOAN_NOT_FOUND = "Prestamo no encontrado"
+MESSAGE_LOAN_NOT_PENDING = "Prestamo solo se puede modificar si esta en estado pending"
+MESSAGE_LOAN_ALREADY_PENDING = "El prestamo no se puede actualizar a pending porque esta en pending"
+MESSAGE_LOAN_UPDATED = "Prestamo actualizado correctamente"
+MESSAGE_INVALID_MATCH = "El valor de match debe ser exact, prefix o contains"
+MESSAGE_UPLOAD_JOB_STALE = "El worker del job dejo de reportar progreso despues de {attempts} intentos"
+MESSAGE_PAYMENT_FILE_COLUMNS = "El archivo de pagos debe tener las columnas {columns}"
+MESSAGE_PAYMENT_FILE_UNREADABLE = "La fila {row} del archivo de pagos no se pudo leer: {error}"
+MESSAGE_IDEMPOTENCY_KEY_INVALID = "El header Idempotency-Key debe tener entre 1 y 255 caracteres"
+MESSAGE_IDEMPOTENCY_KEY_REUSED = "El Idempotency-Key ya se uso con un body diferente"
+MESSAGE_IDEMPOTENCY_KEY_IN_PROGRESS = "La peticion con este Idempotency-Key todavia se esta procesando"
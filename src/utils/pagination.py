@@ -1,5 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -17,3 +24,125 @@ class StandardResultsSetPagination(PageNumberPagination):
                 "total_pages": self.page.paginator.num_pages,
             }
         )
+
+
+class KeysetResultsSetPagination(BasePagination):
+    """
+    Keyset pagination on `(created_at, id)`.
+
+    Every page starts after the `created_at` and `id` of the last row of the previous page, so a
+    page is read with a single query on the `(created_at, id)` index whatever its depth and the
+    total of rows is not counted. The cursor is the position encoded in base64, the links of the
+    response carry it in the `cursor` query param.
+
+    Attributes:
+        page_size (int): The default number of rows of a page.
+        page_size_query_param (str): The query parameter for specifying the page size.
+        max_page_size (int): The maximum page size.
+        cursor_query_param (str): The query parameter of the cursor.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns the rows of the page after, or before, the position of the cursor.
+
+        Args:
+            queryset (QuerySet): The filtered queryset.
+            request (Request): The request, with the cursor and the page size.
+            view (View, optional): The view. Not used in this method.
+
+        Returns:
+            list: The rows of the page in `(created_at, id)` order.
+
+        Raises:
+            NotFound: If the cursor can not be decoded.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        created_at, pk, self.reverse = self.decode_cursor(request)
+        if created_at is not None:
+            if self.reverse:
+                # The redundant bound on created_at lets the index scan start at the cursor.
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk), created_at__lte=created_at
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk), created_at__gte=created_at
+                )
+        ordering = ("-created_at", "-id") if self.reverse else ("created_at", "id")
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        self.has_more = len(rows) > self.page_size
+        self.has_cursor = created_at is not None
+        self.page = rows[: self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_page_size(self, request) -> int:
+        """
+        Returns the page size of the request, limited to `max_page_size`.
+        """
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        """
+        Returns the link of the page after the last row, if there are more rows.
+        """
+        has_next = self.has_cursor if self.reverse else self.has_more
+        if not has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """
+        Returns the link of the page before the first row, if it is not the first page.
+        """
+        has_previous = self.has_more if self.reverse else self.has_cursor
+        if not has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        """
+        Returns the URL of the request with the position of the row as cursor.
+        """
+        position = f"{row.created_at.isoformat()}|{row.pk}|{int(reverse)}"
+        cursor = base64.urlsafe_b64encode(position.encode("ascii")).decode("ascii")
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """
+        Returns the `created_at`, the id and the direction of the cursor of the request.
+
+        Raises:
+            NotFound: If the cursor can not be decoded.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, None, False
+        try:
+            created_at, pk, reverse = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split("|")
+            return datetime.fromisoformat(created_at), int(pk), bool(int(reverse))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
@@ -4,7 +4,7 @@ from rest_framework.generics import GenericAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from utils.pagination import StandardResultsSetPagination
+from utils.pagination import KeysetResultsSetPagination, StandardResultsSetPagination
 
 
 class ViewTemplateFilters(GenericAPIView):
@@ -14,6 +14,7 @@ class ViewTemplateFilters(GenericAPIView):
     Attributes:
         filter_backends (tuple): The filter backends to be used.
         pagination_class (class): The pagination class to be used.
+        cursor_pagination_class (class): The pagination class used with `pagination=cursor`.
         page_size_query_param (str): The query parameter for specifying the page size.
         ordering_fields (list): The fields that can be used for ordering.
         permission_classes (list): The permission classes required for accessing the view.
@@ -22,6 +23,7 @@ class ViewTemplateFilters(GenericAPIView):
 
     filter_backends = (SearchFilter, OrderingFilter, DjangoFilterBackend)
     pagination_class = StandardResultsSetPagination
+    cursor_pagination_class = KeysetResultsSetPagination
     page_size_query_param = "page_size"
     ordering_fields = ["created_at", "updated_at"]
     permission_classes = [IsAuthenticated]
@@ -30,6 +32,9 @@ class ViewTemplateFilters(GenericAPIView):
         """
         Handle GET requests.
 
+        With the `pagination=cursor` query param the results are paginated with a cursor on
+        `(created_at, id)` instead of page numbers, without counting the rows.
+
         Args:
             request (HttpRequest): The HTTP request object.
 
@@ -48,7 +53,10 @@ class ViewTemplateFilters(GenericAPIView):
                 {"error": str(value_error)},
                 status=422,
             )
-        paginator = self.pagination_class()
+        if request.query_params.get("pagination") == "cursor":
+            paginator = self.cursor_pagination_class()
+        else:
+            paginator = self.pagination_class()
         page = paginator.paginate_queryset(filtered_queryset, request)
         serializer = self.serializer_class(page, many=True)
 